@@ -1,12 +1,21 @@
 #!/usr/bin/env python3
 """
 Image compression script for Flutter app assets.
-Compresses all images in assets/app_images (including subfolders).
-Preserves aspect ratio with minimum dimension of 256px.
-Target file size: 50-100KB per image.
+Compresses all images in assets/image_to_compress (including subfolders)
+into assets/app_images_compressed.
+Preserves aspect ratio with minimum dimension of 750px (MIN_DIMENSION).
+Target file size: 50KB-2MB per image (TARGET_FILE_SIZE_MIN/MAX).
+Images are processed in parallel on a process pool (--jobs, default: one
+worker per CPU core). The quality search encodes into memory, predicts the
+next quality from the sizes seen so far and writes each image once.
 """
 
+import argparse
+import io
+import math
 import os
+import time
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from PIL import Image
 import pillow_heif
@@ -19,7 +28,7 @@ SOURCE_DIR = "assets/image_to_compress"
 OUTPUT_DIR = "assets/app_images_compressed"
 MIN_DIMENSION = 750
 TARGET_FILE_SIZE_MIN = 50 * 1024  # 50KB
-TARGET_FILE_SIZE_MAX = 2000 *  1000# 100KB
+TARGET_FILE_SIZE_MAX = 2000 * 1000  # 2MB
 INITIAL_QUALITY = 1000
 MIN_QUALITY = 85
 
@@ -48,9 +57,90 @@ def calculate_resize_dimensions(original_size):
     return (new_width, new_height)
 
 
-def get_file_size(filepath):
-    """Get file size in bytes."""
-    return os.path.getsize(filepath)
+def in_target_range(size):
+    """Whether an encoded size lies within the target file size range."""
+    return TARGET_FILE_SIZE_MIN <= size <= TARGET_FILE_SIZE_MAX
+
+
+def encode_image(img, save_format, quality=None):
+    """Encode img into memory and return the bytes."""
+    save_params = {'optimize': True}
+    if quality is not None:
+        save_params['quality'] = quality
+    buffer = io.BytesIO()
+    img.save(buffer, save_format, **save_params)
+    return buffer.getvalue()
+
+
+def next_quality(samples, low, high):
+    """
+    Predict the quality whose size hits the middle of the target range.
+
+    Encoded size grows roughly exponentially with quality, so the secant
+    step interpolates log(size) between the two tried qualities closest
+    to the target, preferring a pair that brackets it; bisection of
+    [low, high] is the fallback. Returns None when no untried quality is
+    left.
+    """
+    untried = [q for q in range(low, high + 1) if q not in samples]
+    if not untried:
+        return None
+
+    target = math.log(math.sqrt(TARGET_FILE_SIZE_MIN * TARGET_FILE_SIZE_MAX))
+    points = [(math.log(max(size, 1)), q) for q, size in samples.items()]
+    below = [point for point in points if point[0] < target]
+    above = [point for point in points if point[0] >= target]
+    if below and above:
+        pair = [max(below), min(above)]
+    else:
+        pair = sorted(points, key=lambda point: abs(point[0] - target))[:2]
+
+    guess = (low + high) // 2
+    if len(pair) == 2 and pair[0][0] != pair[1][0]:
+        (size_a, q_a), (size_b, q_b) = pair
+        guess = round(q_a + (target - size_a) * (q_b - q_a) / (size_b - size_a))
+    guess = min(max(guess, low), high)
+    return min(untried, key=lambda q: abs(q - guess))
+
+
+def search_quality(img, save_format, lossy, max_attempts=10):
+    """
+    Find the encoding of img whose size lies in the target range.
+
+    Encodes into memory only. The first encode uses INITIAL_QUALITY; for
+    JPEG/WEBP up to ``max_attempts`` further qualities in
+    [MIN_QUALITY, 95] are predicted from the size/quality samples seen so
+    far. Returns (quality, bytes, encodes) of the encode in range, or of
+    the one closest to it.
+    """
+    quality = INITIAL_QUALITY if lossy else None
+    data = encode_image(img, save_format, quality)
+    encodes = 1
+    if not lossy:
+        return quality, data, encodes
+
+    def distance(size):
+        return max(TARGET_FILE_SIZE_MIN - size, size - TARGET_FILE_SIZE_MAX, 0)
+
+    # Quality is capped at 100 by the encoders
+    samples = {min(quality, 100): len(data)}
+    best = (quality, data)
+    low, high = MIN_QUALITY, 95
+    while encodes <= max_attempts and not in_target_range(len(best[1])):
+        size = len(data)
+        if size > TARGET_FILE_SIZE_MAX:
+            high = min(high, quality - 1)
+        elif size < TARGET_FILE_SIZE_MIN:
+            low = max(low, quality + 1)
+        quality = next_quality(samples, low, high)
+        if quality is None:
+            break
+        data = encode_image(img, save_format, quality)
+        encodes += 1
+        samples[quality] = len(data)
+        if distance(len(data)) < distance(len(best[1])):
+            best = (quality, data)
+    return best[0], best[1], encodes
 
 
 def get_save_format_and_params(file_path, img_mode):
@@ -82,10 +172,21 @@ def get_save_format_and_params(file_path, img_mode):
 def compress_image(input_path, output_path, relative_path=""):
     """
     Compress and resize image to target specifications.
-    Uses binary search to find optimal quality for target file size.
+    Searches quality on in-memory encodes (secant steps on log size,
+    see search_quality) and writes the chosen encoding once.
     Maintains aspect ratio with minimum dimension of MIN_DIMENSION.
     Preserves original image format.
     """
+    success, message = process_image(input_path, output_path, relative_path)
+    print(message)
+    return success
+
+
+def process_image(input_path, output_path, relative_path=""):
+    """
+    Work of compress_image() without printing, so it can run in a worker
+    process. Returns (success, status line).
+    """
     try:
         # Open image
         with Image.open(input_path) as img:
@@ -119,77 +220,33 @@ def compress_image(input_path, output_path, relative_path=""):
             # Ensure output directory exists
             ensure_output_dir(output_path.parent)
 
-            # Binary search for optimal quality
-            quality = INITIAL_QUALITY
-            min_q = MIN_QUALITY
-            max_q = 95
-            best_quality = quality
-
-            # Prepare save parameters based on format
-            save_params = {'optimize': True}
-            if save_format in ('JPEG', 'WEBP'):
-                save_params['quality'] = quality
-
-            # Try initial quality
-            img_resized.save(output_path, save_format, **save_params)
-            file_size = get_file_size(output_path)
-
-            # If already in range, we're done
-            if TARGET_FILE_SIZE_MIN <= file_size <= TARGET_FILE_SIZE_MAX:
-                display_path = relative_path or os.path.basename(input_path)
-                size_kb = file_size / 1024
-                dims = f"{new_size[0]}x{new_size[1]}"
-                qual_str = f", quality: {quality}" if save_format in (
-                    'JPEG', 'WEBP'
-                ) else ""
-                print(f"✓ {display_path}: {size_kb:.1f}KB "
-                      f"({dims}{qual_str})")
-                return True
-
-            # Binary search for optimal quality (only for JPEG/WEBP)
-            if save_format in ('JPEG', 'WEBP'):
-                attempts = 0
-                max_attempts = 10
-
-                while attempts < max_attempts and min_q <= max_q:
-                    if file_size > TARGET_FILE_SIZE_MAX:
-                        # File too large, reduce quality
-                        max_q = quality - 1
-                    elif file_size < TARGET_FILE_SIZE_MIN:
-                        # File too small, increase quality
-                        min_q = quality + 1
-
-                    quality = (min_q + max_q) // 2
-                    save_params['quality'] = quality
-                    img_resized.save(output_path, save_format, **save_params)
-                    file_size = get_file_size(output_path)
-
-                    if (TARGET_FILE_SIZE_MIN <= file_size <=
-                            TARGET_FILE_SIZE_MAX):
-                        best_quality = quality
-                        break
-
-                    best_quality = quality
-                    attempts += 1
-
-            final_size = get_file_size(output_path)
-            in_range = (TARGET_FILE_SIZE_MIN <= final_size <=
-                        TARGET_FILE_SIZE_MAX)
-            status = "✓" if in_range else "⚠"
+            # Search the quality on in-memory encodes, write the winner once
+            lossy = save_format in ('JPEG', 'WEBP')
+            quality, data, encodes = search_quality(img_resized, save_format, lossy)
+            output_path.write_bytes(data)
+
+            final_size = len(data)
+            status = "✓" if in_target_range(final_size) else "⚠"
             display_path = relative_path or os.path.basename(input_path)
             size_kb = final_size / 1024
             dims = f"{new_size[0]}x{new_size[1]}"
-            qual_str = f", quality: {best_quality}" if save_format in (
-                'JPEG', 'WEBP'
-            ) else ""
-            print(f"{status} {display_path}: {size_kb:.1f}KB "
-                  f"({dims}{qual_str})")
-            return True
+            qual_str = f", quality: {quality}" if lossy else ""
+            return True, (f"{status} {display_path}: {size_kb:.1f}KB "
+                          f"({dims}{qual_str}, {encodes} encodes)")
 
     except Exception as e:
         display_path = relative_path or os.path.basename(input_path)
-        print(f"✗ Error processing {display_path}: {str(e)}")
-        return False
+        return False, f"✗ Error processing {display_path}: {str(e)}"
+
+
+def compress_job(job):
+    """
+    Process pool entry point: job is (input_path, output_path,
+    relative_path). Returns (success, status line, seconds).
+    """
+    start = time.perf_counter()
+    success, message = process_image(*job)
+    return success, message, time.perf_counter() - start
 
 
 def find_all_images(source_dir):
@@ -215,8 +272,32 @@ def find_all_images(source_dir):
     return image_files
 
 
+def print_timing_summary(timings, wall_seconds, jobs):
+    """Print per-image timing statistics of a run."""
+    if not timings:
+        return
+    busy = sum(seconds for _, seconds in timings)
+    print(f"Time: {wall_seconds:.1f}s wall, {busy:.1f}s in workers "
+          f"({jobs} jobs, {busy / wall_seconds if wall_seconds else 0:.1f}x parallel)")
+    print(f"Per image: {busy / len(timings):.2f}s average, "
+          f"{max(seconds for _, seconds in timings):.2f}s max")
+    print("Slowest images:")
+    for relative_path, seconds in sorted(timings, key=lambda item: -item[1])[:5]:
+        print(f"  {seconds:6.2f}s  {relative_path}")
+
+
+def parse_args():
+    """Parse command line options."""
+    parser = argparse.ArgumentParser(description="Compress and resize app images.")
+    parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1,
+                        help="images processed in parallel (default: number of CPU cores; "
+                             "1 processes them in this process)")
+    return parser.parse_args()
+
+
 def main():
     """Main compression routine."""
+    args = parse_args()
     print("Image Compression Tool")
     print(f"Source: {SOURCE_DIR}")
     print(f"Output: {OUTPUT_DIR}")
@@ -239,21 +320,39 @@ def main():
         print(f"No image files found in {SOURCE_DIR}")
         return
 
-    print(f"Found {len(image_files)} images to process\n")
+    jobs = max(1, min(args.jobs, len(image_files)))
+    print(f"Found {len(image_files)} images to process ({jobs} jobs)\n")
 
-    # Process each image
-    success_count = 0
-    for img_path, relative_path in sorted(image_files):
-        # Create output path maintaining folder structure and format
-        output_file = Path(OUTPUT_DIR) / relative_path
+    # Create output paths maintaining folder structure and format
+    work = [(img_path, Path(OUTPUT_DIR) / relative_path, str(relative_path))
+            for img_path, relative_path in sorted(image_files)]
 
-        if compress_image(img_path, output_file, str(relative_path)):
-            success_count += 1
+    # Process each image; results arrive in input order for ordered progress
+    start = time.perf_counter()
+    success_count = 0
+    timings = []
+    total = len(work)
+    width = len(str(total))
+    if jobs == 1:
+        results = map(compress_job, work)
+        executor = None
+    else:
+        executor = ProcessPoolExecutor(max_workers=jobs)
+        results = executor.map(compress_job, work)
+    try:
+        for number, (job, (success, message, seconds)) in enumerate(zip(work, results), 1):
+            print(f"[{number:>{width}}/{total}] {message} [{seconds:.2f}s]")
+            timings.append((job[2], seconds))
+            if success:
+                success_count += 1
+    finally:
+        if executor:
+            executor.shutdown(cancel_futures=True)
 
     print("-" * 60)
-    total = len(image_files)
     print(f"Completed: {success_count}/{total} images processed")
     print(f"Output directory: {OUTPUT_DIR}")
+    print_timing_summary(timings, time.perf_counter() - start, jobs)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""
+Dense `activeSequence` numbering of the active questions.
+
+`sequence` is never reused, so a pool expansion paging through
+`sequence > x` also walks past every question deactivated since. Active
+questions therefore carry a second number, `activeSequence`, that runs
+1..max without gaps:
+
+    metadata/activeSequence    {max, holes: [...], updatedAt}
+
+* New and reactivated questions get the next positions, reserved in one
+  transaction per batch (like sequence blocks).
+* Deactivating a question deletes its `activeSequence` in the same batch
+  and records the freed position in `holes`, so a page read by
+  `activeSequence` never returns an inactive question.
+* `compact_active_sequence` closes the holes by moving the questions at
+  the end of the numbering into them (swap with last), a few hundred per
+  transaction; nothing is renumbered.
+* `repair_active_sequence` recomputes the numbering state from a
+  projection scan: for the first run, or when a reserved position was
+  never written because a batch failed.
+
+A moved question changes position; `sequence` stays its stable key.
+Every write to a question's `activeSequence` also sets `updatedAt`, so
+differential archives see it.
+"""
+
+from batch_writer import BatchWriter
+from firestore_client import sdk
+from parallel_scan import iter_documents_parallel
+
+FIELD = 'activeSequence'
+MOVES_PER_TRANSACTION = 200
+
+
+def active_sequence_ref(db):
+    return db.collection('metadata').document('activeSequence')
+
+
+def _state(snapshot):
+    data = (snapshot.to_dict() if snapshot.exists else None) or {}
+    return data.get('max', 0), set(data.get('holes', []))
+
+
+def reserve_active_block(db, count):
+    """Reserve ``count`` positions after the current maximum and return the first."""
+    firestore = sdk()
+    ref = active_sequence_ref(db)
+
+    @firestore.transactional
+    def reserve(transaction):
+        last, _ = _state(ref.get(transaction=transaction))
+        transaction.set(ref, {'max': last + count, 'updatedAt': firestore.SERVER_TIMESTAMP},
+                        merge=True)
+        return last + 1
+
+    return reserve(db.transaction())
+
+
+async def reserve_active_block_async(db, count):
+    """Async counterpart of reserve_active_block() for the async client."""
+    firestore = sdk()
+    ref = active_sequence_ref(db)
+
+    @firestore.async_transactional
+    async def reserve(transaction):
+        last, _ = _state(await ref.get(transaction=transaction))
+        transaction.set(ref, {'max': last + count, 'updatedAt': firestore.SERVER_TIMESTAMP},
+                        merge=True)
+        return last + 1
+
+    return await reserve(db.transaction())
+
+
+def stamp_active_sequence(documents, first_position):
+    """Number ``documents`` (all active) from ``first_position``."""
+    for offset, document in enumerate(documents):
+        document[FIELD] = first_position + offset
+    return documents
+
+
+def release_writes(db, positions):
+    """Batch write recording freed ``positions`` as holes (empty if none)."""
+    positions = [position for position in positions if position is not None]
+    if not positions:
+        return []
+    firestore = sdk()
+    return [('set', active_sequence_ref(db), {
+        'holes': firestore.ArrayUnion(sorted(positions)),
+        'updatedAt': firestore.SERVER_TIMESTAMP,
+    }, True)]
+
+
+def _tail_query(db, last, span):
+    firestore = sdk()
+    return (db.collection('questions')
+            .where(filter=firestore.FieldFilter(FIELD, '>', last - span))
+            .select([FIELD]))
+
+
+def _plan_moves(last, holes, span, tail):
+    """
+    Fill holes from the top of the numbering.
+
+    ``tail`` maps the highest positions to question references. Returns
+    (moves, new max, blocked); ``holes`` is updated in place.
+    """
+    moves = []
+    blocked = False
+    position = last
+    for _ in range(span):
+        if not holes:
+            break
+        if position in holes:
+            holes.remove(position)
+        elif position in tail:
+            # Every hole above ``position`` is gone already, so this one lies below it
+            target = min(holes)
+            holes.remove(target)
+            moves.append((tail[position], target))
+        else:
+            # Reserved by a batch that has not committed yet
+            blocked = True
+            break
+        position -= 1
+    return moves, position, blocked
+
+
+def _write_moves(transaction, ref, moves, position, holes):
+    server_timestamp = sdk().SERVER_TIMESTAMP
+    for question_ref, target in moves:
+        transaction.update(question_ref, {FIELD: target, 'updatedAt': server_timestamp})
+    transaction.set(ref, {'max': position, 'holes': sorted(holes),
+                          'updatedAt': server_timestamp}, merge=True)
+
+
+def _compact_step(db):
+    """Fill up to MOVES_PER_TRANSACTION holes. Returns (moves, holes left, blocked)."""
+    firestore = sdk()
+    ref = active_sequence_ref(db)
+
+    @firestore.transactional
+    def step(transaction):
+        last, holes = _state(ref.get(transaction=transaction))
+        span = min(len(holes), MOVES_PER_TRANSACTION)
+        if not span:
+            return 0, 0, False
+        tail = {doc.get(FIELD): doc.reference
+                for doc in _tail_query(db, last, span).get(transaction=transaction)}
+        moves, position, blocked = _plan_moves(last, holes, span, tail)
+        _write_moves(transaction, ref, moves, position, holes)
+        return len(moves), len(holes), blocked
+
+    return step(db.transaction())
+
+
+async def _compact_step_async(db):
+    """Async counterpart of _compact_step() for the async client."""
+    firestore = sdk()
+    ref = active_sequence_ref(db)
+
+    @firestore.async_transactional
+    async def step(transaction):
+        last, holes = _state(await ref.get(transaction=transaction))
+        span = min(len(holes), MOVES_PER_TRANSACTION)
+        if not span:
+            return 0, 0, False
+        tail = {doc.get(FIELD): doc.reference
+                for doc in await _tail_query(db, last, span).get(transaction=transaction)}
+        moves, position, blocked = _plan_moves(last, holes, span, tail)
+        _write_moves(transaction, ref, moves, position, holes)
+        return len(moves), len(holes), blocked
+
+    return await step(db.transaction())
+
+
+def _report_compaction(moved, holes, blocked):
+    if blocked:
+        print(f"  ⚠ activeSequence: {holes} holes left behind uncommitted positions; "
+              f"run --compact-active-sequence again later (or --repair-active-sequence)")
+    if moved:
+        print(f"✓ activeSequence compacted: {moved} questions moved into freed positions")
+
+
+def compact_active_sequence(db):
+    """Close all holes by moving questions from the end. Returns questions moved."""
+    moved = 0
+    while True:
+        moves, holes, blocked = _compact_step(db)
+        moved += moves
+        if blocked or not holes:
+            break
+    _report_compaction(moved, holes, blocked)
+    return moved
+
+
+async def compact_active_sequence_async(db):
+    """Async counterpart of compact_active_sequence() for the async client."""
+    moved = 0
+    while True:
+        moves, holes, blocked = await _compact_step_async(db)
+        moved += moves
+        if blocked or not holes:
+            break
+    _report_compaction(moved, holes, blocked)
+    return moved
+
+
+def repair_active_sequence(db, dry_run=False):
+    """
+    Recompute the numbering from a projection of all questions.
+
+    Active questions keep their position (duplicates lose it), active
+    questions without one are appended, inactive ones lose theirs, and
+    every unused position up to the maximum becomes a hole. Afterwards
+    the holes are compacted. Run it while no upload is writing.
+    Returns (assigned, cleared, holes).
+    """
+    print("Repairing activeSequence numbering...")
+    firestore = sdk()
+    taken = {}
+    unnumbered = []
+    cleared = []
+    for doc in iter_documents_parallel(db, 'questions',
+                                       prepare=lambda q: q.select(['isActive', FIELD])):
+        data = doc.to_dict() or {}
+        position = data.get(FIELD)
+        if not data.get('isActive', True):
+            if position is not None:
+                cleared.append(doc.reference)
+        elif position is None or position in taken:
+            unnumbered.append(doc.reference)
+        else:
+            taken[position] = doc.reference
+
+    last = max(taken, default=0)
+    holes = sorted(set(range(1, last + 1)) - set(taken))
+    print(f"  • {len(taken)} numbered, {len(unnumbered)} to append, "
+          f"{len(cleared)} inactive to clear, {len(holes)} holes")
+    if dry_run:
+        return len(unnumbered), len(cleared), len(holes)
+
+    with BatchWriter(db, verbose=False) as writer:
+        for question_ref in cleared:
+            writer.update(question_ref, {FIELD: firestore.DELETE_FIELD,
+                                         'updatedAt': firestore.SERVER_TIMESTAMP})
+        for offset, question_ref in enumerate(sorted(unnumbered, key=lambda ref: ref.id)):
+            writer.update(question_ref, {FIELD: last + 1 + offset,
+                                         'updatedAt': firestore.SERVER_TIMESTAMP})
+    active_sequence_ref(db).set({
+        'max': last + len(unnumbered),
+        'holes': holes,
+        'updatedAt': firestore.SERVER_TIMESTAMP,
+    })
+    compact_active_sequence(db)
+    verify_active_sequence(db)
+    return len(unnumbered), len(cleared), len(holes)
+
+
+def verify_active_sequence(db):
+    """Check with count aggregations that active questions are numbered 1..max."""
+    firestore = sdk()
+    last, holes = _state(active_sequence_ref(db).get())
+    questions_ref = db.collection('questions')
+    active = questions_ref.where(filter=firestore.FieldFilter('isActive', '==', True)).count().get()
+    numbered = questions_ref.where(filter=firestore.FieldFilter(FIELD, '>', 0)).count().get()
+    active, numbered = active[0][0].value, numbered[0][0].value
+    dense = last - len(holes)
+    if active == numbered == dense:
+        print(f"✓ activeSequence: {active} active questions numbered 1-{last}"
+              f"{f' ({len(holes)} holes pending)' if holes else ''}")
+        return True
+    print(f"⚠️  activeSequence mismatch: {active} active, {numbered} numbered, "
+          f"{dense} expected from max {last} and {len(holes)} holes; "
+          f"run --repair-active-sequence")
+    return False
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Asyncio execution mode for the upload and maintenance scripts.
+
+Built on the async Firestore client. A paged reader always has the next
+page request in flight, transformed batches are committed as background
+tasks, and a semaphore caps the number of concurrent commits. Reading
+page N+1, transforming page N and committing page N-1 therefore overlap
+instead of paying the round trip to the Firestore region one at a time.
+"""
+
+import asyncio
+import random
+import time
+
+from batch_writer import (
+    BASE_BACKOFF_SECONDS,
+    DEFAULT_MAX_RETRIES,
+    MAX_BACKOFF_SECONDS,
+    MAX_BATCH_WRITES,
+    WriteStats,
+    replay_safe,
+    retryable_errors,
+)
+
+DEFAULT_CONCURRENCY = 8
+DEFAULT_PAGE_SIZE = 500
+
+
+async def iter_pages(query, page_size=DEFAULT_PAGE_SIZE):
+    """
+    Yield lists of document snapshots, ordered by document ID.
+
+    The request for the next page is issued before the current page is
+    handed to the caller, so reads overlap with the caller's work.
+    """
+    ordered = query.order_by('__name__').limit(page_size)
+    pending = asyncio.ensure_future(ordered.get())
+    while pending is not None:
+        page = await pending
+        pending = None
+        if len(page) == page_size:
+            pending = asyncio.ensure_future(ordered.start_after(page[-1]).get())
+        if page:
+            yield page
+
+
+class AsyncBatchWriter:
+    """Commits batches as asyncio tasks with a concurrency limit."""
+
+    def __init__(self, db, concurrency=DEFAULT_CONCURRENCY,
+                 max_retries=DEFAULT_MAX_RETRIES, verbose=True):
+        self._db = db
+        self._slots = asyncio.Semaphore(concurrency)
+        self._max_retries = max_retries
+        self._verbose = verbose
+        self._tasks = set()
+        self._failure = None
+        self._started = time.monotonic()
+        self.stats = WriteStats()
+
+    async def submit(self, writes, documents=None):
+        """
+        Schedule ``writes`` ((op, ref, data, merge) tuples) as one batch.
+
+        Returns as soon as a commit slot is free; the commit itself runs
+        in the background.
+        """
+        if len(writes) > MAX_BATCH_WRITES:
+            raise ValueError(f"A batch can hold at most {MAX_BATCH_WRITES} writes")
+        if self._failure is not None:
+            raise self._failure
+        if not writes:
+            return
+
+        await self._slots.acquire()
+        task = asyncio.ensure_future(self._commit(
+            list(writes), len(writes) if documents is None else documents))
+        self._tasks.add(task)
+        task.add_done_callback(self._task_done)
+
+    def _task_done(self, task):
+        self._tasks.discard(task)
+        self._slots.release()
+        if not task.cancelled() and task.exception() is not None and self._failure is None:
+            self._failure = task.exception()
+
+    async def _commit(self, writes, documents):
+        retryable = retryable_errors()
+        attempt = 0
+        while True:
+            batch = self._db.batch()
+            for op, ref, data, merge in writes:
+                if op == 'set':
+                    batch.set(ref, data, merge=merge)
+                elif op == 'create':
+                    batch.create(ref, data)
+                elif op == 'update':
+                    batch.update(ref, data)
+                elif op == 'delete':
+                    batch.delete(ref)
+                else:
+                    raise ValueError(f"Unknown write operation: {op}")
+
+            try:
+                await batch.commit()
+                break
+            except retryable as e:
+                if attempt >= self._max_retries or not replay_safe(writes, e):
+                    raise
+                delay = min(MAX_BACKOFF_SECONDS, BASE_BACKOFF_SECONDS * (2 ** attempt))
+                delay *= random.uniform(0.5, 1.5)
+                attempt += 1
+                self.stats.retries += 1
+                if self._verbose:
+                    print(f"  ⚠ Batch commit failed ({type(e).__name__}), "
+                          f"retry {attempt}/{self._max_retries} in {delay:.1f}s")
+                await asyncio.sleep(delay)
+
+        self.stats.documents += documents
+        self.stats.writes += len(writes)
+        self.stats.batches += 1
+        if self._verbose:
+            print(f"  ✓ Committed batch {self.stats.batches} "
+                  f"({len(writes)} writes, {self.stats.documents} documents so far)")
+
+    async def close(self):
+        """Wait for all scheduled commits and return stats."""
+        if self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
+        self.stats.elapsed = time.monotonic() - self._started
+        if self._failure is not None:
+            raise self._failure
+        return self.stats
+
+
+async def run_pipeline(pages, transform, writer):
+    """
+    Feed every page through ``transform`` into ``writer``.
+
+    ``transform(page)`` returns a list of (writes, documents) batches.
+    Returns the number of source documents read.
+    """
+    read = 0
+    async for page in pages:
+        read += len(page)
+        for writes, documents in transform(page):
+            await writer.submit(writes, documents)
+    return read
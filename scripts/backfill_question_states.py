@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Backfill the denormalized pool fields of users/{uid}/questionStates.
+
+QuestionState carries `categoryId`, `difficulty` (as a string),
+`randomSeed` and `sequence` of its question so the app can filter the
+pool without reading `questions`. States written before the pool
+design, or before a renumbering, lack them or hold stale values.
+
+The catalogue is read once (projection of the four fields, partitions
+in parallel) into an in-memory lookup; then the `questionStates`
+collection group is migrated in parallel key ranges, updating only the
+fields that are missing or differ. Each range is checkpointed under
+`migrations/question-states-pool-fields`, so a rerun resumes.
+"""
+
+import argparse
+import sys
+import threading
+
+from firestore_client import connect, print_timings
+from migration_runner import Migration, load_checkpoint, run_partitioned_migration
+from parallel_scan import DEFAULT_WORKERS, iter_documents_parallel
+
+POOL_FIELDS = ('categoryId', 'difficulty', 'randomSeed', 'sequence')
+
+
+def expected_fields(question):
+    """Pool field values a state of ``question`` should carry, as a tuple in POOL_FIELDS order."""
+    difficulty = question.get('difficulty')
+    return (question.get('categoryId'),
+            None if difficulty is None else str(difficulty),  # QuestionState.difficulty is a String
+            question.get('randomSeed'),
+            question.get('sequence'))
+
+
+def load_question_fields(db, workers=DEFAULT_WORKERS):
+    """{questionId: expected_fields(...)} for the whole catalogue."""
+    lookup = {}
+    for doc in iter_documents_parallel(db, 'questions', workers=workers,
+                                       prepare=lambda query: query.select(list(POOL_FIELDS))):
+        lookup[doc.id] = expected_fields(doc.to_dict() or {})
+    return lookup
+
+
+class PoolFieldsBackfill(Migration):
+    """Copy the pool fields of each question into every state that references it."""
+
+    name = 'question-states-pool-fields'
+    collection = 'questionStates'
+    group = True
+    fields = ('questionId',) + POOL_FIELDS
+
+    def __init__(self, lookup):
+        self.lookup = lookup
+        self.orphans = 0
+        self._lock = threading.Lock()
+
+    def transform(self, doc_id, data, state):
+        expected = self.lookup.get(data.get('questionId') or doc_id)
+        if expected is None:
+            with self._lock:
+                self.orphans += 1
+            return None
+        update = {field: value for field, value in zip(POOL_FIELDS, expected)
+                  if value is not None and data.get(field) != value}
+        return update or None
+
+
+def backfill_question_states(db, workers=DEFAULT_WORKERS, restart=False):
+    """Run (or resume) the backfill. Returns (checkpoint, orphans)."""
+    if not restart:
+        checkpoint = load_checkpoint(db, PoolFieldsBackfill)
+        if checkpoint and checkpoint.get('status') == 'done':
+            # Skip loading the catalogue; the runner reports the finished run
+            return run_partitioned_migration(db, PoolFieldsBackfill({}), workers=workers), 0
+    print('📖 Loading pool fields of all questions...')
+    lookup = load_question_fields(db, workers)
+    print(f'✅ {len(lookup)} questions loaded')
+    migration = PoolFieldsBackfill(lookup)
+    checkpoint = run_partitioned_migration(db, migration, workers=workers, restart=restart)
+    return checkpoint, migration.orphans
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Backfill pool fields into users/*/questionStates.')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS,
+                        help=f'key ranges migrated in parallel (default: {DEFAULT_WORKERS})')
+    parser.add_argument('--restart', action='store_true',
+                        help='ignore the saved checkpoint and check every state again')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    print('🚀 Backfilling questionStates pool fields...')
+
+    try:
+        db = connect()
+        print('✅ Firebase initialized successfully')
+    except FileNotFoundError:
+        print('❌ Firebase credentials not found.')
+        print('   Place service account key as "cred.json" in project root or set '
+              'GOOGLE_APPLICATION_CREDENTIALS')
+        sys.exit(1)
+
+    try:
+        checkpoint, orphans = backfill_question_states(db, args.workers, args.restart)
+        print('')
+        print('🎉 Backfill completed successfully!')
+        print(f'   • States checked: {checkpoint["processed"]}')
+        print(f'   • States updated: {checkpoint["updated"]}')
+        if orphans:
+            print(f'   • States of deleted questions (left unchanged): {orphans}')
+        print_timings()
+    except Exception as e:
+        print('❌ Backfill failed:')
+        print(f'Error: {e}')
+        import traceback
+        print(f'Stack trace: {traceback.format_exc()}')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+Backup of every users/{uid}/questionStates document.
+
+A full run splits the `questionStates` collection group into partition
+ranges (document paths, i.e. ranges of users) and exports every range
+on its own worker into a compressed shard file (the snapshot format of
+snapshot_export.py, with document paths as IDs):
+
+    backups/questionStates-<date>/part-0000.jsonl.zst (+ .idx.json)
+    backups/questionStates-<date>/manifest.json
+
+An incremental run only exports states whose `lastSeenAt` is newer
+than the previous run, split into time slices that are read in
+parallel. `lastSeenAt` is the one timestamp every app version sets,
+on each answer; a state added to a pool is created with
+`lastSeenAt: null` (and the legacy path writes no `addedToPoolAt`), so
+states nobody has answered yet are only captured by a full backup.
+Run full backups regularly and replay incrementals on top of one. Each worker holds one page and one frame, so
+memory stays flat however many states there are. `--restore` replays
+one or more backup directories in the given order.
+"""
+
+import argparse
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+from firestore_client import connect, print_timings, sdk
+from paged_reader import iter_pages
+from parallel_scan import DEFAULT_WORKERS, partition_queries
+from snapshot_export import FrameWriter, restore_snapshot
+
+GROUP = 'questionStates'
+EXPORT_DIR = 'backups'
+LAST_RUN_FILE = 'questionStates-last-run.json'
+INCREMENTAL_FIELDS = ('lastSeenAt',)
+SHARDS_PER_WORKER = 4  # more, smaller shards than workers balance uneven user ranges
+# lastSeenAt is written from the device clock, so consecutive runs overlap
+OVERLAP = timedelta(hours=1)
+
+
+def export_shard(query, path, order_by=(), **index_fields):
+    """Export one query into a shard file. Returns its index."""
+    writer = FrameWriter(path)
+    for page in iter_pages(query, order_by=order_by):
+        for doc in page:
+            writer.add(doc.reference.path, doc.to_dict())
+    return writer.close(collectionGroup=GROUP, **index_fields)
+
+
+def full_jobs(db, shards):
+    return [(query, (), {}) for query in partition_queries(db, GROUP, shards, group=True)]
+
+
+def incremental_jobs(db, since, until, shards):
+    """Time-slice queries per incremental field covering [since, until)."""
+    firestore = sdk()
+    slices = max(1, shards // len(INCREMENTAL_FIELDS))
+    step = (until - since) / slices
+    jobs = []
+    for field in INCREMENTAL_FIELDS:
+        for n in range(slices):
+            start = since + step * n
+            end = until if n == slices - 1 else since + step * (n + 1)
+            query = (db.collection_group(GROUP)
+                     .where(filter=firestore.FieldFilter(field, '>=', start))
+                     .where(filter=firestore.FieldFilter(field, '<', end)))
+            jobs.append((query, (field,), {'ordered': False, 'field': field,
+                                           'from': start.isoformat(), 'to': end.isoformat()}))
+    return jobs
+
+
+def backup_states(db, out_dir, jobs, workers=DEFAULT_WORKERS):
+    """Run the export jobs on ``workers`` threads and write the manifest."""
+    os.makedirs(out_dir, exist_ok=True)
+
+    def run(numbered_job):
+        number, (query, order_by, index_fields) = numbered_job
+        path = os.path.join(out_dir, f'part-{number:04d}.jsonl.zst')
+        index = export_shard(query, path, order_by, **index_fields)
+        print(f"  ✓ {os.path.basename(path)}: {index['documents']} states")
+        return path, index
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(run, enumerate(jobs)))
+
+    shards = []
+    for path, index in results:
+        frames = index['frames']
+        shards.append({
+            'file': os.path.basename(path),
+            'documents': index['documents'],
+            'first': frames[0][3] if frames else None,
+            'last': frames[-1][4] if frames else None,
+        })
+    manifest = {
+        'collectionGroup': GROUP,
+        'documents': sum(shard['documents'] for shard in shards),
+        'createdAt': datetime.now().astimezone().isoformat(),
+        'shards': shards,
+    }
+    with open(os.path.join(out_dir, 'manifest.json'), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def load_last_run(export_dir):
+    path = os.path.join(export_dir, LAST_RUN_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as f:
+        return datetime.fromisoformat(json.load(f)['until'])
+
+
+def save_last_run(export_dir, until):
+    with open(os.path.join(export_dir, LAST_RUN_FILE), 'w', encoding='utf-8') as f:
+        json.dump({'until': until.isoformat()}, f)
+
+
+def restore_backups(db, directories, workers):
+    """Replay backup directories in order (full first, then incrementals)."""
+    total = 0
+    for directory in directories:
+        with open(os.path.join(directory, 'manifest.json'), encoding='utf-8') as f:
+            manifest = json.load(f)
+        print(f"♻️  Restoring {directory} ({manifest['documents']} states)...")
+        for shard in manifest['shards']:
+            total += restore_snapshot(db, os.path.join(directory, shard['file']),
+                                      max_in_flight=workers)
+    return total
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Back up users/*/questionStates.')
+    parser.add_argument('--incremental', action='store_true',
+                        help='only states answered since the previous run; new unanswered states '
+                             'need a full backup')
+    parser.add_argument('--since', metavar='ISO_TIME',
+                        help='with --incremental: start time instead of the previous run')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS,
+                        help=f'shards exported in parallel (default: {DEFAULT_WORKERS})')
+    parser.add_argument('--output-dir', default=EXPORT_DIR,
+                        help=f'directory for backup folders (default: {EXPORT_DIR})')
+    parser.add_argument('--restore', nargs='+', metavar='DIR',
+                        help='write backup folders back, in the given order')
+    args = parser.parse_args()
+    if args.since and not args.incremental:
+        parser.error('--since requires --incremental')
+    return args
+
+
+def main():
+    args = parse_args()
+    print('🔄 Starting questionStates backup...')
+
+    try:
+        db = connect()
+        print('✅ Firebase initialized successfully')
+    except FileNotFoundError:
+        print('❌ Firebase credentials not found.')
+        print('   Place service account key as "cred.json" in project root or set '
+              'GOOGLE_APPLICATION_CREDENTIALS')
+        sys.exit(1)
+
+    try:
+        if args.restore:
+            restored = restore_backups(db, args.restore, args.workers)
+            print(f'✅ Restored {restored} question states')
+            print_timings()
+            return
+
+        until = datetime.now(timezone.utc)
+        since = (datetime.fromisoformat(args.since) if args.since
+                 else load_last_run(args.output_dir)) if args.incremental else None
+        if since is not None and since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        shards = args.workers * SHARDS_PER_WORKER
+        stamp = until.astimezone().strftime('%Y-%m-%d-%H%M')
+
+        if since is None:
+            if args.incremental:
+                print('ℹ️  No previous run recorded, writing a full backup')
+            out_dir = os.path.join(args.output_dir, f'{GROUP}-{stamp}')
+            jobs = full_jobs(db, shards)
+        else:
+            print(f'📅 States answered since {since.isoformat()} '
+                  f'(new unanswered states are only in full backups)')
+            out_dir = os.path.join(args.output_dir, f'{GROUP}-{stamp}-incremental')
+            jobs = incremental_jobs(db, since, until, shards)
+
+        print(f'📦 Exporting {len(jobs)} shards with {args.workers} workers to {out_dir}/')
+        manifest = backup_states(db, out_dir, jobs, args.workers)
+        save_last_run(args.output_dir, until - OVERLAP)
+
+        print('')
+        print('🎉 Backup completed successfully!')
+        print(f'   • Question states: {manifest["documents"]}')
+        print(f'   • Shards: {len(manifest["shards"])}')
+        print(f'   • Location: {out_dir}/')
+        print_timings()
+    except Exception as e:
+        print('❌ Error during questionStates backup:')
+        print(f'Error: {e}')
+        import traceback
+        print(f'Stack trace: {traceback.format_exc()}')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
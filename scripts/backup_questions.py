@@ -1,109 +1,256 @@
 #!/usr/bin/env python3
 
-import sys
+import argparse
+import asyncio
+import json
 import os
+import sys
 from datetime import datetime
-import firebase_admin
-from firebase_admin import credentials, firestore
+
+from async_pipeline import DEFAULT_CONCURRENCY, AsyncBatchWriter, run_pipeline
+from async_pipeline import iter_pages as iter_pages_async
+from batch_writer import BatchWriter
+from content_archive import archive_content_addressed, reconstruct_content_snapshot, snapshot_ref
+from differential_archive import archive_collection, archive_differential, reconstruct_snapshot
+from firestore_client import connect, connect_async, get_async_client, print_timings
+from parallel_scan import DEFAULT_WORKERS, iter_pages_parallel
+from snapshot_export import export_snapshot, restore_snapshot
+
+BATCH_SIZE = 500  # Firestore batch limit
+EXPORT_DIR = 'backups'
+
+def archive_questions(db, date_string, concurrency=DEFAULT_CONCURRENCY, scan_workers=DEFAULT_WORKERS,
+                      ramp=True):
+    """
+    Copy every question into the archive. Returns (archived, batches).
+
+    Streams the source in cursor pages from ``scan_workers`` partitions
+    read in parallel while earlier pages are committed, and at most
+    ``concurrency`` batches are in flight, so memory stays constant
+    however large the catalogue is. Commits are paced by the adaptive
+    write scheduler; ``ramp`` applies the 500/50/5 ramp-up to the new
+    archive collection.
+    """
+    print('📖 Streaming questions from main collection...')
+    archive_ref = archive_collection(db, date_string)
+    writer = BatchWriter(db, max_in_flight=concurrency, verbose=False, adaptive=True, ramp=ramp)
+
+    total_questions = 0
+    for page in iter_pages_parallel(db, 'questions', workers=scan_workers, page_size=BATCH_SIZE):
+        for doc in page:
+            writer.set(archive_ref.document(doc.id), doc.to_dict())
+        total_questions += len(page)
+        print(f'📝 Queued {total_questions} questions ({writer.stats.batches} batches committed)...')
+
+    stats = writer.close()
+    print(f'⚡ Throughput: {stats.summary()}')
+    return total_questions, stats.batches
+
+async def archive_questions_async(db, date_string, concurrency=DEFAULT_CONCURRENCY):
+    """
+    Async archive: the next page is fetched while previous pages are
+    committed, with at most ``concurrency`` commits in flight.
+    """
+    print('📖 Streaming questions from main collection (async)...')
+    archive_ref = archive_collection(db, date_string)
+
+    def to_batches(page):
+        writes = [('set', archive_ref.document(doc.id), doc.to_dict(), False) for doc in page]
+        return [(writes, len(writes))]
+
+    writer = AsyncBatchWriter(db, concurrency=concurrency)
+    pages = iter_pages_async(db.collection('questions'), page_size=BATCH_SIZE)
+    total_questions = await run_pipeline(pages, to_batches, writer)
+    stats = await writer.close()
+    print(f'⚡ Throughput: {stats.summary()}')
+    return total_questions, stats.batches
+
+async def run_async(date_string, concurrency):
+    db = await connect_async()
+    print('✅ Firebase initialized successfully (async)')
+    return await archive_questions_async(db, date_string, concurrency)
+
+def _json_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+def reconstruct(db, date_string, output=None, into=None, concurrency=DEFAULT_CONCURRENCY, ramp=True):
+    """Rebuild the snapshot of ``date_string`` into a JSONL file and/or a collection."""
+    content_addressed = snapshot_ref(db, date_string).get().exists
+    print(f'🧩 Reconstructing questions snapshot of {date_string}'
+          f'{" (content-addressed)" if content_addressed else ""}...')
+    records = (reconstruct_content_snapshot(db, date_string) if content_addressed
+               else reconstruct_snapshot(db, date_string))
+    out = open(output, 'w', encoding='utf-8') if output else None
+    writer = (BatchWriter(db, max_in_flight=concurrency, verbose=False, adaptive=True, ramp=ramp)
+              if into else None)
+    target = db.collection(into) if into else None
+
+    total = 0
+    try:
+        for question_id, data in records:
+            if out:
+                out.write(json.dumps({'id': question_id, **data}, ensure_ascii=False,
+                                     default=_json_value) + '\n')
+            if writer:
+                writer.set(target.document(question_id), data)
+            total += 1
+    finally:
+        if out:
+            out.close()
+        if writer:
+            writer.close()
+
+    print(f'✅ Reconstructed {total} questions')
+    if output:
+        print(f'   • Written to {output}')
+    if into:
+        print(f'   • Restored into {into}/')
+    return total
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Archive the questions collection.')
+    parser.add_argument('--async', dest='use_async', action='store_true',
+                        help='overlap page reads and archive commits on the asyncio client')
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY,
+                        help=f'archive commits in flight (default: {DEFAULT_CONCURRENCY})')
+    parser.add_argument('--no-ramp', dest='ramp', action='store_false',
+                        help='skip the 500/50/5 write ramp-up for new archive collections '
+                             '(commits are still paced adaptively)')
+    parser.add_argument('--scan-workers', type=int, default=DEFAULT_WORKERS,
+                        help=f'partitions of questions read in parallel (default: {DEFAULT_WORKERS})')
+    parser.add_argument('--incremental', action='store_true',
+                        help='only archive questions updated since the previous archive '
+                             '(the first run writes a full base archive)')
+    parser.add_argument('--base', action='store_true',
+                        help='with --incremental: start a new chain with a full base archive')
+    parser.add_argument('--detect-deletions', action='store_true',
+                        help='with --incremental: record questions deleted since the last run '
+                             '(reads every question ID)')
+    parser.add_argument('--content-addressed', action='store_true',
+                        help='store each distinct question version once and only pointers per date')
+    parser.add_argument('--reconstruct', metavar='DATE',
+                        help='rebuild the full snapshot of DATE (YYYY-MM-DD) from the archive '
+                             '(content-addressed snapshot or differential chain)')
+    parser.add_argument('--output', metavar='PATH',
+                        help='with --reconstruct: write the snapshot as JSON lines')
+    parser.add_argument('--into', metavar='COLLECTION',
+                        help='with --reconstruct or --restore: write the snapshot into COLLECTION')
+    parser.add_argument('--export', nargs='?', const='', metavar='PATH',
+                        help=f'write a local zstd snapshot instead of a Firestore archive '
+                             f'(default: {EXPORT_DIR}/questions-<date>.jsonl.zst)')
+    parser.add_argument('--restore', metavar='PATH',
+                        help='write a local snapshot back (resumes an interrupted restore)')
+    args = parser.parse_args()
+    modes = [args.export is not None, args.incremental, args.content_addressed,
+             bool(args.reconstruct), bool(args.restore)]
+    if sum(modes) > 1:
+        parser.error('choose one of --export, --incremental, --content-addressed, '
+                     '--reconstruct and --restore')
+    if args.reconstruct and not (args.output or args.into):
+        parser.error('--reconstruct needs --output and/or --into')
+    if (args.base or args.detect_deletions) and not args.incremental:
+        parser.error('--base and --detect-deletions require --incremental')
+    if args.use_async and any(modes):
+        parser.error('--async only applies to full archives')
+    return args
 
 def main():
+    args = parse_args()
     print('🔄 Starting questions archive process...')
-    
+
+    # Only client creation can mean missing credentials; a missing export or
+    # restore file is reported with its own name below
+    try:
+        db = get_async_client() if args.use_async else connect()
+    except FileNotFoundError:
+        print('❌ Firebase credentials not found.')
+        print('   Options:')
+        print('   1. Place service account key as "cred.json" in project root')
+        print('   2. Set GOOGLE_APPLICATION_CREDENTIALS environment variable')
+        print('   3. Run: gcloud auth application-default login')
+        sys.exit(1)
+
     try:
-        # Initialize Firebase
-        if not firebase_admin._apps:
-            # Try to load credentials from cred.json first
-            cred_file = 'cred.json'
-            if os.path.exists(cred_file):
-                cred = credentials.Certificate(cred_file)
-                firebase_admin.initialize_app(cred)
-                print(f'✅ Loaded credentials from {cred_file}')
-            else:
-                # Fallback to other credential methods
-                try:
-                    cred = credentials.ApplicationDefault()
-                    firebase_admin.initialize_app(cred)
-                    print('✅ Using application default credentials')
-                except:
-                    # Try environment variable
-                    service_account_path = os.environ.get('GOOGLE_APPLICATION_CREDENTIALS')
-                    if service_account_path and os.path.exists(service_account_path):
-                        cred = credentials.Certificate(service_account_path)
-                        firebase_admin.initialize_app(cred)
-                        print(f'✅ Loaded credentials from {service_account_path}')
-                    else:
-                        print('❌ Firebase credentials not found.')
-                        print('   Options:')
-                        print('   1. Place service account key as "cred.json" in project root')
-                        print('   2. Set GOOGLE_APPLICATION_CREDENTIALS environment variable')
-                        print('   3. Run: gcloud auth application-default login')
-                        sys.exit(1)
-        
-        db = firestore.client()
-        print('✅ Firebase initialized successfully')
-        
         # Generate date string for archive path (YYYY-MM-DD)
         now = datetime.now()
         date_string = now.strftime('%Y-%m-%d')
-        
-        print(f'📅 Archive date: {date_string}')
-        
-        # Get all questions from the main collection
-        print('📖 Reading questions from main collection...')
-        questions_ref = db.collection('questions')
-        questions_docs = questions_ref.stream()
-        
-        # Convert to list to get count and process
-        questions_list = list(questions_docs)
-        total_questions = len(questions_list)
-        
-        print(f'📊 Found {total_questions} questions to archive')
-        
+
+        if args.export is not None:
+            path = args.export or os.path.join(EXPORT_DIR, f'questions-{date_string}.jsonl.zst')
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            print(f'📦 Exporting questions to {path}...')
+            index = export_snapshot(db, path)
+            size = os.path.getsize(path)
+            print(f'✅ Exported {index["documents"]} questions in {len(index["frames"])} frames '
+                  f'({size / 1e6:.1f} MB)')
+            print_timings()
+            return
+        if args.restore:
+            print(f'♻️  Restoring {args.restore}...')
+            restored = restore_snapshot(db, args.restore, args.into, args.concurrency,
+                                        ramp=args.ramp)
+            print(f'✅ Restored {restored} documents')
+            print_timings()
+            return
+        if args.reconstruct:
+            reconstruct(db, args.reconstruct, args.output, args.into, args.concurrency,
+                        args.ramp)
+            print_timings()
+            return
+        if args.content_addressed:
+            print('✅ Firebase initialized successfully')
+            print(f'📅 Archive date: {date_string}')
+            documents, new_versions = archive_content_addressed(
+                db, date_string, args.concurrency, args.scan_workers)
+            print('')
+            print('🎉 Archive completed successfully!')
+            print('📊 Summary:')
+            print(f'   • Questions in snapshot: {documents}')
+            print(f'   • New versions stored: {new_versions}')
+            print(f'   • Snapshot: archive/questions/snapshots/{date_string}')
+            print_timings()
+            return
+        if args.incremental:
+            print('✅ Firebase initialized successfully')
+            print(f'📅 Archive date: {date_string}')
+            archived, deleted, full = archive_differential(
+                db, date_string, full=args.base, detect_deletions=args.detect_deletions,
+                concurrency=args.concurrency, ramp=args.ramp)
+            print('')
+            print('🎉 Archive completed successfully!')
+            print('📊 Summary:')
+            print(f'   • Mode: {"full base archive" if full else "differential"}')
+            print(f'   • Questions archived: {archived}')
+            if args.detect_deletions:
+                print(f'   • Deletions recorded: {deleted}')
+            print(f'   • Archive location: archive/questions/{date_string}/')
+            print_timings()
+            return
+        if args.use_async:
+            print(f'📅 Archive date: {date_string}')
+            total_questions, total_batches = asyncio.run(
+                run_async(date_string, args.concurrency))
+        else:
+            print('✅ Firebase initialized successfully')
+            print(f'📅 Archive date: {date_string}')
+            total_questions, total_batches = archive_questions(
+                db, date_string, args.concurrency, args.scan_workers, args.ramp)
+
         if total_questions == 0:
             print('⚠️  No questions found to archive')
             return
-        
-        # Process questions in batches
-        batch_size = 500  # Firestore batch limit
-        processed_count = 0
-        
-        # Process in batches
-        for i in range(0, total_questions, batch_size):
-            batch = db.batch()
-            batch_end = min(i + batch_size, total_questions)
-            
-            for j in range(i, batch_end):
-                question_doc = questions_list[j]
-                question_id = question_doc.id
-                question_data = question_doc.to_dict()
-                
-                # Add to archive collection: archive/questions/{date}/{questionId}
-                archive_doc_ref = (db.collection('archive')
-                                 .document('questions')
-                                 .collection(date_string)
-                                 .document(question_id))
-                
-                batch.set(archive_doc_ref, question_data)
-                processed_count += 1
-                
-                # Show progress every 100 questions
-                if processed_count % 100 == 0:
-                    print(f'📝 Processed {processed_count}/{total_questions} questions...')
-            
-            # Commit the batch
-            batch.commit()
-            batch_num = (i // batch_size) + 1
-            total_batches = (total_questions + batch_size - 1) // batch_size
-            print(f'✅ Committed batch {batch_num}/{total_batches}')
-        
+
         print('')
         print('🎉 Archive completed successfully!')
         print('📊 Summary:')
         print(f'   • Total questions archived: {total_questions}')
-        print(f'   • Batches executed: {(total_questions + batch_size - 1) // batch_size}')
+        print(f'   • Batches executed: {total_batches}')
         print(f'   • Archive location: archive/questions/{date_string}/')
         print(f'   • Archive date: {date_string}')
-        
+        print_timings()
+
     except Exception as e:
         print('❌ Error during archive process:')
         print(f'Error: {e}')
@@ -112,4 +259,4 @@ def main():
         sys.exit(1)
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
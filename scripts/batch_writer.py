@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""
+Batched Firestore writer shared by the upload and maintenance scripts.
+
+Writes are grouped into atomic batch commits (at most 500 writes each).
+Several commits are kept in flight on a thread pool and transient errors
+are retried with exponential backoff (except a timed-out batch carrying
+counter increments, which may have been applied), so large uploads are
+bound by throughput instead of one round trip per document. With ``adaptive=True``
+a WriteScheduler (write_scheduler.py) sizes batches and the number of
+commits in flight from commit latency and contention errors instead.
+"""
+
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from firestore_client import api_exceptions, sdk
+from write_scheduler import WriteScheduler
+
+MAX_BATCH_WRITES = 500  # Firestore batch limit
+DEFAULT_MAX_IN_FLIGHT = 8
+DEFAULT_MAX_RETRIES = 5
+BASE_BACKOFF_SECONDS = 0.5
+MAX_BACKOFF_SECONDS = 16.0
+
+# Errors after which the whole batch can safely be committed again
+RETRYABLE_ERROR_NAMES = (
+    'Aborted',
+    'DeadlineExceeded',
+    'InternalServerError',
+    'ResourceExhausted',
+    'ServiceUnavailable',
+)
+# ... unless it was applied anyway: a timed-out commit may still have landed
+AMBIGUOUS_ERROR_NAMES = ('DeadlineExceeded',)
+
+
+def retryable_errors():
+    """Exception classes for RETRYABLE_ERROR_NAMES (imported lazily)."""
+    exceptions = api_exceptions()
+    return tuple(getattr(exceptions, name) for name in RETRYABLE_ERROR_NAMES)
+
+
+def _has_increment(value, increment):
+    if isinstance(value, increment):
+        return True
+    return isinstance(value, dict) and any(_has_increment(v, increment) for v in value.values())
+
+
+def replay_safe(writes, error):
+    """
+    Whether a batch that failed with a retryable ``error`` may be committed again.
+
+    After an ambiguous error the batch may already be applied, and
+    replaying Increment transforms (the question counters) would count
+    twice. Such batches are not retried; run --reconcile-counters instead.
+    """
+    if type(error).__name__ not in AMBIGUOUS_ERROR_NAMES:
+        return True
+    increment = sdk().Increment
+    if not any(_has_increment(data, increment) for _, _, data, _ in writes):
+        return True
+    print(f"  ⚠ Batch with counter increments failed ({type(error).__name__}) and may have "
+          f"been applied; not retried. Run --reconcile-counters to fix the counters")
+    return False
+
+
+def iter_chunks(items, size):
+    """Yield lists of at most ``size`` items from any iterable."""
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class WriteStats:
+    """Counters collected by a BatchWriter run."""
+
+    def __init__(self):
+        self.documents = 0
+        self.writes = 0
+        self.batches = 0
+        self.retries = 0
+        self.elapsed = 0.0
+        self.scheduler = None
+
+    @property
+    def docs_per_second(self):
+        return self.documents / self.elapsed if self.elapsed > 0 else 0.0
+
+    @property
+    def writes_per_second(self):
+        return self.writes / self.elapsed if self.elapsed > 0 else 0.0
+
+    def summary(self):
+        text = (f"{self.documents} documents in {self.batches} batches "
+                f"({self.elapsed:.2f}s, {self.docs_per_second:.0f} docs/sec, "
+                f"{self.writes_per_second:.0f} writes/sec, {self.retries} retries)")
+        if self.scheduler is not None:
+            text += f"; scheduler: {self.scheduler.summary()}"
+        return text
+
+
+class BatchWriter:
+    """
+    Commits batches of writes concurrently with bounded parallelism.
+
+    Use ``set``/``update``/``delete`` to let the writer fill batches
+    automatically, or ``submit`` to commit a caller-built group of writes
+    atomically in a single batch.
+
+    ``adaptive`` lets a WriteScheduler adjust batch size (up to
+    ``batch_size``) and commits in flight (up to ``max_in_flight``);
+    ``ramp`` additionally applies the 500/50/5 ramp-up, for writes into
+    new collections or sequential keys.
+    """
+
+    def __init__(self, db, batch_size=MAX_BATCH_WRITES,
+                 max_in_flight=DEFAULT_MAX_IN_FLIGHT,
+                 max_retries=DEFAULT_MAX_RETRIES, verbose=True,
+                 adaptive=False, ramp=False):
+        if not 0 < batch_size <= MAX_BATCH_WRITES:
+            raise ValueError(f"batch_size must be between 1 and {MAX_BATCH_WRITES}")
+
+        self._db = db
+        self._batch_size = batch_size
+        self._max_retries = max_retries
+        self._verbose = verbose
+        self._executor = ThreadPoolExecutor(max_workers=max_in_flight)
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+        self._lock = threading.Lock()
+        self._futures = []
+        self._pending = []
+        self._started = time.monotonic()
+        self.stats = WriteStats()
+        self.scheduler = None
+        if adaptive or ramp:
+            self.scheduler = WriteScheduler(max_in_flight, batch_size, ramp=ramp)
+            self.stats.scheduler = self.scheduler
+
+    @property
+    def batch_size(self):
+        """Writes per automatically filled batch (varies when adaptive)."""
+        return self.scheduler.batch_size if self.scheduler else self._batch_size
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self._executor.shutdown(wait=True)
+        return False
+
+    def set(self, ref, data, merge=False):
+        self._add(('set', ref, data, merge))
+
+    def update(self, ref, data):
+        self._add(('update', ref, data, False))
+
+    def delete(self, ref):
+        self._add(('delete', ref, None, False))
+
+    def _add(self, write):
+        self._pending.append(write)
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """Submit the partially filled batch, if any."""
+        if self._pending:
+            writes, self._pending = self._pending, []
+            self.submit(writes)
+
+    def submit(self, writes, documents=None):
+        """
+        Commit ``writes`` as one atomic batch in the background.
+
+        ``writes`` is a list of ``(op, ref, data, merge)`` tuples where op
+        is 'set', 'create', 'update' or 'delete'. ``documents`` is the
+        number of documents the batch represents for throughput reporting
+        (defaults to the number of writes). Blocks while the in-flight
+        limit is reached, which keeps memory bounded for producers that
+        stream.
+        Returns the commit's future (None for an empty batch).
+        """
+        if len(writes) > MAX_BATCH_WRITES:
+            raise ValueError(f"A batch can hold at most {MAX_BATCH_WRITES} writes")
+        if not writes:
+            return
+
+        self._raise_failed()
+        if self.scheduler:
+            self.scheduler.acquire(len(writes))
+            release = self.scheduler.release
+        else:
+            self._slots.acquire()
+            release = self._slots.release
+        try:
+            future = self._executor.submit(
+                self._commit, list(writes),
+                len(writes) if documents is None else documents)
+        except BaseException:
+            release()
+            raise
+        future.add_done_callback(lambda _: release())
+        with self._lock:
+            self._futures.append(future)
+        return future
+
+    def _commit(self, writes, documents):
+        retryable = retryable_errors()
+        attempt = 0
+        while True:
+            batch = self._db.batch()
+            for op, ref, data, merge in writes:
+                if op == 'set':
+                    batch.set(ref, data, merge=merge)
+                elif op == 'create':
+                    batch.create(ref, data)
+                elif op == 'update':
+                    batch.update(ref, data)
+                elif op == 'delete':
+                    batch.delete(ref)
+                else:
+                    raise ValueError(f"Unknown write operation: {op}")
+
+            started = time.monotonic()
+            try:
+                batch.commit()
+                if self.scheduler:
+                    self.scheduler.on_success(time.monotonic() - started)
+                break
+            except retryable as e:
+                if self.scheduler:
+                    self.scheduler.on_error(type(e).__name__)
+                if attempt >= self._max_retries or not replay_safe(writes, e):
+                    raise
+                delay = min(MAX_BACKOFF_SECONDS, BASE_BACKOFF_SECONDS * (2 ** attempt))
+                delay *= random.uniform(0.5, 1.5)
+                attempt += 1
+                with self._lock:
+                    self.stats.retries += 1
+                if self._verbose:
+                    print(f"  ⚠ Batch commit failed ({type(e).__name__}), "
+                          f"retry {attempt}/{self._max_retries} in {delay:.1f}s")
+                time.sleep(delay)
+
+        with self._lock:
+            self.stats.documents += documents
+            self.stats.writes += len(writes)
+            self.stats.batches += 1
+            batch_number = self.stats.batches
+            total_documents = self.stats.documents
+        if self._verbose:
+            print(f"  ✓ Committed batch {batch_number} "
+                  f"({len(writes)} writes, {total_documents} documents so far)")
+
+    def _raise_failed(self):
+        """Drop finished commits and re-raise the first failure, if any."""
+        with self._lock:
+            done = [f for f in self._futures if f.done()]
+            self._futures = [f for f in self._futures if not f.done()]
+        for future in done:
+            future.result()
+
+    def close(self):
+        """Flush remaining writes, wait for all commits and return stats."""
+        try:
+            self.flush()
+            with self._lock:
+                futures = list(self._futures)
+            for future in futures:
+                future.result()
+            with self._lock:
+                self._futures = []
+        finally:
+            self._executor.shutdown(wait=True)
+            self.stats.elapsed = time.monotonic() - self._started
+        return self.stats
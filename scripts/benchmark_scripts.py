@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Throughput benchmark for the upload, backup and migration scripts.
+
+Runs each script's core routine against the in-memory Firestore fake
+(fake_firestore.py) with synthetic questions and a simulated per-RPC
+latency, so changes to batching and concurrency can be compared on a
+laptop without credentials:
+
+    python benchmark_scripts.py --questions 100000 --latency-ms 20
+    python benchmark_scripts.py --only backup backup-async --json results.json
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+
+import firestore_client
+from async_pipeline import DEFAULT_CONCURRENCY, AsyncBatchWriter
+from batch_writer import BatchWriter
+from fake_firestore import synthetic_question
+
+
+def _catalogue(count):
+    return [synthetic_question(index) for index in range(count)]
+
+
+def bench_upload(args):
+    from question_sync import submit_inserts
+
+    def run():
+        db = firestore_client.connect()
+        questions_ref = db.collection('questions')
+        writer = BatchWriter(db, max_in_flight=args.concurrency)
+        submit_inserts(db, writer, [(questions_ref.document(), question)
+                                    for question in _catalogue(args.questions)])
+        writer.close()
+
+    firestore_client.use_fake(args.latency, args.failure_rate)
+    return _timed(run, args.questions)
+
+
+def bench_upload_async(args):
+    from question_sync import submit_inserts_async
+
+    async def run():
+        db = await firestore_client.connect_async()
+        questions_ref = db.collection('questions')
+        writer = AsyncBatchWriter(db, concurrency=args.concurrency)
+        await submit_inserts_async(db, writer, [(questions_ref.document(), question)
+                                                for question in _catalogue(args.questions)])
+        await writer.close()
+
+    firestore_client.use_fake(args.latency, args.failure_rate)
+    return _timed(lambda: asyncio.run(run()), args.questions)
+
+
+def bench_sync_noop(args):
+    """Re-sync an unchanged catalogue: only the hash projection is read."""
+    from question_sync import sync_questions
+    catalogue = _catalogue(args.questions)
+    firestore_client.use_fake(0.0)
+    sync_questions(firestore_client.connect(), catalogue, 'benchmark')
+    # Keep the seeded data, only switch on latency for the measured run
+    store = firestore_client.fake_store()
+    store.latency = args.latency
+    store.failure_rate = args.failure_rate
+    store.reset_stats()
+    return _timed(lambda: sync_questions(firestore_client.connect(), catalogue, 'benchmark'),
+                  args.questions)
+
+
+def bench_backup(args):
+    from backup_questions import archive_questions
+    firestore_client.use_fake(args.latency, args.failure_rate, questions=args.questions)
+    return _timed(lambda: archive_questions(firestore_client.connect(), 'benchmark',
+                                            ramp=args.ramp),
+                  args.questions)
+
+
+def bench_backup_async(args):
+    from backup_questions import run_async
+    firestore_client.use_fake(args.latency, args.failure_rate, questions=args.questions)
+    return _timed(lambda: asyncio.run(run_async('benchmark', args.concurrency)), args.questions)
+
+
+def bench_export(args):
+    from snapshot_export import export_snapshot
+    firestore_client.use_fake(args.latency, args.failure_rate, questions=args.questions)
+    with tempfile.TemporaryDirectory() as tmp:
+        return _timed(lambda: export_snapshot(firestore_client.connect(),
+                                              os.path.join(tmp, 'questions.jsonl.zst')),
+                      args.questions)
+
+
+def bench_restore(args):
+    from snapshot_export import export_snapshot, restore_snapshot
+    firestore_client.use_fake(0.0, questions=args.questions)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'questions.jsonl.zst')
+        export_snapshot(firestore_client.connect(), path)
+        firestore_client.use_fake(args.latency, args.failure_rate)
+        return _timed(lambda: restore_snapshot(firestore_client.connect(), path,
+                                               max_in_flight=args.concurrency, ramp=args.ramp),
+                      args.questions)
+
+
+def bench_states_backup(args):
+    """Full questionStates backup; --questions is the number of states (20 per user)."""
+    from backup_question_states import backup_states, full_jobs
+    from parallel_scan import DEFAULT_WORKERS
+    firestore_client.use_fake(args.latency, args.failure_rate, users=max(1, args.questions // 20))
+    db = firestore_client.connect()
+    with tempfile.TemporaryDirectory() as tmp:
+        return _timed(lambda: backup_states(db, tmp, full_jobs(db, DEFAULT_WORKERS * 4)),
+                      args.questions)
+
+
+def bench_states_backfill(args):
+    """Pool-field backfill; --questions is the number of states, over a catalogue of 1/20 that size."""
+    from backfill_question_states import backfill_question_states
+    firestore_client.use_fake(args.latency, args.failure_rate,
+                              questions=max(1000, args.questions // 20),
+                              users=max(1, args.questions // 20))
+    return _timed(lambda: backfill_question_states(firestore_client.connect()), args.questions)
+
+
+def bench_migrate(args):
+    from migrate_questions_sequence import migrate_questions_complete
+    firestore_client.use_fake(args.latency, args.failure_rate, questions=args.questions)
+    return _timed(lambda: migrate_questions_complete(firestore_client.connect()), args.questions)
+
+
+def _timed(action, documents):
+    """Run ``action`` on the prepared fake and return (documents, seconds)."""
+    start = time.perf_counter()
+    action()
+    return documents, time.perf_counter() - start
+
+
+SCENARIOS = {
+    'upload': bench_upload,
+    'upload-async': bench_upload_async,
+    'sync-noop': bench_sync_noop,
+    'backup': bench_backup,
+    'backup-async': bench_backup_async,
+    'export': bench_export,
+    'restore': bench_restore,
+    'states-backup': bench_states_backup,
+    'states-backfill': bench_states_backfill,
+    'migrate': bench_migrate,
+}
+
+
+def run_scenario(name, args):
+    output = io.StringIO()
+    with contextlib.redirect_stdout(sys.stdout if args.verbose else output):
+        documents, seconds = SCENARIOS[name](args)
+    stats = firestore_client.fake_store().stats()
+    return {
+        'scenario': name,
+        'documents': documents,
+        'seconds': round(seconds, 3),
+        'docs_per_second': round(documents / seconds) if seconds else None,
+        'rpcs': stats['rpcs'],
+    }
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the Firestore scripts against the in-memory fake.")
+    parser.add_argument('--questions', type=int, default=100_000,
+                        help="synthetic questions per scenario (default: 100000)")
+    parser.add_argument('--latency-ms', type=float, default=20.0,
+                        help="simulated round trip per RPC in milliseconds (default: 20)")
+    parser.add_argument('--failure-rate', type=float, default=0.0,
+                        help="share of commits failing with a retryable error (default: 0)")
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY,
+                        help=f"commits in flight (default: {DEFAULT_CONCURRENCY})")
+    parser.add_argument('--ramp', action='store_true',
+                        help="apply the 500/50/5 write ramp-up (the fake never hotspots, "
+                             "so it is off by default)")
+    parser.add_argument('--only', nargs='+', choices=sorted(SCENARIOS), metavar='SCENARIO',
+                        help=f"run a subset of: {', '.join(SCENARIOS)}")
+    parser.add_argument('--json', metavar='PATH', help="also write the results as JSON")
+    parser.add_argument('--verbose', action='store_true', help="show the scripts' own output")
+    args = parser.parse_args()
+    args.latency = args.latency_ms / 1000
+    return args
+
+
+def main():
+    args = parse_args()
+    names = args.only or list(SCENARIOS)
+    print(f"🏁 Benchmarking {len(names)} scenarios: {args.questions} questions, "
+          f"{args.latency_ms:g} ms/RPC, concurrency {args.concurrency}")
+
+    results = []
+    for name in names:
+        result = run_scenario(name, args)
+        results.append(result)
+        rpcs = ', '.join(f"{kind} {count}" for kind, count in result['rpcs'].items() if count)
+        print(f"  {name:<14} {result['seconds']:>8.2f}s  {result['docs_per_second'] or 0:>8} docs/sec  ({rpcs})")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'questions': args.questions, 'latency_ms': args.latency_ms,
+                       'concurrency': args.concurrency, 'results': results}, f, indent=2)
+        print(f"💾 Results written to {args.json}")
+
+
+if __name__ == '__main__':
+    main()
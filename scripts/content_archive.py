@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Content-addressed question archives.
+
+Instead of a full copy of every question per date, each distinct
+question version is stored once under the SHA-256 of its canonical
+JSON form, and a date only records which version every question had:
+
+    archive/questions/versions/{hash}                     question data
+    archive/questions/snapshots/{date}                    {documents, shards, newVersions}
+    archive/questions/snapshots/{date}/pointers/{n}       {entries: {questionId: hash}}
+
+Versions already referenced by the previous snapshot are not written
+again, so a daily run writes the day's churn plus a handful of pointer
+shards. The snapshot document is written last; its presence marks a
+complete snapshot.
+"""
+
+import hashlib
+import json
+import math
+
+from batch_writer import BatchWriter, iter_chunks
+from differential_archive import archive_root
+from firestore_client import sdk
+from parallel_scan import DEFAULT_WORKERS, iter_pages_parallel
+from pool_index import shard_for
+from snapshot_export import encode_value
+
+POINTER_SHARD_TARGET = 8000  # ~90 bytes per entry, ~700 KiB per shard
+POINTER_BATCH_SIZE = 5  # pointer shards are large, keep commits well under 10 MiB
+GET_ALL_CHUNK = 300
+
+
+def versions_collection(db):
+    return archive_root(db).collection('versions')
+
+
+def snapshot_ref(db, date_string):
+    return archive_root(db).collection('snapshots').document(date_string)
+
+
+def version_hash(data):
+    """SHA-256 over the canonical JSON form of a stored question."""
+    encoded = json.dumps(data, sort_keys=True, ensure_ascii=False, separators=(',', ':'),
+                         default=encode_value)
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+
+def load_pointers(db, date_string):
+    """{questionId: hash} of a complete snapshot, or None if there is none."""
+    snapshot = snapshot_ref(db, date_string).get()
+    if not snapshot.exists:
+        return None
+    shards = snapshot.to_dict()['shards']
+    pointers_ref = snapshot_ref(db, date_string).collection('pointers')
+    entries = {}
+    for shard in db.get_all([pointers_ref.document(str(n)) for n in range(shards)]):
+        entries.update((shard.to_dict() or {}).get('entries', {}))
+    return entries
+
+
+def previous_snapshot_date(db, date_string):
+    """Date of the newest complete snapshot before ``date_string``, or None."""
+    query = (archive_root(db).collection('snapshots')
+             .where(filter=sdk().FieldFilter('__name__', '<', snapshot_ref(db, date_string)))
+             .order_by('__name__', direction=sdk().Query.DESCENDING)
+             .limit(1))
+    for snapshot in query.stream():
+        return snapshot.id
+    return None
+
+
+def archive_content_addressed(db, date_string, concurrency=None, scan_workers=DEFAULT_WORKERS):
+    """
+    Snapshot `questions` as version pointers for ``date_string``.
+
+    Returns (documents, new_versions).
+    """
+    firestore = sdk()
+    previous = previous_snapshot_date(db, date_string)
+    known = set((load_pointers(db, previous) or {}).values()) if previous else set()
+    print(f"📦 Content-addressed archive: {len(known)} versions known from "
+          f"{previous or 'no previous snapshot'}")
+
+    # Version IDs are hashes, spread over the keyspace: no ramp-up needed
+    writer_options = {'verbose': False, 'adaptive': True}
+    if concurrency:
+        writer_options['max_in_flight'] = concurrency
+    writer = BatchWriter(db, **writer_options)
+    versions_ref = versions_collection(db)
+
+    pointers = {}
+    new_versions = 0
+    for page in iter_pages_parallel(db, 'questions', workers=scan_workers):
+        for doc in page:
+            data = doc.to_dict()
+            digest = version_hash(data)
+            pointers[doc.id] = digest
+            if digest not in known:
+                known.add(digest)
+                writer.set(versions_ref.document(digest), data)
+                new_versions += 1
+        print(f"📝 Hashed {len(pointers)} questions, {new_versions} new versions...")
+    stats = writer.close()
+    print(f"⚡ Versions: {stats.summary()}")
+
+    shard_count = max(1, math.ceil(len(pointers) / POINTER_SHARD_TARGET))
+    shards = [{} for _ in range(shard_count)]
+    for question_id, digest in pointers.items():
+        shards[shard_for(question_id, shard_count)][question_id] = digest
+    pointers_ref = snapshot_ref(db, date_string).collection('pointers')
+    with BatchWriter(db, batch_size=POINTER_BATCH_SIZE, verbose=False) as pointer_writer:
+        for shard, entries in enumerate(shards):
+            pointer_writer.set(pointers_ref.document(str(shard)), {'entries': entries})
+
+    snapshot_ref(db, date_string).set({
+        'documents': len(pointers),
+        'shards': shard_count,
+        'newVersions': new_versions,
+        'createdAt': firestore.SERVER_TIMESTAMP,
+    })
+    return len(pointers), new_versions
+
+
+def reconstruct_content_snapshot(db, date_string):
+    """Yield (questionId, data) of a content-addressed snapshot."""
+    pointers = load_pointers(db, date_string)
+    if pointers is None:
+        raise ValueError(f"No content-addressed snapshot for {date_string}")
+
+    by_hash = {}
+    for question_id, digest in pointers.items():
+        by_hash.setdefault(digest, []).append(question_id)
+    versions_ref = versions_collection(db)
+    for digests in iter_chunks(sorted(by_hash), GET_ALL_CHUNK):
+        for version in db.get_all([versions_ref.document(digest) for digest in digests]):
+            if not version.exists:
+                raise ValueError(f"Archived version {version.id} is missing")
+            data = version.to_dict()
+            for question_id in by_hash[version.id]:
+                yield question_id, dict(data)
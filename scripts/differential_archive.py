@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+Differential question archives.
+
+A full archive copies every question to `archive/questions/{date}` and
+becomes the base of a chain. Later runs copy only questions whose
+`updatedAt` is newer than the previous run's cutoff into their own date
+collection. The chain and cutoff live on the `archive/questions`
+document; a sharded manifest
+
+    archive/questions/manifest/{n}
+        entries: {questionId: date holding its latest version}
+        deleted: {questionId: date it was found missing}
+
+records where the latest version of each question is. Any snapshot can
+be reconstructed: for the latest date by reading exactly the manifest's
+documents, for older dates by walking the chain back to its base and
+taking each question's newest version on or before that date.
+"""
+
+import math
+from datetime import datetime, timedelta, timezone
+
+from batch_writer import BatchWriter
+from firestore_client import sdk
+from paged_reader import iter_documents, iter_pages
+from parallel_scan import iter_documents_parallel
+from pool_index import shard_for
+
+STATE_FIELD = 'differential'
+MANIFEST_COLLECTION = 'manifest'
+MANIFEST_SHARD_TARGET = 10000  # ~50 bytes per entry, ~500 KiB per shard after a base archive
+MANIFEST_BATCH_SIZE = 10  # shard documents are large, keep commits well under 10 MiB
+TOMBSTONE_FIELD = '_deleted'
+# Writes committed just before a run may carry slightly older server timestamps
+CLOCK_SKEW = timedelta(minutes=2)
+GET_ALL_CHUNK = 300
+
+
+def archive_root(db):
+    return db.collection('archive').document('questions')
+
+
+def archive_collection(db, date_string):
+    return archive_root(db).collection(date_string)
+
+
+def manifest_ref(db, shard):
+    return archive_root(db).collection(MANIFEST_COLLECTION).document(str(shard))
+
+
+def load_state(db):
+    """The differential state ({} before the first differential run)."""
+    snapshot = archive_root(db).get()
+    return ((snapshot.to_dict() or {}).get(STATE_FIELD) or {}) if snapshot.exists else {}
+
+
+def load_manifest(db, shard_count):
+    """Return ({questionId: date}, {questionId: date deleted}) from all shards."""
+    entries, deleted = {}, {}
+    for snapshot in db.get_all([manifest_ref(db, shard) for shard in range(shard_count)]):
+        data = (snapshot.to_dict() or {}) if snapshot.exists else {}
+        entries.update(data.get('entries', {}))
+        deleted.update(data.get('deleted', {}))
+    return entries, deleted
+
+
+def _write_manifest(db, shard_count, old_count, date_string, archived, deleted=(), full=False):
+    """
+    Record the run in the manifest, one write per shard.
+
+    A base archive replaces every shard; a differential run merges its
+    entries into them.
+    """
+    firestore = sdk()
+    shards = [{'entries': {}, 'deleted': {}} for _ in range(shard_count)]
+    for question_id in archived:
+        shard = shards[shard_for(question_id, shard_count)]
+        shard['entries'][question_id] = date_string
+        if not full:
+            shard['deleted'][question_id] = firestore.DELETE_FIELD
+    for question_id in deleted:
+        shard = shards[shard_for(question_id, shard_count)]
+        shard['entries'][question_id] = firestore.DELETE_FIELD
+        shard['deleted'][question_id] = date_string
+
+    with BatchWriter(db, batch_size=MANIFEST_BATCH_SIZE, verbose=False) as writer:
+        for shard, data in enumerate(shards):
+            if full:
+                writer.set(manifest_ref(db, shard), data)
+            elif data['entries'] or data['deleted']:
+                writer.set(manifest_ref(db, shard), data, merge=True)
+        for shard in range(shard_count, old_count):
+            writer.delete(manifest_ref(db, shard))
+
+
+def _find_deleted(db, entries):
+    """IDs in the manifest that no longer exist in `questions` (reads IDs only)."""
+    live = {doc.id for doc in iter_documents_parallel(
+        db, 'questions', prepare=lambda q: q.select(['__name__']))}
+    return sorted(set(entries) - live)
+
+
+def archive_differential(db, date_string, full=False, detect_deletions=False,
+                         concurrency=None, ramp=True):
+    """
+    Archive changed questions (or all of them for a new base).
+
+    ``ramp`` applies the 500/50/5 write ramp-up to the new archive
+    collection. Returns (archived, deleted, full) for the run.
+    """
+    firestore = sdk()
+    state = load_state(db)
+    started = datetime.now(timezone.utc)
+    full = full or not state
+    old_shards = state.get('manifestShards', 0)
+    questions_ref = db.collection('questions')
+
+    if full:
+        total = questions_ref.count().get()[0][0].value
+        shard_count = max(1, math.ceil(total / MANIFEST_SHARD_TARGET))
+        print(f"📦 Full base archive: {total} questions, manifest in {shard_count} shard(s)")
+        query, order_by = questions_ref, ()
+    else:
+        shard_count = old_shards
+        cutoff = state['cutoff']
+        print(f"📦 Differential archive: questions updated after {cutoff.isoformat()} "
+              f"(previous archive {state.get('lastDate')})")
+        query = questions_ref.where(filter=firestore.FieldFilter('updatedAt', '>', cutoff))
+        order_by = ('updatedAt',)
+
+    archive_ref = archive_collection(db, date_string)
+    writer_options = {'verbose': False, 'adaptive': True, 'ramp': ramp}
+    if concurrency:
+        writer_options['max_in_flight'] = concurrency
+    writer = BatchWriter(db, **writer_options)
+
+    archived_ids = []
+    for page in iter_pages(query, order_by=order_by):
+        for doc in page:
+            writer.set(archive_ref.document(doc.id), doc.to_dict())
+        archived_ids.extend(doc.id for doc in page)
+        print(f"📝 Archived {len(archived_ids)} questions...")
+
+    deleted = []
+    if detect_deletions and not full:
+        entries, _ = load_manifest(db, shard_count)
+        deleted = _find_deleted(db, entries)
+        for question_id in deleted:
+            writer.set(archive_ref.document(question_id), {TOMBSTONE_FIELD: True})
+        print(f"🗑  {len(deleted)} deleted questions recorded")
+
+    stats = writer.close()
+    print(f"⚡ Throughput: {stats.summary()}")
+
+    # The manifest and cutoff only move once every archive write is committed
+    _write_manifest(db, shard_count, old_shards if full else 0, date_string,
+                    archived_ids, deleted, full)
+    # A second run on the same date writes into the same collection, so a base stays a base
+    previous = state.get('chain', {}).get(date_string, {})
+    chain_entry = {'documents': previous.get('documents', 0) + len(archived_ids),
+                   'deleted': previous.get('deleted', 0) + len(deleted),
+                   'full': full or previous.get('full', False),
+                   'archivedAt': firestore.SERVER_TIMESTAMP}
+    state_update = {
+        'cutoff': started - CLOCK_SKEW,
+        'lastDate': date_string,
+        'manifestShards': shard_count,
+        'chain': {date_string: chain_entry},
+    }
+    if full:
+        state_update['baseDate'] = date_string
+    archive_root(db).set({STATE_FIELD: state_update}, merge=True)
+    return len(archived_ids), len(deleted), full
+
+
+def _chain_dates(state, date_string):
+    """Dates from the newest base on or before ``date_string`` up to it, newest first."""
+    chain = state.get('chain', {})
+    dates = sorted(d for d in chain if d <= date_string)
+    bases = [d for d in dates if chain[d].get('full')]
+    if not bases:
+        raise ValueError(f"No full base archive on or before {date_string}")
+    return [d for d in reversed(dates) if d >= bases[-1]]
+
+
+def reconstruct_snapshot(db, date_string):
+    """
+    Yield (questionId, data) for the catalogue as archived on ``date_string``.
+
+    Uses the manifest for the latest archive date, otherwise walks the
+    chain back to the base archive.
+    """
+    state = load_state(db)
+    if not state:
+        raise ValueError("No differential archive found")
+
+    if date_string >= state['lastDate']:
+        entries, _ = load_manifest(db, state['manifestShards'])
+        by_date = {}
+        for question_id, archive_date in entries.items():
+            by_date.setdefault(archive_date, []).append(question_id)
+        for archive_date, question_ids in sorted(by_date.items()):
+            collection = archive_collection(db, archive_date)
+            for start in range(0, len(question_ids), GET_ALL_CHUNK):
+                refs = [collection.document(qid) for qid in question_ids[start:start + GET_ALL_CHUNK]]
+                for snapshot in db.get_all(refs):
+                    if snapshot.exists:
+                        yield snapshot.id, snapshot.to_dict()
+        return
+
+    seen = set()
+    for archive_date in _chain_dates(state, date_string):
+        for snapshot in iter_documents(archive_collection(db, archive_date)):
+            if snapshot.id in seen:
+                continue
+            seen.add(snapshot.id)
+            data = snapshot.to_dict() or {}
+            if not data.get(TOMBSTONE_FIELD):
+                yield snapshot.id, data
@@ -0,0 +1,1167 @@
+#!/usr/bin/env python3
+"""
+In-process Firestore stand-in for benchmarks and offline runs.
+
+Implements the subset of google-cloud-firestore the scripts use:
+collections and subcollections, documents, write batches, transactions,
+queries (where / order_by / limit / cursors / select), collection groups
+and count/sum/avg aggregations, for both the sync and the asyncio
+client. Every RPC sleeps for a configurable latency (optionally with
+injected transient errors), so batching and concurrency changes show up
+in wall-clock numbers the way they would against a real project.
+
+This module doubles as the `sdk()` module in fake mode, which is why it
+exposes SERVER_TIMESTAMP, Increment, FieldFilter, transactional etc.
+Enable it with FIRESTORE_FAKE=1 (see firestore_client.py).
+"""
+
+import asyncio
+import bisect
+import copy
+import datetime
+import functools
+import random
+import string
+import threading
+import time
+import types
+
+MAX_BATCH_WRITES = 500
+MAX_TRANSACTION_ATTEMPTS = 5
+
+
+# --- Errors (mirrors google.api_core.exceptions) ---------------------------
+
+class GoogleAPICallError(Exception):
+    pass
+
+
+class Aborted(GoogleAPICallError):
+    pass
+
+
+class DeadlineExceeded(GoogleAPICallError):
+    pass
+
+
+class InternalServerError(GoogleAPICallError):
+    pass
+
+
+class ResourceExhausted(GoogleAPICallError):
+    pass
+
+
+class ServiceUnavailable(GoogleAPICallError):
+    pass
+
+
+class NotFound(GoogleAPICallError):
+    pass
+
+
+class AlreadyExists(GoogleAPICallError):
+    pass
+
+
+class InvalidArgument(GoogleAPICallError):
+    pass
+
+
+exceptions = types.SimpleNamespace(
+    GoogleAPICallError=GoogleAPICallError,
+    Aborted=Aborted,
+    DeadlineExceeded=DeadlineExceeded,
+    InternalServerError=InternalServerError,
+    ResourceExhausted=ResourceExhausted,
+    ServiceUnavailable=ServiceUnavailable,
+    NotFound=NotFound,
+    AlreadyExists=AlreadyExists,
+    InvalidArgument=InvalidArgument,
+)
+
+
+# --- Sentinels and transforms -----------------------------------------------
+
+class _Sentinel:
+    def __init__(self, name):
+        self._name = name
+
+    def __repr__(self):
+        return self._name
+
+
+SERVER_TIMESTAMP = _Sentinel('SERVER_TIMESTAMP')
+DELETE_FIELD = _Sentinel('DELETE_FIELD')
+
+
+class Increment:
+    def __init__(self, value):
+        self.value = value
+
+
+class ArrayUnion:
+    def __init__(self, values):
+        self.values = list(values)
+
+
+class ArrayRemove:
+    def __init__(self, values):
+        self.values = list(values)
+
+
+class FieldFilter:
+    def __init__(self, field_path, op_string, value=None):
+        self.field_path = field_path
+        self.op_string = op_string
+        self.value = value
+
+
+class Query:
+    ASCENDING = 'ASCENDING'
+    DESCENDING = 'DESCENDING'
+
+
+def _now():
+    return datetime.datetime.now(datetime.timezone.utc)
+
+
+def _split_path(field_path):
+    return field_path.split('.')
+
+
+def _get_field(data, field_path):
+    """Return (found, value) for a dotted field path."""
+    if field_path == '__name__':
+        raise KeyError(field_path)
+    value = data
+    for part in _split_path(field_path):
+        if not isinstance(value, dict) or part not in value:
+            return False, None
+        value = value[part]
+    return True, value
+
+
+def _copy_value(value):
+    """Deep copy for document data (maps, arrays and immutable scalars)."""
+    if isinstance(value, dict):
+        return {key: _copy_value(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_copy_value(item) for item in value]
+    return value
+
+
+def _resolve(value, current):
+    """Apply a sentinel/transform to the current stored value."""
+    if value is SERVER_TIMESTAMP:
+        return _now()
+    if isinstance(value, Increment):
+        base = current if isinstance(current, (int, float)) and not isinstance(current, bool) else 0
+        return base + value.value
+    if isinstance(value, ArrayUnion):
+        result = list(current) if isinstance(current, list) else []
+        result.extend(v for v in value.values if v not in result)
+        return result
+    if isinstance(value, ArrayRemove):
+        return [v for v in (current if isinstance(current, list) else []) if v not in value.values]
+    if isinstance(value, dict):
+        base = current if isinstance(current, dict) else {}
+        return {k: _resolve(v, base.get(k)) for k, v in value.items() if v is not DELETE_FIELD}
+    return _copy_value(value)
+
+
+def _merge(target, data):
+    for key, value in data.items():
+        if value is DELETE_FIELD:
+            target.pop(key, None)
+        elif isinstance(value, dict) and isinstance(target.get(key), dict):
+            _merge(target[key], value)
+        else:
+            target[key] = _resolve(value, target.get(key))
+
+
+def _set_path(target, field_path, value):
+    parts = _split_path(field_path)
+    for part in parts[:-1]:
+        if not isinstance(target.get(part), dict):
+            target[part] = {}
+        target = target[part]
+    if value is DELETE_FIELD:
+        target.pop(parts[-1], None)
+    else:
+        target[parts[-1]] = _resolve(value, target.get(parts[-1]))
+
+
+# Firestore orders values of different types by type first
+def _type_rank(value):
+    if value is None:
+        return 0
+    if isinstance(value, bool):
+        return 1
+    if isinstance(value, (int, float)):
+        return 2
+    if isinstance(value, datetime.datetime):
+        return 3
+    if isinstance(value, str):
+        return 4
+    if isinstance(value, bytes):
+        return 5
+    if isinstance(value, (DocumentReference,)):
+        return 6
+    if isinstance(value, list):
+        return 8
+    return 9
+
+
+def _norm(value):
+    """Sort key for one value: type rank first, then the value itself."""
+    rank = _type_rank(value)
+    if rank == 0:
+        return (0, 0)
+    if rank == 6:
+        return (6, value.path)
+    if rank in (8, 9):
+        return (rank, repr(value))
+    return (rank, value)
+
+
+def _compare(left, right, orders):
+    """Compare two lists of normalized values under the given directions."""
+    for a, b, (_, descending) in zip(left, right, orders):
+        if a != b:
+            result = -1 if a < b else 1
+            return -result if descending else result
+    return 0
+
+
+def _matches(found, value, op, expected):
+    if not found:
+        return False
+    if op == '==':
+        return _type_rank(value) == _type_rank(expected) and value == expected
+    if op == '!=':
+        return value is not None and not (_type_rank(value) == _type_rank(expected) and value == expected)
+    if op in ('<', '<=', '>', '>='):
+        if _type_rank(value) != _type_rank(expected):
+            return False
+        return {'<': value < expected, '<=': value <= expected,
+                '>': value > expected, '>=': value >= expected}[op]
+    if op == 'in':
+        return value in expected
+    if op == 'not-in':
+        return value is not None and value not in expected
+    if op == 'array-contains':
+        return isinstance(value, list) and expected in value
+    if op == 'array-contains-any':
+        return isinstance(value, list) and any(v in value for v in expected)
+    raise InvalidArgument(f"Unsupported operator: {op}")
+
+
+# --- Store --------------------------------------------------------------------
+
+class _StoredDoc:
+    __slots__ = ('data', 'create_time', 'update_time', 'version')
+
+    def __init__(self, data, create_time, update_time, version):
+        self.data = data
+        self.create_time = create_time
+        self.update_time = update_time
+        self.version = version
+
+
+class FakeStore:
+    """
+    The shared database state behind a sync and an async fake client.
+
+    ``latency`` is the simulated round trip per RPC in seconds and
+    ``failure_rate`` the probability that a commit raises a retryable
+    error before it is applied.
+    """
+
+    def __init__(self, latency=0.0, failure_rate=0.0, seed=None):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self._random = random.Random(seed)
+        self._collections = {}  # collection path -> {doc_id: _StoredDoc}
+        self._sorted_ids = {}   # collection path -> sorted doc IDs (lazily rebuilt)
+        self._sorted_groups = {}  # collection ID -> sorted path segment tuples
+        self._lock = threading.RLock()
+        self._version = 0
+        self.rpcs = {'get': 0, 'query': 0, 'commit': 0, 'aggregate': 0}
+        self.documents_read = 0
+        self.writes_applied = 0
+
+    # -- RPC accounting --
+    def count_read(self, documents):
+        with self._lock:
+            self.documents_read += documents
+
+    def _count(self, kind, documents=0):
+        with self._lock:
+            self.rpcs[kind] += 1
+            self.documents_read += documents
+
+    def rpc(self, kind):
+        self._count(kind)
+        if self.latency:
+            time.sleep(self.latency)
+
+    async def rpc_async(self, kind):
+        self._count(kind)
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    def reset_stats(self):
+        with self._lock:
+            self.rpcs = dict.fromkeys(self.rpcs, 0)
+            self.documents_read = 0
+            self.writes_applied = 0
+
+    def stats(self):
+        with self._lock:
+            return {'rpcs': dict(self.rpcs), 'documents_read': self.documents_read,
+                    'writes_applied': self.writes_applied}
+
+    # -- Reads --
+    def lookup(self, path):
+        collection_path, doc_id = path.rsplit('/', 1)
+        with self._lock:
+            stored = self._collections.get(collection_path, {}).get(doc_id)
+            self.documents_read += 1 if stored else 0
+            return stored
+
+    def collection_docs(self, collection_path):
+        with self._lock:
+            return list(self._collections.get(collection_path, {}).items())
+
+    def sorted_ids(self, collection_path):
+        """Document IDs of a collection in order, cached until a doc is added or removed."""
+        with self._lock:
+            ids = self._sorted_ids.get(collection_path)
+            if ids is None:
+                ids = sorted(self._collections.get(collection_path, {}))
+                self._sorted_ids[collection_path] = ids
+            return ids
+
+    def sorted_group_paths(self, collection_id):
+        """Paths of a collection group as segment tuples in document-name order (cached)."""
+        with self._lock:
+            keys = self._sorted_groups.get(collection_id)
+            if keys is None:
+                keys = sorted(tuple(f"{collection_path}/{doc_id}".split('/'))
+                              for collection_path, docs in self._collections.items()
+                              if collection_path.rsplit('/', 1)[-1] == collection_id
+                              for doc_id in docs)
+                self._sorted_groups[collection_id] = keys
+            return keys
+
+    def group_docs(self, collection_id):
+        with self._lock:
+            result = []
+            for collection_path, docs in self._collections.items():
+                if collection_path.rsplit('/', 1)[-1] == collection_id:
+                    result.extend((f"{collection_path}/{doc_id}", stored)
+                                  for doc_id, stored in docs.items())
+            return result
+
+    def subcollection_ids(self, parent_path):
+        prefix = f"{parent_path}/" if parent_path else ''
+        with self._lock:
+            ids = set()
+            for collection_path, docs in self._collections.items():
+                if not docs or not collection_path.startswith(prefix):
+                    continue
+                rest = collection_path[len(prefix):]
+                if '/' not in rest:
+                    ids.add(rest)
+            return sorted(ids)
+
+    # -- Writes --
+    def maybe_fail(self, errors=(Aborted, ServiceUnavailable, DeadlineExceeded)):
+        if self.failure_rate and self._random.random() < self.failure_rate:
+            raise self._random.choice(errors)("Simulated transient error")
+
+    def apply(self, writes, read_versions=None):
+        """Apply (op, path, data, merge) writes atomically."""
+        if len(writes) > MAX_BATCH_WRITES:
+            raise InvalidArgument(f"maximum {MAX_BATCH_WRITES} writes allowed per request")
+        with self._lock:
+            for path, version in (read_versions or {}).items():
+                stored = self.lookup_unlocked(path)
+                if (stored.version if stored else None) != version:
+                    raise Aborted("Transaction contention on " + path)
+
+            now = _now()
+            self._version += 1
+            staged = {}
+            for op, path, data, merge in writes:
+                collection_path, doc_id = path.rsplit('/', 1)
+                if path in staged:
+                    current = staged[path]
+                else:
+                    stored = self.lookup_unlocked(path)
+                    current = _copy_value(stored.data) if stored else None
+                if op == 'create':
+                    if current is not None:
+                        raise AlreadyExists(f"Document already exists: {path}")
+                    current = _resolve(data, None)
+                elif op == 'set':
+                    if merge and current is not None:
+                        _merge(current, data)
+                    else:
+                        current = {}
+                        _merge(current, data)
+                elif op == 'update':
+                    if current is None:
+                        raise NotFound(f"No document to update: {path}")
+                    for field_path, value in data.items():
+                        _set_path(current, field_path, value)
+                elif op == 'delete':
+                    current = None
+                else:
+                    raise InvalidArgument(f"Unknown write operation: {op}")
+                staged[path] = current
+
+            for path, data in staged.items():
+                collection_path, doc_id = path.rsplit('/', 1)
+                docs = self._collections.setdefault(collection_path, {})
+                previous = docs.get(doc_id)
+                if (previous is None) != (data is None):
+                    self._sorted_ids.pop(collection_path, None)
+                    self._sorted_groups.pop(collection_path.rsplit('/', 1)[-1], None)
+                if data is None:
+                    docs.pop(doc_id, None)
+                    continue
+                docs[doc_id] = _StoredDoc(data, previous.create_time if previous else now,
+                                          now, self._version)
+            self.writes_applied += len(writes)
+            return now
+
+    def lookup_unlocked(self, path):
+        collection_path, doc_id = path.rsplit('/', 1)
+        return self._collections.get(collection_path, {}).get(doc_id)
+
+
+# --- Snapshots and references ------------------------------------------------
+
+class DocumentSnapshot:
+    def __init__(self, reference, stored, field_paths=None):
+        self.reference = reference
+        self.exists = stored is not None
+        self.create_time = stored.create_time if stored else None
+        self.update_time = stored.update_time if stored else None
+        self._version = stored.version if stored else None
+        self._data = None
+        if stored is not None:
+            if field_paths is None:
+                # Stored data is replaced on write, never mutated, so it can be shared
+                self._data = stored.data
+            else:
+                self._data = {}
+                for field_path in field_paths:
+                    if field_path == '__name__':
+                        continue
+                    found, value = _get_field(stored.data, field_path)
+                    if found:
+                        _set_path(self._data, field_path, value)
+
+    @property
+    def id(self):
+        return self.reference.id
+
+    def to_dict(self):
+        return _copy_value(self._data) if self.exists else None
+
+    def get(self, field_path):
+        found, value = _get_field(self._data or {}, field_path)
+        if not found:
+            raise KeyError(field_path)
+        return _copy_value(value)
+
+
+def _auto_id():
+    return ''.join(random.choices(string.ascii_letters + string.digits, k=20))
+
+
+class DocumentReference:
+    def __init__(self, client, path):
+        self._client = client
+        self.path = path
+
+    @property
+    def id(self):
+        return self.path.rsplit('/', 1)[-1]
+
+    @property
+    def parent(self):
+        return self._client.collection(self.path.rsplit('/', 1)[0])
+
+    def collection(self, collection_id):
+        return self._client.collection(f"{self.path}/{collection_id}")
+
+    def __eq__(self, other):
+        return isinstance(other, DocumentReference) and other.path == self.path
+
+    def __hash__(self):
+        return hash(self.path)
+
+    def __repr__(self):
+        return f"<DocumentReference {self.path}>"
+
+    def _snapshot(self, field_paths=None, transaction=None):
+        stored = self._client._store.lookup(self.path)
+        if transaction is not None:
+            transaction._read_versions.setdefault(self.path, stored.version if stored else None)
+        return DocumentSnapshot(self, stored, field_paths)
+
+    def get(self, field_paths=None, transaction=None):
+        self._client._store.rpc('get')
+        return self._snapshot(field_paths, transaction)
+
+    def set(self, document_data, merge=False):
+        return self._client.batch().set(self, document_data, merge=merge).commit()[0]
+
+    def create(self, document_data):
+        return self._client.batch().create(self, document_data).commit()[0]
+
+    def update(self, field_updates):
+        return self._client.batch().update(self, field_updates).commit()[0]
+
+    def delete(self):
+        return self._client.batch().delete(self).commit()[0]
+
+    def collections(self):
+        self._client._store.rpc('query')
+        return [self.collection(cid) for cid in self._client._store.subcollection_ids(self.path)]
+
+
+class AsyncDocumentReference(DocumentReference):
+    async def get(self, field_paths=None, transaction=None):
+        await self._client._store.rpc_async('get')
+        return self._snapshot(field_paths, transaction)
+
+    async def set(self, document_data, merge=False):
+        return (await self._client.batch().set(self, document_data, merge=merge).commit())[0]
+
+    async def create(self, document_data):
+        return (await self._client.batch().create(self, document_data).commit())[0]
+
+    async def update(self, field_updates):
+        return (await self._client.batch().update(self, field_updates).commit())[0]
+
+    async def delete(self):
+        return (await self._client.batch().delete(self).commit())[0]
+
+    async def collections(self):
+        await self._client._store.rpc_async('query')
+        for cid in self._client._store.subcollection_ids(self.path):
+            yield self.collection(cid)
+
+
+# --- Queries ------------------------------------------------------------------
+
+class AggregationResult:
+    def __init__(self, alias, value):
+        self.alias = alias
+        self.value = value
+
+
+class BaseQuery:
+    def __init__(self, client, collection_path=None, collection_id=None, all_descendants=False):
+        self._client = client
+        self._collection_path = collection_path
+        self._collection_id = collection_id
+        self._all_descendants = all_descendants
+        self._filters = []
+        self._orders = []
+        self._limit = None
+        self._limit_to_last = False
+        self._offset = 0
+        self._start = None
+        self._end = None
+        self._projection = None
+
+    def _copy(self, **changes):
+        query = copy.copy(self)
+        query._filters = list(self._filters)
+        query._orders = list(self._orders)
+        for name, value in changes.items():
+            setattr(query, name, value)
+        return query
+
+    # -- Builders --
+    def where(self, field_path=None, op_string=None, value=None, filter=None):
+        if filter is None:
+            filter = FieldFilter(field_path, op_string, value)
+        query = self._copy()
+        query._filters.append(filter)
+        return query
+
+    def order_by(self, field_path, direction=Query.ASCENDING):
+        query = self._copy()
+        query._orders.append((field_path, direction == Query.DESCENDING))
+        return query
+
+    def limit(self, count):
+        return self._copy(_limit=count, _limit_to_last=False)
+
+    def limit_to_last(self, count):
+        return self._copy(_limit=count, _limit_to_last=True)
+
+    def offset(self, num_to_skip):
+        return self._copy(_offset=num_to_skip)
+
+    def select(self, field_paths):
+        # Like the SDK, an empty projection returns whole documents; select(['__name__']) for IDs
+        return self._copy(_projection=list(field_paths) or None)
+
+    def start_at(self, values):
+        return self._copy(_start=(values, True))
+
+    def start_after(self, values):
+        return self._copy(_start=(values, False))
+
+    def end_at(self, values):
+        return self._copy(_end=(values, True))
+
+    def end_before(self, values):
+        return self._copy(_end=(values, False))
+
+    def count(self, alias=None):
+        return AggregationQuery(self).count(alias)
+
+    def sum(self, field_ref, alias=None):
+        return AggregationQuery(self).sum(field_ref, alias)
+
+    def avg(self, field_ref, alias=None):
+        return AggregationQuery(self).avg(field_ref, alias)
+
+    # -- Execution --
+    def _candidates(self):
+        store = self._client._store
+        if self._all_descendants:
+            return store.group_docs(self._collection_id)
+        return [(f"{self._collection_path}/{doc_id}", stored)
+                for doc_id, stored in store.collection_docs(self._collection_path)]
+
+    def _effective_orders(self):
+        orders = list(self._orders)
+        # Inequality filters order by their field first, like Firestore does
+        for flt in self._filters:
+            if flt.op_string in ('<', '<=', '>', '>=', '!=', 'not-in') and \
+                    flt.field_path not in [field for field, _ in orders]:
+                orders.insert(0, (flt.field_path, False))
+        if '__name__' not in [field for field, _ in orders]:
+            orders.append(('__name__', orders[-1][1] if orders else False))
+        return orders
+
+    def _sort_key(self, path, data, orders):
+        return [_norm(path) if field_path == '__name__' else _norm(_get_field(data, field_path)[1])
+                for field_path, _ in orders]
+
+    def _cursor_key(self, cursor, orders):
+        values, _ = cursor
+        if isinstance(values, DocumentSnapshot):
+            return self._sort_key(values.reference.path, values._data or {}, orders)
+        if isinstance(values, dict):
+            values = [values.get(field) for field, _ in orders if field != '__name__']
+        key = []
+        for (field_path, descending), value in zip(orders, values):
+            if field_path == '__name__' and isinstance(value, str):
+                value = value if '/' in value else f"{self._collection_path}/{value}"
+            elif isinstance(value, DocumentReference):
+                value = value.path
+            key.append(_norm(value))
+        return key
+
+    def _name_cursor_id(self, cursor):
+        """Document ID of a name cursor inside this collection, else None."""
+        path = self._cursor_key(cursor, [('__name__', False)])[0][1]
+        parent, _, doc_id = path.rpartition('/')
+        return doc_id if parent == self._collection_path else None
+
+    def _name_cursor_key(self, cursor):
+        if self._all_descendants:
+            return tuple(self._cursor_key(cursor, [('__name__', False)])[0][1].split('/'))
+        return self._name_cursor_id(cursor)
+
+    def _execute_by_name(self):
+        """Fast path for ascending document-name scans (paged reads of a collection or group)."""
+        store = self._client._store
+        if self._all_descendants:
+            keys = store.sorted_group_paths(self._collection_id)
+        else:
+            keys = store.sorted_ids(self._collection_path)
+        position, end = 0, len(keys)
+        if self._start is not None:
+            key = self._name_cursor_key(self._start)
+            position = (bisect.bisect_left if self._start[1] else bisect.bisect_right)(keys, key)
+        if self._end is not None:
+            key = self._name_cursor_key(self._end)
+            end = (bisect.bisect_right if self._end[1] else bisect.bisect_left)(keys, key)
+
+        wanted = None if self._limit is None else self._offset + self._limit
+        rows = []
+        for key in keys[position:end]:
+            path = '/'.join(key) if self._all_descendants else f"{self._collection_path}/{key}"
+            stored = store.lookup_unlocked(path)
+            if stored is None:
+                continue
+            if all(self._filter_matches(path, stored.data, flt) for flt in self._filters):
+                rows.append((path, stored))
+                if wanted is not None and len(rows) >= wanted:
+                    break
+        return rows[self._offset:]
+
+    def _execute(self):
+        orders = self._effective_orders()
+        if (orders == [('__name__', False)] and not self._limit_to_last
+                and (self._all_descendants
+                     or all(cursor is None or self._name_cursor_id(cursor) is not None
+                            for cursor in (self._start, self._end)))):
+            return self._execute_by_name()
+
+        rows = []
+        for path, stored in self._candidates():
+            data = stored.data
+            if not all(self._filter_matches(path, data, flt) for flt in self._filters):
+                continue
+            # Documents missing an order_by field are not returned
+            if any(field != '__name__' and not _get_field(data, field)[0] for field, _ in orders):
+                continue
+            rows.append((self._sort_key(path, data, orders), path, stored))
+        # Stable sorts from the last order field to the first
+        for position in reversed(range(len(orders))):
+            rows.sort(key=lambda row: row[0][position], reverse=orders[position][1])
+
+        if self._start is not None:
+            start = self._cursor_key(self._start, orders)
+            inclusive = self._start[1]
+            rows = [row for row in rows
+                    if _compare(row[0], start, orders) > (-1 if inclusive else 0)]
+        if self._end is not None:
+            end = self._cursor_key(self._end, orders)
+            inclusive = self._end[1]
+            rows = [row for row in rows
+                    if _compare(row[0], end, orders) < (1 if inclusive else 0)]
+
+        rows = rows[self._offset:]
+        if self._limit is not None:
+            rows = rows[-self._limit:] if self._limit_to_last else rows[:self._limit]
+        return [(path, stored) for _, path, stored in rows]
+
+    def _filter_matches(self, path, data, flt):
+        if flt.field_path == '__name__':
+            expected = flt.value.path if isinstance(flt.value, DocumentReference) else flt.value
+            return _matches(True, path, flt.op_string, expected)
+        found, value = _get_field(data, flt.field_path)
+        return _matches(found, value, flt.op_string, flt.value)
+
+    def _snapshots(self):
+        results = self._execute()
+        self._client._store.count_read(len(results))
+        return [DocumentSnapshot(self._client.document(path), stored, self._projection)
+                for path, stored in results]
+
+    def get(self, transaction=None):
+        self._client._store.rpc('query')
+        return self._snapshots()
+
+    def stream(self, transaction=None):
+        return iter(self.get(transaction=transaction))
+
+    def get_partitions(self, partition_count):
+        """Split the query into ``partition_count`` cursor ranges (by document path)."""
+        self._client._store.rpc('query')
+        name_key = lambda path: path.split('/')
+        paths = sorted((path for path, _ in self._candidates()), key=name_key)
+        if partition_count <= 1 or len(paths) < 2:
+            return [QueryPartition(self, None, None)]
+        step = len(paths) / partition_count
+        bounds = sorted({paths[int(i * step)] for i in range(1, partition_count)}, key=name_key)
+        refs = [None] + [self._client.document(path) for path in bounds] + [None]
+        return [QueryPartition(self, refs[i], refs[i + 1]) for i in range(len(refs) - 1)]
+
+
+class QueryPartition:
+    def __init__(self, query, start_at, end_at):
+        self._query = query
+        self.start_at = start_at
+        self.end_at = end_at
+
+    def query(self):
+        query = self._query.order_by('__name__')
+        if self.start_at is not None:
+            query = query.start_at([self.start_at])
+        if self.end_at is not None:
+            query = query.end_before([self.end_at])
+        return query
+
+
+class CollectionReference(BaseQuery):
+    def __init__(self, client, path):
+        super().__init__(client, collection_path=path)
+        self._path = path
+
+    @property
+    def id(self):
+        return self._path.rsplit('/', 1)[-1]
+
+    def document(self, document_id=None):
+        return self._client.document(f"{self._path}/{document_id or _auto_id()}")
+
+    def add(self, document_data):
+        ref = self.document()
+        return ref.set(document_data), ref
+
+    def list_documents(self, page_size=None):
+        self._client._store.rpc('query')
+        return [self.document(doc_id) for doc_id, _ in self._client._store.collection_docs(self._path)]
+
+
+class AggregationQuery:
+    def __init__(self, query):
+        self._query = query
+        self._aggregations = []
+
+    def count(self, alias=None):
+        self._aggregations.append(('count', None, alias or 'field_1'))
+        return self
+
+    def sum(self, field_ref, alias=None):
+        self._aggregations.append(('sum', field_ref, alias or f"field_{len(self._aggregations) + 1}"))
+        return self
+
+    def avg(self, field_ref, alias=None):
+        self._aggregations.append(('avg', field_ref, alias or f"field_{len(self._aggregations) + 1}"))
+        return self
+
+    def _results(self):
+        rows = [stored.data for _, stored in self._query._execute()]
+        results = []
+        for kind, field_path, alias in self._aggregations:
+            if kind == 'count':
+                value = len(rows)
+            else:
+                numbers = [v for found, v in (_get_field(row, field_path) for row in rows)
+                           if found and _type_rank(v) == 2]
+                if kind == 'sum':
+                    value = sum(numbers)
+                else:
+                    value = sum(numbers) / len(numbers) if numbers else None
+            results.append(AggregationResult(alias, value))
+        return [results]
+
+    def get(self, transaction=None):
+        self._query._client._store.rpc('aggregate')
+        return self._results()
+
+    def stream(self, transaction=None):
+        return iter(self.get(transaction=transaction))
+
+
+class AsyncQueryMixin:
+    async def get(self, transaction=None):
+        await self._client._store.rpc_async('query')
+        return self._snapshots()
+
+    async def stream(self, transaction=None):
+        for snapshot in await self.get(transaction=transaction):
+            yield snapshot
+
+    def count(self, alias=None):
+        return AsyncAggregationQuery(self).count(alias)
+
+    def sum(self, field_ref, alias=None):
+        return AsyncAggregationQuery(self).sum(field_ref, alias)
+
+    def avg(self, field_ref, alias=None):
+        return AsyncAggregationQuery(self).avg(field_ref, alias)
+
+
+class AsyncQuery(AsyncQueryMixin, BaseQuery):
+    pass
+
+
+class AsyncCollectionReference(AsyncQueryMixin, CollectionReference):
+    async def add(self, document_data):
+        ref = self.document()
+        return await ref.set(document_data), ref
+
+    async def list_documents(self, page_size=None):
+        await self._client._store.rpc_async('query')
+        for doc_id, _ in self._client._store.collection_docs(self._path):
+            yield self.document(doc_id)
+
+
+class AsyncAggregationQuery(AggregationQuery):
+    async def get(self, transaction=None):
+        await self._query._client._store.rpc_async('aggregate')
+        return self._results()
+
+
+# --- Batches and transactions ---------------------------------------------------
+
+class WriteResult:
+    def __init__(self, update_time):
+        self.update_time = update_time
+
+
+class WriteBatch:
+    def __init__(self, client):
+        self._client = client
+        self._writes = []
+
+    def __len__(self):
+        return len(self._writes)
+
+    def set(self, reference, document_data, merge=False):
+        self._writes.append(('set', reference.path, document_data, merge))
+        return self
+
+    def create(self, reference, document_data):
+        self._writes.append(('create', reference.path, document_data, False))
+        return self
+
+    def update(self, reference, field_updates):
+        self._writes.append(('update', reference.path, field_updates, False))
+        return self
+
+    def delete(self, reference):
+        self._writes.append(('delete', reference.path, None, False))
+        return self
+
+    def _apply(self, read_versions=None):
+        store = self._client._store
+        # The SDK retries transaction commits internally, so only contention surfaces
+        store.maybe_fail((Aborted,) if read_versions is not None else
+                         (Aborted, ServiceUnavailable, DeadlineExceeded))
+        update_time = store.apply(self._writes, read_versions)
+        return [WriteResult(update_time) for _ in self._writes]
+
+    def commit(self):
+        self._client._store.rpc('commit')
+        return self._apply()
+
+
+class AsyncWriteBatch(WriteBatch):
+    async def commit(self):
+        await self._client._store.rpc_async('commit')
+        return self._apply()
+
+
+class Transaction(WriteBatch):
+    def __init__(self, client):
+        super().__init__(client)
+        self._read_versions = {}
+
+    def _reset(self):
+        self._writes = []
+        self._read_versions = {}
+
+    def _commit(self):
+        self._client._store.rpc('commit')
+        return self._apply(self._read_versions)
+
+
+class AsyncTransaction(Transaction):
+    async def _commit(self):
+        await self._client._store.rpc_async('commit')
+        return self._apply(self._read_versions)
+
+
+def transactional(to_wrap):
+    """Run ``to_wrap(transaction, ...)`` and commit, retrying on contention."""
+    @functools.wraps(to_wrap)
+    def wrapper(transaction, *args, **kwargs):
+        for attempt in range(MAX_TRANSACTION_ATTEMPTS):
+            transaction._reset()
+            result = to_wrap(transaction, *args, **kwargs)
+            try:
+                transaction._commit()
+                return result
+            except Aborted:
+                if attempt == MAX_TRANSACTION_ATTEMPTS - 1:
+                    raise
+    return wrapper
+
+
+def async_transactional(to_wrap):
+    """Async counterpart of transactional()."""
+    @functools.wraps(to_wrap)
+    async def wrapper(transaction, *args, **kwargs):
+        for attempt in range(MAX_TRANSACTION_ATTEMPTS):
+            transaction._reset()
+            result = await to_wrap(transaction, *args, **kwargs)
+            try:
+                await transaction._commit()
+                return result
+            except Aborted:
+                if attempt == MAX_TRANSACTION_ATTEMPTS - 1:
+                    raise
+    return wrapper
+
+
+# --- Clients --------------------------------------------------------------------
+
+class Client:
+    """Sync fake client; several clients can share one FakeStore."""
+    _document_class = DocumentReference
+    _collection_class = CollectionReference
+    _query_class = BaseQuery
+    _batch_class = WriteBatch
+    _transaction_class = Transaction
+
+    def __init__(self, store=None):
+        self._store = store or FakeStore()
+
+    def collection(self, path):
+        return self._collection_class(self, path.strip('/'))
+
+    def document(self, path):
+        return self._document_class(self, path.strip('/'))
+
+    def collection_group(self, collection_id):
+        return self._query_class(self, collection_id=collection_id, all_descendants=True)
+
+    def collections(self):
+        self._store.rpc('query')
+        return [self.collection(cid) for cid in self._store.subcollection_ids('')]
+
+    def batch(self):
+        return self._batch_class(self)
+
+    def bulk_writer(self):
+        raise NotImplementedError("bulk_writer is not supported by the fake client")
+
+    def transaction(self, **kwargs):
+        return self._transaction_class(self)
+
+    def get_all(self, references, field_paths=None, transaction=None):
+        self._store.rpc('get')
+        return [ref._snapshot(field_paths, transaction) for ref in references]
+
+
+class AsyncClient(Client):
+    _document_class = AsyncDocumentReference
+    _collection_class = AsyncCollectionReference
+    _query_class = AsyncQuery
+    _batch_class = AsyncWriteBatch
+    _transaction_class = AsyncTransaction
+
+    async def collections(self):
+        await self._store.rpc_async('query')
+        for cid in self._store.subcollection_ids(''):
+            yield self.collection(cid)
+
+    async def get_all(self, references, field_paths=None, transaction=None):
+        await self._store.rpc_async('get')
+        for ref in references:
+            yield ref._snapshot(field_paths, transaction)
+
+
+# --- Synthetic data --------------------------------------------------------------
+
+SYNTHETIC_CATEGORIES = ('motorik', 'schwangerschaft', 'buerokratisches', 'ernaehrung', 'schlaf')
+
+
+def synthetic_question(index):
+    """A question shaped like the catalogue entries in upload_questions.py."""
+    category_id = SYNTHETIC_CATEGORIES[index % len(SYNTHETIC_CATEGORIES)]
+    return {
+        'categoryId': category_id,
+        'text': f"Synthetische Frage {index} zu {category_id}?",
+        'options': [f"Antwort {index}-{option}" for option in range(4)],
+        'correctIndices': [index % 4],
+        'explanation': f"Erklärung zu Frage {index}. " * 4,
+        'tips': f"Tipp zu Frage {index}.",
+        'sourceLabel': 'Synthetic benchmark data',
+        'sourceUrl': None,
+        'difficulty': 1 + index % 3,
+        'isActive': True,
+    }
+
+
+def seed_questions(store, count, source='synthetic', seed=0):
+    """
+    Fill ``store`` with ``count`` pool-ready questions plus categories and
+    metadata/questions. Writes go straight to the store (no latency).
+    """
+    rng = random.Random(seed)
+    now = _now()
+    counters = {}
+    writes = []
+    for index in range(count):
+        question = synthetic_question(index)
+        question.update({
+            'source': source,
+            'sequence': index + 1,
+            'randomSeed': rng.random(),
+            'createdAt': now,
+            'updatedAt': now,
+        })
+        counters[question['categoryId']] = counters.get(question['categoryId'], 0) + 1
+        writes.append(('set', f"questions/q{index:07d}", question, False))
+        if len(writes) == MAX_BATCH_WRITES:
+            store.apply(writes)
+            writes = []
+
+    for order, category_id in enumerate(SYNTHETIC_CATEGORIES, start=1):
+        writes.append(('set', f"categories/{category_id}", {
+            'title': category_id.capitalize(),
+            'order': order,
+            'isPremium': False,
+            'questionCounter': counters.get(category_id, 0),
+        }, False))
+    writes.append(('set', 'metadata/questions', {
+        'maxSequence': count,
+        'totalQuestions': count,
+        'createdAt': now,
+        'updatedAt': now,
+    }, False))
+    store.apply(writes)
+    return count
+
+
+def seed_question_states(store, users, per_user=20, questions=None, seed=0):
+    """
+    Fill ``store`` with ``users`` user documents, each with ``per_user``
+    questionStates shaped like QuestionState.toMap() in the app. Roughly
+    a third of the states are still unseen (no lastSeenAt).
+    """
+    rng = random.Random(seed)
+    now = _now()
+    questions = questions or max(per_user, 1000)
+    writes = []
+    total = 0
+
+    def add(path, data):
+        if len(writes) == MAX_BATCH_WRITES:
+            store.apply(writes)
+            writes.clear()
+        writes.append(('set', path, data, False))
+
+    for user in range(users):
+        user_path = f"users/u{user:06d}"
+        add(user_path, {'displayName': f"User {user}", 'createdAt': now})
+        for index in rng.sample(range(questions), min(per_user, questions)):
+            question = synthetic_question(index)
+            seen = rng.random() > 0.35
+            seen_count = rng.randint(1, 6) if seen else 0
+            add(f"{user_path}/questionStates/q{index:07d}", {
+                'questionId': f"q{index:07d}",
+                'seenCount': seen_count,
+                'correctCount': rng.randint(0, seen_count),
+                'lastSeenAt': now - datetime.timedelta(minutes=rng.randint(10, 60 * 24 * 30)) if seen else None,
+                'mastered': seen_count >= 4,
+                'categoryId': question['categoryId'],
+                'difficulty': str(question['difficulty']),
+                'randomSeed': rng.random(),
+                'sequence': index + 1,
+                'addedToPoolAt': now - datetime.timedelta(days=rng.randint(31, 90)),
+                'poolBatch': 1,
+            })
+            total += 1
+    if writes:
+        store.apply(writes)
+    return total
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Shared Firestore client for the upload and maintenance scripts.
+
+firebase_admin and google-cloud-firestore take a noticeable time to
+import (gRPC, protobuf, auth), so nothing is imported until a command
+actually touches Firestore: `--help` and pure local work stay instant.
+The client is created once per process and reused by every command,
+which keeps a single gRPC channel open.
+
+Credentials are looked up in this order:
+  1. cred.json / serviceAccountKey.json in the working directory
+  2. cred.json / serviceAccountKey.json in the project root
+  3. GOOGLE_APPLICATION_CREDENTIALS / application default credentials
+
+Set FIRESTORE_FAKE=1 to run any script against the in-memory fake in
+fake_firestore.py instead (no credentials, no network):
+  FIRESTORE_FAKE_LATENCY_MS   simulated round trip per RPC (default 0)
+  FIRESTORE_FAKE_FAILURE_RATE share of commits failing transiently (default 0)
+  FIRESTORE_FAKE_QUESTIONS    synthetic questions to seed (default 0)
+  FIRESTORE_FAKE_USERS        synthetic users with 20 questionStates each (default 0)
+"""
+
+import os
+import time
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(SCRIPTS_DIR)
+CREDENTIAL_FILES = ('cred.json', 'serviceAccountKey.json')
+
+# Seconds spent in each startup phase: 'import', 'auth', 'first_rpc'
+TIMINGS = {}
+
+_sdk = None
+_client = None
+_async_client = None
+_fake_store = None
+
+
+def _env_flag(name):
+    return os.environ.get(name, '').strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+def use_fake(latency=0.0, failure_rate=0.0, questions=0, users=0, states_per_user=20):
+    """
+    Switch this process to a fresh in-memory fake and return its store.
+
+    Any client handed out before is dropped, so each call starts from an
+    empty (or freshly seeded) database.
+    """
+    global _sdk, _client, _async_client, _fake_store
+    import fake_firestore
+
+    _fake_store = fake_firestore.FakeStore(latency=latency, failure_rate=failure_rate)
+    if questions:
+        fake_firestore.seed_questions(_fake_store, questions)
+    if users:
+        fake_firestore.seed_question_states(_fake_store, users, states_per_user, questions or None)
+    _sdk = fake_firestore
+    _client = _async_client = None
+    TIMINGS.clear()
+    return _fake_store
+
+
+def fake_store():
+    """The active FakeStore, enabling fake mode from the environment if requested."""
+    if _fake_store is None and _env_flag('FIRESTORE_FAKE'):
+        use_fake(latency=float(os.environ.get('FIRESTORE_FAKE_LATENCY_MS', 0)) / 1000,
+                 failure_rate=float(os.environ.get('FIRESTORE_FAKE_FAILURE_RATE', 0)),
+                 questions=int(os.environ.get('FIRESTORE_FAKE_QUESTIONS', 0)),
+                 users=int(os.environ.get('FIRESTORE_FAKE_USERS', 0)))
+    return _fake_store
+
+
+def sdk():
+    """
+    The google.cloud.firestore module, imported on first use
+    (fake_firestore in fake mode).
+
+    Gives access to SERVER_TIMESTAMP, Increment, FieldFilter,
+    transactional, Query etc. without importing at module load.
+    """
+    global _sdk
+    if _sdk is None and fake_store() is None:
+        start = time.perf_counter()
+        import firebase_admin  # noqa: F401  (warms the shared import cost)
+        from google.cloud import firestore
+        _sdk = firestore
+        TIMINGS['import'] = time.perf_counter() - start
+    return _sdk
+
+
+def api_exceptions():
+    """The google.api_core.exceptions module, imported on first use."""
+    if fake_store() is not None:
+        import fake_firestore
+        return fake_firestore.exceptions
+    from google.api_core import exceptions
+    return exceptions
+
+
+def find_credentials_file():
+    """Return the first service account key file found, or None."""
+    for directory in (os.getcwd(), PROJECT_ROOT):
+        for name in CREDENTIAL_FILES:
+            path = os.path.join(directory, name)
+            if os.path.exists(path):
+                return path
+    return None
+
+
+def _initialize_app():
+    """Initialize the default firebase_admin app once per process."""
+    import firebase_admin
+    from firebase_admin import credentials
+
+    try:
+        return firebase_admin.get_app()
+    except ValueError:
+        pass
+
+    cred_path = find_credentials_file()
+    if cred_path:
+        app = firebase_admin.initialize_app(credentials.Certificate(cred_path))
+        print(f"✅ Loaded credentials from {os.path.relpath(cred_path)}")
+        return app
+
+    import google.auth
+    from google.auth.exceptions import DefaultCredentialsError
+    try:
+        google.auth.default()
+    except DefaultCredentialsError as e:
+        raise FileNotFoundError(
+            "No Firebase credentials found (cred.json, serviceAccountKey.json "
+            "or application default credentials)") from e
+    app = firebase_admin.initialize_app()
+    print("✅ Using application default credentials")
+    return app
+
+
+def get_client():
+    """Return the process-wide Firestore client, initializing it once."""
+    global _client
+    if _client is not None:
+        return _client
+
+    store = fake_store()
+    if store is not None:
+        _client = sdk().Client(store)
+        return _client
+
+    sdk()
+    start = time.perf_counter()
+    from firebase_admin import firestore
+
+    _initialize_app()
+    _client = firestore.client()
+    TIMINGS['auth'] = time.perf_counter() - start
+    return _client
+
+
+def get_async_client():
+    """Return the process-wide asyncio Firestore client."""
+    global _async_client
+    if _async_client is not None:
+        return _async_client
+
+    store = fake_store()
+    if store is not None:
+        _async_client = sdk().AsyncClient(store)
+        return _async_client
+
+    sdk()
+    start = time.perf_counter()
+    from firebase_admin import firestore_async
+
+    _initialize_app()
+    _async_client = firestore_async.client()
+    TIMINGS['auth'] = time.perf_counter() - start
+    return _async_client
+
+
+def connect():
+    """
+    Return the shared client after one lightweight round trip.
+
+    The warm-up read opens the gRPC channel up front and records how
+    long the first RPC took.
+    """
+    db = get_client()
+    if 'first_rpc' not in TIMINGS:
+        start = time.perf_counter()
+        db.collection('metadata').document('questions').get(field_paths=[])
+        TIMINGS['first_rpc'] = time.perf_counter() - start
+    return db
+
+
+async def connect_async():
+    """Async counterpart of connect()."""
+    db = get_async_client()
+    if 'first_rpc' not in TIMINGS:
+        start = time.perf_counter()
+        await db.collection('metadata').document('questions').get(field_paths=[])
+        TIMINGS['first_rpc'] = time.perf_counter() - start
+    return db
+
+
+def format_timings():
+    """One-line summary of the recorded startup phases."""
+    labels = (('import', 'import'), ('auth', 'auth'), ('first_rpc', 'first RPC'))
+    parts = [f"{label} {TIMINGS[key]:.2f}s" for key, label in labels if key in TIMINGS]
+    if parts and _fake_store is not None:
+        parts.append('in-memory fake')
+    return ', '.join(parts) if parts else 'no Firestore access'
+
+
+def print_timings():
+    print(f"⏱  Firestore startup: {format_timings()}")
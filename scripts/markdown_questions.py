@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Streaming compiler for question catalogues written in markdown.
+
+Reads a document such as Erziehungsapp.md in a single pass and turns it
+into question records ready for upload:
+
+    ## **3.1.Bürokratisches/ Hilfeinstanzen**     -> section / category
+    → Question text                                -> question (arrow optional)
+    - A) Option / - **C) Correct option**          -> options / correctIndices
+    Explanation ... **Quelle:** _Source_           -> explanation / sourceLabel
+    _Tipp: ..._                                    -> tips
+
+Every section is hashed while it is read, so callers can skip parsing
+(and uploading) sections whose text did not change since the last run.
+"""
+
+import hashlib
+import re
+
+# Bump when parsing rules change so stored section hashes are invalidated
+PARSER_VERSION = 1
+DEFAULT_DIFFICULTY = 2
+
+SECTION_RE = re.compile(r'^##\s+\**\s*(\d+(?:\.\d+)+)\.?\s*(.*?)\s*\**\s*$')
+OPTION_RE = re.compile(r'^\s*-\s+(\*\*)?\s*([A-H])\s*[).]\s*(.*?)\s*$')
+TIP_RE = re.compile(r'^[\s_\\*]*Tipp\s*[:;]\s*')
+SOURCE_RE = re.compile(r'(?:\*\*)?\s*Quellen?\s*:\s*(?:\*\*)?\s*')
+LEADING_LABEL_RE = re.compile(r'^(?:Erklärung\s*)?:\s*')
+ESCAPE_RE = re.compile(r'\\([!=\-<>*.#_\[\]()])')
+
+
+class Section:
+    """One '## ' section of the markdown document."""
+
+    def __init__(self, number, title):
+        self.number = number
+        self.title = title
+        self.lines = []
+        self._digest = hashlib.sha256(f"v{PARSER_VERSION}\n".encode('utf-8'))
+
+    def add_line(self, line):
+        self.lines.append(line)
+        self._digest.update(line.encode('utf-8'))
+
+    @property
+    def digest(self):
+        return self._digest.hexdigest()
+
+
+def clean_markdown(text):
+    """Strip emphasis markers and escapes, collapse whitespace."""
+    text = ESCAPE_RE.sub(r'\1', text)
+    text = text.replace('**', '').replace('*', '')
+    text = re.sub(r'(?<!\w)_|_(?!\w)', '', text)
+    return re.sub(r'\s+', ' ', text).strip()
+
+
+def slugify(title):
+    """Fallback category ID for sections without an explicit mapping."""
+    slug = title.lower()
+    for umlaut, replacement in (('ä', 'ae'), ('ö', 'oe'), ('ü', 'ue'), ('ß', 'ss')):
+        slug = slug.replace(umlaut, replacement)
+    slug = re.sub(r'[^a-z0-9]+', '_', slug).strip('_')
+    return slug.split('_')[0] if slug else 'unknown'
+
+
+def iter_sections(lines):
+    """Yield Section objects one at a time from an iterable of lines."""
+    section = None
+    for raw_line in lines:
+        line = raw_line.rstrip('\n')
+        match = SECTION_RE.match(line)
+        if match:
+            if section is not None:
+                yield section
+            section = Section(match.group(1), clean_markdown(match.group(2)))
+            section.add_line(line + '\n')
+        elif section is not None:
+            section.add_line(line + '\n')
+    if section is not None:
+        yield section
+
+
+class _QuestionBuilder:
+    def __init__(self, text):
+        self.text_parts = [text]
+        self.options = []
+        self.correct = []
+        self.explanation_parts = []
+        self.tip_parts = []
+        self.source = None
+        self.in_tips = False
+
+    def build(self, category_id):
+        explanation = clean_markdown(' '.join(self.explanation_parts))
+        explanation = LEADING_LABEL_RE.sub('', explanation)
+        tips = clean_markdown(' '.join(self.tip_parts))
+        source = clean_markdown(self.source or '').rstrip('.').strip()
+        return {
+            'categoryId': category_id,
+            'text': clean_markdown(' '.join(self.text_parts)).lstrip('→').strip(),
+            'options': self.options,
+            'correctIndices': self.correct,
+            'explanation': explanation,
+            'tips': tips or None,
+            'sourceLabel': source or None,
+            'sourceUrl': None,
+            'difficulty': DEFAULT_DIFFICULTY,
+            'isActive': True,
+        }
+
+
+def parse_section(section, category_id):
+    """
+    Yield question records for one section.
+
+    A question starts at a '→' line, or at the last paragraph before an
+    option list when the arrow is missing. Malformed entries (fewer than
+    two options or no bold answer) are reported and skipped.
+    """
+    current = None
+    state = 'idle'        # idle -> question -> options -> body
+    last_paragraph = None
+
+    def finish(builder):
+        if builder is None:
+            return None
+        question = builder.build(category_id)
+        if len(question['options']) < 2 or not question['correctIndices']:
+            print(f"  ⚠ Skipping malformed question in {section.number}: {question['text'][:60]}")
+            return None
+        return question
+
+    for line in section.lines[1:]:
+        stripped = line.strip()
+        if not stripped:
+            continue
+
+        if stripped.startswith('→'):
+            done = finish(current)
+            if done:
+                yield done
+            current = _QuestionBuilder(stripped[1:])
+            state = 'question'
+            continue
+
+        option = OPTION_RE.match(line)
+        if option:
+            if state == 'body' or current is None:
+                # New question without an arrow: its text is the last paragraph
+                done = finish(_drop_last_paragraph(current, last_paragraph))
+                if done:
+                    yield done
+                current = _QuestionBuilder(last_paragraph or '')
+            bold, _, text = option.groups()
+            if bold or text.endswith('**'):
+                current.correct.append(len(current.options))
+            current.options.append(clean_markdown(text))
+            state = 'options'
+            continue
+
+        last_paragraph = stripped
+        if current is None:
+            continue
+        if state == 'question':
+            current.text_parts.append(stripped)
+            continue
+
+        state = 'body'
+        tip = TIP_RE.match(stripped)
+        if tip or current.in_tips:
+            current.in_tips = True
+            current.tip_parts.append(stripped[tip.end():] if tip else stripped)
+            continue
+
+        source = SOURCE_RE.search(stripped)
+        if source and current.source is None:
+            current.explanation_parts.append(stripped[:source.start()])
+            current.source = stripped[source.end():]
+        else:
+            current.explanation_parts.append(stripped)
+
+    done = finish(current)
+    if done:
+        yield done
+
+
+def _drop_last_paragraph(builder, paragraph):
+    """Remove the paragraph that turned out to be the next question's text."""
+    if builder is None or paragraph is None:
+        return builder
+    for parts in (builder.tip_parts, builder.explanation_parts):
+        if parts and parts[-1] == paragraph:
+            parts.pop()
+            break
+    return builder
+
+
+def compile_markdown(path, section_categories=None, known_hashes=None):
+    """
+    Stream (section, category_id, questions) tuples from a markdown file.
+
+    ``section_categories`` maps section numbers ('3.1') to category IDs;
+    unmapped sections fall back to a slug of their title. ``questions`` is
+    None for sections whose digest matches ``known_hashes[number]``, so
+    unchanged sections are never parsed.
+    """
+    section_categories = section_categories or {}
+    known_hashes = known_hashes or {}
+
+    with open(path, encoding='utf-8') as f:
+        for section in iter_sections(f):
+            category_id = section_categories.get(section.number, slugify(section.title))
+            if known_hashes.get(section.number) == section.digest:
+                yield section, category_id, None
+            else:
+                yield section, category_id, list(parse_section(section, category_id))
@@ -1,133 +1,140 @@
 #!/usr/bin/env python3
 
+from __future__ import annotations
+
+import argparse
 import sys
-import os
 import random
-import time
-from datetime import datetime
+from typing import TYPE_CHECKING
 
-import firebase_admin
-from firebase_admin import credentials, firestore
-from google.cloud.firestore import FieldFilter
+from firestore_client import connect, print_timings, sdk
+from migration_runner import Migration, run_migration
+from parallel_scan import iter_documents_parallel
+from pool_index import rebuild_pool_index
+from question_counters import active_question_count
 
-def initialize_firebase():
-    """Initialize Firebase Admin SDK"""
-    try:
-        app = firebase_admin.get_app()
-        print("✅ Using existing Firebase app")
-    except ValueError:
-        cred_path = os.path.join(os.path.dirname(__file__), '..', 'cred.json')
-        if os.path.exists(cred_path):
-            cred = credentials.Certificate(cred_path)
-            app = firebase_admin.initialize_app(cred)
-            print("✅ Initialized Firebase with service account")
-        else:
-            app = firebase_admin.initialize_app()
-            print("✅ Initialized Firebase with default credentials")
-    
-    return firestore.client()
+if TYPE_CHECKING:
+    from google.cloud import firestore
+
+class SequenceMigration(Migration):
+    """Number questions 1, 2, 3, ... in document-ID order and fill in randomSeed/createdAt."""
+
+    name = 'questions-sequence'
+    collection = 'questions'
+    fields = ('createdAt', 'randomSeed')
+
+    def initial_state(self):
+        return {'nextSequence': 1}
+
+    def transform(self, doc_id, data, state):
+        current_time = sdk().SERVER_TIMESTAMP
+        update_data = {
+            'sequence': state['nextSequence'],
+            'updatedAt': current_time
+        }
+        # Add createdAt if missing (assume it's a new field for all questions)
+        if 'createdAt' not in data:
+            update_data['createdAt'] = current_time
+        # Add randomSeed if missing
+        if 'randomSeed' not in data:
+            update_data['randomSeed'] = random.random()
+        state['nextSequence'] += 1
+        return update_data
+
+    def finish(self, db, checkpoint):
+        total_questions = checkpoint['processed']
+        if total_questions == 0:
+            print("ℹ️ No questions found, nothing to migrate")
+            return
+        max_sequence = checkpoint['state']['nextSequence'] - 1
+        print(f"🎉 Successfully migrated {total_questions} questions with sequence numbers 1-{max_sequence}")
+
+        # Create global metadata
+        create_global_metadata(db, max_sequence)
+
+        # Verify migration
+        verify_migration(db, total_questions, max_sequence)
 
-def migrate_questions_complete(db: firestore.Client) -> None:
+        # Sequences changed, so the per-category pool index has to be rewritten
+        rebuild_pool_index(db)
+
+def migrate_questions_complete(db: firestore.Client, restart: bool = False) -> None:
     """
     Complete migration: adds sequence numbers, random seeds, timestamps, and creates metadata
+
+    Pages through the questions by document ID reading only createdAt and
+    randomSeed. Progress is checkpointed in migrations/questions-sequence
+    with every batch, so an interrupted run resumes where it stopped.
     """
-    print("📊 Loading existing questions...")
-    
-    # Load all questions - since createdAt doesn't exist yet, we'll use document ID ordering
-    # This provides consistent ordering across runs
-    questions_ref = db.collection('questions')
-    questions_query = questions_ref.order_by('__name__')
-    
-    questions_docs = list(questions_query.stream())
-    total_questions = len(questions_docs)
-    
-    print(f"📝 Found {total_questions} questions to migrate")
-    
-    if total_questions == 0:
-        print("ℹ️ No questions found, nothing to migrate")
-        return
-    
-    # Process in batches of 500
-    batch_size = 500
-    current_sequence = 1
-    processed_count = 0
-    max_sequence = 0
-    current_time = firestore.SERVER_TIMESTAMP
-    
-    for i in range(0, len(questions_docs), batch_size):
-        batch = db.batch()
-        end_index = min(i + batch_size, len(questions_docs))
-        
-        batch_num = (i // batch_size) + 1
-        total_batches = (total_questions + batch_size - 1) // batch_size
-        
-        print(f"🔄 Processing batch {batch_num}/{total_batches} (questions {i + 1}-{end_index})")
-        
-        for j in range(i, end_index):
-            doc = questions_docs[j]
-            data = doc.to_dict()
-            
-            # Prepare update data
-            update_data = {
-                'sequence': current_sequence,
-                'updatedAt': current_time
-            }
-            
-            # Add createdAt if missing (assume it's a new field for all questions)
-            if 'createdAt' not in data:
-                update_data['createdAt'] = current_time
-            
-            # Add randomSeed if missing
-            if 'randomSeed' not in data:
-                update_data['randomSeed'] = random.random()
-            
-            # Track max sequence
-            max_sequence = current_sequence
-            current_sequence += 1
-            
-            # Add to batch
-            batch.update(doc.reference, update_data)
-            processed_count += 1
-        
-        # Commit batch
-        batch.commit()
-        print(f"✅ Batch completed. Processed {processed_count}/{total_questions} questions")
-        
-        # Small delay
-        time.sleep(0.1)
-    
-    print(f"🎉 Successfully migrated {processed_count} questions with sequence numbers 1-{max_sequence}")
-    
-    # Create global metadata
-    create_global_metadata(db, max_sequence, total_questions)
-    
-    # Verify migration
-    verify_migration(db, total_questions, max_sequence)
+    print("📊 Streaming existing questions...")
+    run_migration(db, SequenceMigration(), restart=restart)
 
-def create_global_metadata(db: firestore.Client, max_sequence: int, total_questions: int) -> None:
-    """Create global sequence metadata"""
+def create_global_metadata(db: firestore.Client, max_sequence: int) -> None:
+    """Create global sequence metadata (totalQuestions counts active questions only)"""
     print("📊 Creating global sequence metadata...")
+    total_questions = active_question_count(db)
     
     metadata_ref = db.collection('metadata').document('questions')
     metadata_ref.set({
         'maxSequence': max_sequence,
         'totalQuestions': total_questions,
-        'createdAt': firestore.SERVER_TIMESTAMP,
-        'updatedAt': firestore.SERVER_TIMESTAMP
+        'createdAt': sdk().SERVER_TIMESTAMP,
+        'updatedAt': sdk().SERVER_TIMESTAMP
     })
     
     print(f"✅ Created global metadata with maxSequence: {max_sequence}")
 
+def _sequence_edge(db: firestore.Client, direction: str):
+    """Smallest or largest sequence, read from a single-field projection of one document."""
+    query = db.collection('questions').select(['sequence']).order_by('sequence', direction=direction).limit(1)
+    for doc in query.stream():
+        return doc.to_dict().get('sequence')
+    return None
+
+def find_duplicate_sequences(db: firestore.Client, max_sequence: int, report_limit: int = 10):
+    """
+    Stream a sequence-only projection and mark every value in a bitmap.
+
+    Returns (duplicate count, first duplicate values, distinct values).
+    Memory is max_sequence / 8 bytes whatever the number of documents.
+    """
+    seen = bytearray(max_sequence // 8 + 1)
+    duplicates = 0
+    examples = []
+    distinct = 0
+    for doc in iter_documents_parallel(db, 'questions', prepare=lambda q: q.select(['sequence'])):
+        sequence = doc.to_dict().get('sequence')
+        if not isinstance(sequence, int) or not 0 < sequence <= max_sequence:
+            continue
+        byte, bit = divmod(sequence, 8)
+        if seen[byte] >> bit & 1:
+            duplicates += 1
+            if len(examples) < report_limit:
+                examples.append(sequence)
+        else:
+            seen[byte] |= 1 << bit
+            distinct += 1
+    return duplicates, examples, distinct
+
 def verify_migration(db: firestore.Client, expected_count: int, expected_max: int) -> None:
-    """Verify migration success"""
+    """
+    Verify migration success with server-side aggregations.
+
+    count/sum of `sequence` plus the min/max documents can only show that
+    something is wrong ({1, 1, 4, 4} fits 1..4 as well), so the bitmap
+    duplicate scan always runs.
+    """
     print("🔍 Verifying migration...")
+    firestore_sdk = sdk()
     
-    # Count questions with sequence field
-    questions_with_sequence = db.collection('questions').where(
-        filter=FieldFilter('sequence', '>', 0)
-    ).count().get()
-    
-    migrated_count = questions_with_sequence[0][0].value
+    # Count and sum questions with sequence field in one aggregation query
+    with_sequence = db.collection('questions').where(
+        filter=firestore_sdk.FieldFilter('sequence', '>', 0)
+    )
+    aggregates = {result.alias: result.value for result in
+                  with_sequence.count(alias='count').sum('sequence', alias='sum').get()[0]}
+    migrated_count = aggregates['count']
+    sequence_sum = int(aggregates['sum'] or 0)
     
     if migrated_count == expected_count:
         print(f"✅ Sequence verification: {migrated_count}/{expected_count} questions")
@@ -136,7 +143,7 @@ def verify_migration(db: firestore.Client, expected_count: int, expected_max: in
     
     # Count questions with randomSeed field
     questions_with_random = db.collection('questions').where(
-        filter=FieldFilter('randomSeed', '>=', 0)
+        filter=firestore_sdk.FieldFilter('randomSeed', '>=', 0)
     ).count().get()
     
     random_count = questions_with_random[0][0].value
@@ -146,25 +153,32 @@ def verify_migration(db: firestore.Client, expected_count: int, expected_max: in
     else:
         print(f"⚠️ RandomSeed warning: Only {random_count}/{expected_count} questions")
     
-    # Check sequence range
-    all_sequences_docs = list(db.collection('questions').order_by('sequence').stream())
-    sequences = [doc.to_dict().get('sequence') for doc in all_sequences_docs if doc.to_dict().get('sequence')]
+    # Check sequence range (one document read each)
+    actual_min = _sequence_edge(db, firestore_sdk.Query.ASCENDING)
+    actual_max = _sequence_edge(db, firestore_sdk.Query.DESCENDING)
     
-    if sequences:
-        actual_min, actual_max = min(sequences), max(sequences)
+    if actual_max is not None:
         print(f"📈 Sequence range: {actual_min} - {actual_max}")
         
         if actual_max == expected_max:
             print("✅ Max sequence matches expected")
         else:
             print(f"⚠️ Max sequence mismatch: expected {expected_max}, got {actual_max}")
-    
-    # Check for duplicates
-    unique_sequences = set(sequences)
-    if len(sequences) == len(unique_sequences):
-        print("✅ No duplicate sequences found")
-    else:
-        print(f"⚠️ Found {len(sequences) - len(unique_sequences)} duplicate sequences")
+        
+        # Fast failure: without duplicates or gaps, count, sum and range describe min..max
+        contiguous = (migrated_count == actual_max - actual_min + 1 and
+                      sequence_sum == (actual_min + actual_max) * migrated_count // 2)
+        if not contiguous:
+            print("⚠️ Count, sum and range do not fit a contiguous sequence")
+
+        duplicates, examples, distinct = find_duplicate_sequences(db, actual_max)
+        gaps = actual_max - actual_min + 1 - distinct
+        if duplicates:
+            print(f"⚠️ Found {duplicates} duplicate sequences (e.g. {', '.join(map(str, examples))})")
+        else:
+            print("✅ No duplicate sequences found")
+        if gaps:
+            print(f"⚠️ Found {gaps} gaps in the sequence range")
     
     # Verify metadata
     metadata_ref = db.collection('metadata').document('questions')
@@ -178,8 +192,15 @@ def verify_migration(db: firestore.Client, expected_count: int, expected_max: in
     else:
         print("⚠️ Global metadata not found")
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Add sequence numbers, random seeds and metadata to questions.")
+    parser.add_argument('--restart', action='store_true',
+                        help="ignore the saved checkpoint and renumber all questions again")
+    return parser.parse_args()
+
 def main():
     """Main migration function"""
+    args = parse_args()
     print("🚀 Starting complete question migration...")
     print("   - Adding sequence numbers")
     print("   - Adding random seeds")
@@ -188,11 +209,11 @@ def main():
     print()
     
     try:
-        # Initialize Firebase
-        db = initialize_firebase()
+        # Initialize Firebase (shared client, imported lazily)
+        db = connect()
         
         # Run complete migration
-        migrate_questions_complete(db)
+        migrate_questions_complete(db, restart=args.restart)
         
         print()
         print("✅ Complete migration finished successfully!")
@@ -201,6 +222,7 @@ def main():
         print("   ✓ Random seeds added (0.0 - 1.0)")
         print("   ✓ Global metadata created (metadata/questions)")
         print("   ✓ Migration verified")
+        print_timings()
         
         sys.exit(0)
         
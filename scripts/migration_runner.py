@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+Resumable, checkpointed migrations over a collection.
+
+A migration pages through its collection in document-ID order, reading
+only the fields it declares (`select()`), and turns each document into
+an update. Every batch carries a write to `migrations/{name}`
+
+    {lastDocId, processed, updated, state, status, updatedAt}
+
+so the checkpoint is committed atomically with the updates it covers.
+A rerun after a failure starts after `lastDocId` with the saved
+`state`, which makes a retry O(remaining work). Batches are committed
+one at a time in order (the next page is read meanwhile), which keeps
+the checkpoint exact; instead of sleeping between batches, the adaptive
+write scheduler shrinks batches after slow or contended commits.
+
+Migrations without carried state can also run partitioned
+(`run_partitioned_migration`): the collection (or collection group) is
+split into key ranges once, the range boundaries are stored in the
+checkpoint, and every range is migrated on its own worker with its own
+checkpoint document `migrations/{name}/partitions/{n}`.
+"""
+
+import copy
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from batch_writer import MAX_BATCH_WRITES, BatchWriter, iter_chunks
+from firestore_client import sdk
+from paged_reader import iter_pages
+from parallel_scan import DEFAULT_WORKERS, PARTITIONS_PER_WORKER, partition_points
+
+MIGRATIONS_COLLECTION = 'migrations'
+
+
+class Migration:
+    """
+    Base class: set ``name``, ``collection`` and ``fields`` and implement
+    ``transform``; ``initial_state`` and ``finish`` are optional.
+    """
+
+    name = None
+    collection = 'questions'
+    group = False  # collection is a collection-group ID (partitioned runs only)
+    fields = ()  # fields transform() reads; empty reads document IDs only
+
+    def initial_state(self):
+        """JSON-compatible state carried across batches (and resumes)."""
+        return {}
+
+    def transform(self, doc_id, data, state):
+        """Return the update for one document, or None to leave it alone."""
+        raise NotImplementedError
+
+    def finish(self, db, checkpoint):
+        """Called once after the last batch with the final checkpoint."""
+
+
+def checkpoint_ref(db, migration):
+    return db.collection(MIGRATIONS_COLLECTION).document(migration.name)
+
+
+def load_checkpoint(db, migration):
+    snapshot = checkpoint_ref(db, migration).get()
+    return snapshot.to_dict() if snapshot.exists else None
+
+
+def run_migration(db, migration, restart=False, batch_size=MAX_BATCH_WRITES - 1, verbose=True):
+    """
+    Run (or resume) ``migration``. Returns the final checkpoint dict.
+
+    ``restart`` ignores an existing checkpoint, including a finished one.
+    """
+    firestore = sdk()
+    ref = checkpoint_ref(db, migration)
+    checkpoint = None if restart else load_checkpoint(db, migration)
+
+    if checkpoint and checkpoint.get('status') == 'done':
+        print(f"ℹ️ Migration '{migration.name}' already completed "
+              f"({checkpoint['processed']} documents); use --restart to run it again")
+        return checkpoint
+    if checkpoint:
+        print(f"↩️  Resuming '{migration.name}' after {checkpoint['lastDocId']} "
+              f"({checkpoint['processed']} documents done)")
+    else:
+        checkpoint = {'lastDocId': None, 'processed': 0, 'updated': 0,
+                      'state': migration.initial_state()}
+
+    collection_ref = db.collection(migration.collection)
+    # An empty select() would return whole documents
+    query = collection_ref.select(list(migration.fields) or ['__name__'])
+    if checkpoint['lastDocId']:
+        query = query.start_after([collection_ref.document(checkpoint['lastDocId'])])
+
+    state = checkpoint['state']
+    processed, updated = checkpoint['processed'], checkpoint['updated']
+    # One commit at a time keeps checkpoints in order; pages are still prefetched
+    pending = None
+    with BatchWriter(db, batch_size=batch_size + 1, max_in_flight=1, verbose=False,
+                     adaptive=True) as writer:
+        for page in iter_pages(query, page_size=batch_size):
+            # The scheduler may have shrunk batches below the page size
+            for chunk in iter_chunks(page, writer.batch_size - 1):
+                writes = []
+                for doc in chunk:
+                    update = migration.transform(doc.id, doc.to_dict() or {}, state)
+                    if update:
+                        writes.append(('update', doc.reference, update, False))
+                processed += len(chunk)
+                updated += len(writes)
+                writes.append(('set', ref, {
+                    'lastDocId': chunk[-1].id,
+                    'processed': processed,
+                    'updated': updated,
+                    'state': copy.deepcopy(state),
+                    'status': 'running',
+                    'updatedAt': firestore.SERVER_TIMESTAMP,
+                }, False))
+                # A failed commit must stop the run before a later checkpoint skips its documents
+                if pending is not None:
+                    pending.result()
+                pending = writer.submit(writes, documents=len(chunk))
+            if verbose:
+                print(f"🔄 {migration.name}: {processed} documents processed, {updated} updated")
+    print(f"⚡ Throughput: {writer.stats.summary()}")
+
+    checkpoint = {'processed': processed, 'updated': updated, 'state': state}
+    migration.finish(db, checkpoint)
+    ref.set({'status': 'done', 'completedAt': firestore.SERVER_TIMESTAMP}, merge=True)
+    checkpoint['status'] = 'done'
+    return checkpoint
+
+
+def _base_query(db, migration):
+    base = (db.collection_group(migration.collection) if migration.group
+            else db.collection(migration.collection))
+    return base.select(list(migration.fields) or ['__name__'])
+
+
+def run_partitioned_migration(db, migration, workers=DEFAULT_WORKERS, restart=False,
+                              batch_size=MAX_BATCH_WRITES - 1, verbose=True):
+    """
+    Run (or resume) a stateless ``migration`` over key ranges in parallel.
+
+    ``transform`` is called from several threads with ``state=None``.
+    Each range has at most one commit in flight, so its checkpoint stays
+    exact. Returns the final checkpoint dict.
+    """
+    firestore = sdk()
+    ref = checkpoint_ref(db, migration)
+    partitions_ref = ref.collection('partitions')
+    checkpoint = None if restart else load_checkpoint(db, migration)
+
+    if checkpoint and checkpoint.get('status') == 'done':
+        print(f"ℹ️ Migration '{migration.name}' already completed "
+              f"({checkpoint['processed']} documents); use --restart to run it again")
+        return checkpoint
+    if checkpoint and 'boundaries' in checkpoint:
+        points = [db.document(path) for path in checkpoint['boundaries']]
+        progress = {snapshot.id: snapshot.to_dict() for snapshot in partitions_ref.stream()}
+        finished = sum(1 for entry in progress.values() if entry.get('done'))
+        print(f"↩️  Resuming '{migration.name}': {finished}/{len(points) + 1} ranges done, "
+              f"{sum(entry['processed'] for entry in progress.values())} documents processed")
+    else:
+        with BatchWriter(db, verbose=False) as cleaner:
+            for snapshot in partitions_ref.select(['__name__']).stream():
+                cleaner.delete(snapshot.reference)
+        points = partition_points(db, migration.collection, workers * PARTITIONS_PER_WORKER,
+                                  migration.group)
+        ref.set({'boundaries': [point.path for point in points], 'status': 'running',
+                 'updatedAt': firestore.SERVER_TIMESTAMP})
+        progress = {}
+
+    base = _base_query(db, migration)
+    bounds = [None, *points, None]
+    lock = threading.Lock()
+    totals = {'processed': 0, 'updated': 0}
+
+    def migrate_range(number):
+        entry = progress.get(str(number), {})
+        processed, updated = entry.get('processed', 0), entry.get('updated', 0)
+        if not entry.get('done'):
+            start, end = bounds[number], bounds[number + 1]
+            query = base
+            if entry.get('lastPath'):
+                query = query.start_after([db.document(entry['lastPath'])])
+            elif start is not None:
+                query = query.start_at([start])
+            if end is not None:
+                query = query.end_before([end])
+
+            range_ref = partitions_ref.document(str(number))
+            pending = None
+            for page in iter_pages(query, page_size=batch_size):
+                for chunk in iter_chunks(page, writer.batch_size - 1):
+                    writes = []
+                    for doc in chunk:
+                        update = migration.transform(doc.id, doc.to_dict() or {}, None)
+                        if update:
+                            writes.append(('update', doc.reference, update, False))
+                    processed += len(chunk)
+                    updated += len(writes)
+                    writes.append(('set', range_ref, {
+                        'lastPath': chunk[-1].reference.path,
+                        'processed': processed,
+                        'updated': updated,
+                        'done': False,
+                    }, False))
+                    # The previous commit of this range must land before the next checkpoint
+                    if pending is not None:
+                        pending.result()
+                    pending = writer.submit(writes, documents=len(chunk))
+            if pending is not None:
+                pending.result()
+            range_ref.set({'processed': processed, 'updated': updated, 'done': True}, merge=True)
+            if verbose:
+                print(f"  ✓ Range {number}: {processed} documents, {updated} updated")
+        with lock:
+            totals['processed'] += processed
+            totals['updated'] += updated
+
+    with BatchWriter(db, batch_size=batch_size + 1, max_in_flight=workers, verbose=False,
+                     adaptive=True) as writer:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(migrate_range, range(len(bounds) - 1)))
+    print(f"⚡ Throughput: {writer.stats.summary()}")
+
+    checkpoint = dict(totals)
+    migration.finish(db, checkpoint)
+    ref.set({**totals, 'status': 'done', 'completedAt': firestore.SERVER_TIMESTAMP}, merge=True)
+    checkpoint['status'] = 'done'
+    return checkpoint
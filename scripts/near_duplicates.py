@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""
+Near-duplicate detection for question catalogues.
+
+Question text and options are cut into word shingles, each question gets
+a MinHash signature and the signatures are banded into an LSH index.
+Only questions that share a band bucket are compared (exact Jaccard on
+their shingle sets), so a catalogue of n questions is checked in roughly
+O(n) instead of comparing every pair.
+
+Signatures use one-permutation hashing: every shingle is hashed once and
+kept as the minimum of one of NUM_HASHES bins; empty bins borrow from
+their right neighbour. That costs one hash per shingle instead of one
+per shingle and permutation, which matters for the live collection.
+
+Usage:
+    python near_duplicates.py --markdown ../Erziehungsapp.md
+    python near_duplicates.py --live [--include-inactive] [--threshold 0.6]
+"""
+
+import argparse
+import hashlib
+import re
+import sys
+
+NUM_HASHES = 64
+BANDS = 16  # 16 bands x 4 rows: pairs above ~0.6 Jaccard almost always collide
+SHINGLE_SIZE = 3
+DEFAULT_THRESHOLD = 0.7
+
+_BIN_BITS = (NUM_HASHES - 1).bit_length()
+_VALUE_MASK = (1 << (64 - _BIN_BITS)) - 1
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def _tokens(text):
+    return _TOKEN_RE.findall((text or '').lower())
+
+
+def _word_shingles(tokens, prefix):
+    if len(tokens) <= SHINGLE_SIZE:
+        return {prefix + ' '.join(tokens)} if tokens else set()
+    return {prefix + ' '.join(tokens[i:i + SHINGLE_SIZE])
+            for i in range(len(tokens) - SHINGLE_SIZE + 1)}
+
+
+def shingles(question):
+    """Hashed word shingles of a question's text and options."""
+    result = _word_shingles(_tokens(question.get('text')), 't:')
+    # Options are shingled as a set, so reordering them does not matter
+    for option in question.get('options') or []:
+        result |= _word_shingles(_tokens(option), 'o:')
+    return {int.from_bytes(hashlib.blake2b(shingle.encode('utf-8'), digest_size=8).digest(), 'big')
+            for shingle in result}
+
+
+def minhash(hashed_shingles):
+    """One-permutation MinHash signature (NUM_HASHES values)."""
+    bins = [None] * NUM_HASHES
+    for value in hashed_shingles:
+        index = value >> (64 - _BIN_BITS)
+        value &= _VALUE_MASK
+        if bins[index] is None or value < bins[index]:
+            bins[index] = value
+    if all(value is None for value in bins):
+        return tuple(bins)
+
+    # Densify: an empty bin takes the next filled bin's value, tagged with the distance.
+    # Walking twice around the ring from the end finds that bin for every index.
+    signature = [0] * NUM_HASHES
+    carry, distance = 0, 0
+    for step in range(2 * NUM_HASHES - 1, -1, -1):
+        index = step % NUM_HASHES
+        if bins[index] is not None:
+            carry, distance = bins[index], 0
+        else:
+            distance += 1
+        if step < NUM_HASHES:
+            signature[index] = (distance << (64 - _BIN_BITS)) | carry
+    return tuple(signature)
+
+
+def jaccard(a, b):
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+class NearDuplicateIndex:
+    """LSH index over question shingles; add entries, then call clusters()."""
+
+    def __init__(self, threshold=DEFAULT_THRESHOLD):
+        self.threshold = threshold
+        self._keys = []
+        self._questions = []
+        self._shingles = []
+        self._buckets = {}
+
+    def __len__(self):
+        return len(self._keys)
+
+    def add(self, key, question):
+        position = len(self._keys)
+        hashed = shingles(question)
+        self._keys.append(key)
+        self._questions.append(question)
+        self._shingles.append(hashed)
+        if not hashed:
+            return
+
+        signature = minhash(hashed)
+        rows = NUM_HASHES // BANDS
+        for band in range(BANDS):
+            bucket = (band, signature[band * rows:(band + 1) * rows])
+            self._buckets.setdefault(bucket, []).append(position)
+
+    def clusters(self):
+        """
+        Return near-duplicate clusters, largest first.
+
+        Each cluster is a list of (key, question) sorted by key, plus the
+        highest pairwise similarity found: (similarity, members).
+        """
+        parent = list(range(len(self._keys)))
+
+        def find(x):
+            while parent[x] != x:
+                parent[x] = parent[parent[x]]
+                x = parent[x]
+            return x
+
+        best = {}
+        compared = set()
+        for members in self._buckets.values():
+            if len(members) < 2:
+                continue
+            for i, left in enumerate(members):
+                for right in members[i + 1:]:
+                    pair = (left, right)
+                    if pair in compared or find(left) == find(right):
+                        continue
+                    compared.add(pair)
+                    similarity = jaccard(self._shingles[left], self._shingles[right])
+                    if similarity < self.threshold:
+                        continue
+                    root_left, root_right = find(left), find(right)
+                    parent[root_right] = root_left
+                    best[root_left] = max(similarity, best.get(root_left, 0.0),
+                                          best.pop(root_right, 0.0))
+
+        groups = {}
+        for position in range(len(self._keys)):
+            groups.setdefault(find(position), []).append(position)
+
+        result = []
+        for root, positions in groups.items():
+            if len(positions) < 2:
+                continue
+            members = sorted(((self._keys[p], self._questions[p]) for p in positions),
+                             key=lambda member: str(member[0]))
+            result.append((best.get(root, self.threshold), members))
+        result.sort(key=lambda cluster: (-len(cluster[1]), -cluster[0]))
+        return result
+
+
+def find_near_duplicates(entries, threshold=DEFAULT_THRESHOLD):
+    """Cluster (key, question) pairs; see NearDuplicateIndex.clusters()."""
+    index = NearDuplicateIndex(threshold)
+    for key, question in entries:
+        index.add(key, question)
+    return index.clusters()
+
+
+def print_clusters(clusters, limit=None):
+    """Print a readable near-duplicate report."""
+    if not clusters:
+        print("✓ No near-duplicate questions found")
+        return
+    print(f"⚠️  {len(clusters)} near-duplicate cluster(s):")
+    for similarity, members in clusters[:limit]:
+        print(f"  • {len(members)} questions, similarity {similarity:.2f}")
+        for key, question in members:
+            text = ' '.join((question.get('text') or '').split())
+            print(f"      [{question.get('categoryId')}] {key}: {text[:90]}")
+    if limit is not None and len(clusters) > limit:
+        print(f"  … {len(clusters) - limit} more")
+
+
+def check_catalogue(questions, source=None, threshold=DEFAULT_THRESHOLD):
+    """Validation stage for uploads: report near-duplicates in a catalogue."""
+    from question_sync import question_doc_id
+    clusters = find_near_duplicates(((question_doc_id(q, source), q) for q in questions),
+                                    threshold)
+    print_clusters(clusters)
+    return clusters
+
+
+def live_entries(db, include_inactive=False):
+    """(doc_id, question) pairs from the live collection, text and hash fields only."""
+    query = db.collection('questions').select(['text', 'options', 'categoryId', 'isActive',
+                                               'contentHash', 'textHash'])
+    for doc in query.stream():
+        data = doc.to_dict() or {}
+        if include_inactive or data.get('isActive', True):
+            yield doc.id, data
+
+
+def live_ids_by_hash(entries):
+    """
+    {hash: doc_id} of live entries by contentHash and by text hash, so a
+    catalogue question can be matched to the document it was uploaded as
+    (adopted legacy documents keep their auto IDs).
+    """
+    from question_sync import text_hash
+    ids = {}
+    for doc_id, data in entries.items():
+        if data.get('contentHash'):
+            ids[data['contentHash']] = doc_id
+        ids.setdefault(data.get('textHash') or text_hash(data.get('text') or ''), doc_id)
+    return ids
+
+
+def catalogue_key(question, source, live_ids):
+    """The live document a catalogue question is stored as, else its sync ID."""
+    from question_sync import content_hash, question_doc_id, text_hash
+    return (live_ids.get(content_hash(question)) or live_ids.get(text_hash(question['text']))
+            or question_doc_id(question, source))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Report near-duplicate questions.")
+    parser.add_argument('--live', action='store_true',
+                        help="check the questions collection in Firestore")
+    parser.add_argument('--include-inactive', action='store_true',
+                        help="with --live: include deactivated questions")
+    parser.add_argument('--markdown', metavar='PATH',
+                        help="check questions compiled from a markdown catalogue "
+                             "(combined with --live: also against the live questions)")
+    parser.add_argument('--source', default='erziehungsapp',
+                        help="with --markdown: source the catalogue is synced as, for its "
+                             "question IDs (default: erziehungsapp)")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help=f"minimum Jaccard similarity (default: {DEFAULT_THRESHOLD})")
+    args = parser.parse_args()
+    if not args.live and not args.markdown:
+        parser.error("choose --live and/or --markdown")
+    return args
+
+
+def main():
+    args = parse_args()
+    entries = {}
+
+    if args.live:
+        from firestore_client import connect, print_timings
+        print("📖 Reading question texts from Firestore...")
+        entries.update(live_entries(connect(), args.include_inactive))
+        print(f"   {len(entries)} live questions")
+        print_timings()
+
+    if args.markdown:
+        from markdown_questions import compile_markdown
+        print(f"📖 Compiling {args.markdown}...")
+        # Match uploaded questions by hash first, so one is not its own duplicate
+        live_ids = live_ids_by_hash(entries)
+        compiled = 0
+        for _, _, questions in compile_markdown(args.markdown, {}, {}):
+            for question in questions or []:
+                entries[catalogue_key(question, args.source, live_ids)] = question
+                compiled += 1
+        print(f"   {compiled} catalogue questions")
+
+    clusters = find_near_duplicates(entries.items(), args.threshold)
+    print_clusters(clusters)
+    sys.exit(1 if clusters else 0)
+
+
+if __name__ == '__main__':
+    main()
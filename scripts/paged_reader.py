@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+Cursor-paged reads for the sync Firestore client.
+
+`query.stream()` followed by `list()` holds a whole collection in memory
+before the first write can start. Paging by document ID with
+`start_after` keeps at most two pages alive, and the next page is
+fetched on a background thread while the caller works on the current
+one, so reads overlap with the caller's batch commits.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_PAGE_SIZE = 500
+
+
+def iter_pages(query, page_size=DEFAULT_PAGE_SIZE, prefetch=True, order_by=()):
+    """
+    Yield lists of document snapshots ordered by ``order_by`` fields, then ID.
+
+    Queries with an inequality filter must order by that field first
+    (e.g. ``order_by=('updatedAt',)`` for ``updatedAt > cutoff``).
+    """
+    ordered = query
+    for field in order_by:
+        ordered = ordered.order_by(field)
+    ordered = ordered.order_by('__name__').limit(page_size)
+    if not prefetch:
+        page = ordered.get()
+        while page:
+            yield page
+            if len(page) < page_size:
+                return
+            page = ordered.start_after(page[-1]).get()
+        return
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        pending = executor.submit(ordered.get)
+        while pending is not None:
+            page = pending.result()
+            pending = None
+            if len(page) == page_size:
+                pending = executor.submit(ordered.start_after(page[-1]).get)
+            if page:
+                yield page
+
+
+def iter_documents(query, page_size=DEFAULT_PAGE_SIZE, prefetch=True, order_by=()):
+    """Yield document snapshots one at a time, paged underneath."""
+    for page in iter_pages(query, page_size, prefetch, order_by):
+        yield from page
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Partitioned parallel scans of a collection or collection group.
+
+A single cursor reads one page per round trip. Here the scan is split
+into document-name ranges first, using Firestore partition queries
+(`CollectionGroup.get_partitions`), and every range is paged on its own
+worker thread. Pages are handed to the caller through a bounded queue
+as they arrive, so the scan scales with the number of workers while
+memory stays limited to a few pages per worker.
+
+Partition queries only exist for collection groups. For a collection,
+the group's partition points that lie inside that collection are used
+as key-range cursors. Where partition queries are unavailable (e.g. the
+emulator), a collection falls back to splitting the auto-ID keyspace by
+first character, which is balanced for generated IDs.
+"""
+
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from firestore_client import api_exceptions
+from paged_reader import DEFAULT_PAGE_SIZE, iter_pages
+
+DEFAULT_WORKERS = 4
+PARTITIONS_PER_WORKER = 2  # a few more ranges than workers evens out skewed partitions
+AUTO_ID_ALPHABET = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz'
+_DONE = object()
+
+
+class _Failed:
+    def __init__(self, error):
+        self.error = error
+
+
+def _partition_points(db, collection_id, partition_count):
+    """Start references of every partition after the first, or None if unsupported."""
+    try:
+        partitions = list(db.collection_group(collection_id).get_partitions(partition_count))
+    except (AttributeError, NotImplementedError, api_exceptions().GoogleAPICallError):
+        return None
+    return [partition.start_at for partition in partitions if partition.start_at is not None]
+
+
+def _keyspace_points(collection_ref, partition_count):
+    step = len(AUTO_ID_ALPHABET) / partition_count
+    chars = sorted({AUTO_ID_ALPHABET[int(i * step)] for i in range(1, partition_count)})
+    return [collection_ref.document(char) for char in chars]
+
+
+def partition_points(db, collection_id, partitions, group=False):
+    """
+    Document references splitting a scan into up to ``partitions`` key
+    ranges (empty if it cannot be split).
+    """
+    if partitions <= 1:
+        return []
+    group_id = collection_id if group else collection_id.rsplit('/', 1)[-1]
+    points = _partition_points(db, group_id, partitions)
+    if points is None:
+        return [] if group else _keyspace_points(db.collection(collection_id), partitions)
+    if not group:
+        # Group partitions may also cover same-named subcollections elsewhere
+        points = [ref for ref in points if ref.path.rsplit('/', 1)[0] == collection_id]
+    return points
+
+
+def range_queries(base, points):
+    """One query per key range between consecutive ``points``."""
+    bounds = [None, *points, None]
+    queries = []
+    for start, end in zip(bounds, bounds[1:]):
+        query = base
+        if start is not None:
+            query = query.start_at([start])
+        if end is not None:
+            query = query.end_before([end])
+        queries.append(query)
+    return queries
+
+
+def partition_queries(db, collection_id, partitions, group=False, prepare=None):
+    """
+    Split a scan into up to ``partitions`` key-range queries.
+
+    ``collection_id`` is a collection path, or a collection ID with
+    ``group=True``. ``prepare`` is applied to the base query (e.g. to add
+    ``select``/equality filters; inequality filters cannot be combined
+    with name ranges).
+    """
+    base = db.collection_group(collection_id) if group else db.collection(collection_id)
+    if prepare is not None:
+        base = prepare(base)
+    return range_queries(base, partition_points(db, collection_id, partitions, group))
+
+
+def iter_pages_parallel(db, collection_id, workers=DEFAULT_WORKERS, page_size=DEFAULT_PAGE_SIZE,
+                        group=False, prepare=None):
+    """
+    Yield pages of document snapshots from all partitions, in arrival order.
+
+    Pages of one partition are ordered by document name; pages of
+    different partitions interleave.
+    """
+    queries = partition_queries(db, collection_id, workers * PARTITIONS_PER_WORKER, group, prepare)
+    if workers <= 1 or len(queries) == 1:
+        for query in queries:
+            yield from iter_pages(query, page_size)
+        return
+
+    pages = queue.Queue(maxsize=workers * 2)
+    stop = threading.Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                pages.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def scan(query):
+        try:
+            for page in iter_pages(query, page_size, prefetch=False):
+                if not put(page):
+                    return
+            put(_DONE)
+        except Exception as e:
+            put(_Failed(e))
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for query in queries:
+            executor.submit(scan, query)
+        remaining = len(queries)
+        try:
+            while remaining:
+                item = pages.get()
+                if item is _DONE:
+                    remaining -= 1
+                elif isinstance(item, _Failed):
+                    raise item.error
+                else:
+                    yield item
+        finally:
+            stop.set()
+
+
+def iter_documents_parallel(db, collection_id, workers=DEFAULT_WORKERS,
+                            page_size=DEFAULT_PAGE_SIZE, group=False, prepare=None):
+    """Yield document snapshots from a partitioned parallel scan."""
+    for page in iter_pages_parallel(db, collection_id, workers, page_size, group, prepare):
+        yield from page
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+Compact per-category pool index documents.
+
+Pool expansion only needs id, sequence, randomSeed and difficulty of the
+active questions of a category. Instead of paging through `questions`,
+a client reads `categories/{id}.poolIndexShards` and `.poolIndexGeneration`
+(the category document it already loads) and then the shard documents
+
+    questionPoolIndex/{categoryId}-{n}           generation 0
+    questionPoolIndex/{categoryId}-g{gen}-{n}    later generations
+        entries: {questionId: [sequence, randomSeed, difficulty]}
+
+which is usually one read. Questions are assigned to shards by a CRC32 of
+their ID, so writers can add or remove entries without reading anything;
+the index writes are committed in the same batch as the question writes.
+Shards are sized well below the 1 MiB document limit; a full rebuild
+(also used after renumbering sequences) reshards categories that grew.
+A new shard count means a new layout, so a reshard writes a new
+generation and switches count and generation in one category write;
+readers of the old layout keep reading complete shards until then.
+"""
+
+import math
+import zlib
+
+from batch_writer import BatchWriter
+from firestore_client import sdk
+from parallel_scan import iter_documents_parallel
+
+POOL_INDEX_COLLECTION = 'questionPoolIndex'
+SHARD_COUNT_FIELD = 'poolIndexShards'
+GENERATION_FIELD = 'poolIndexGeneration'
+POOL_FIELDS = ('sequence', 'randomSeed', 'difficulty')
+SHARD_TARGET = 4000     # entries per shard right after a rebuild
+SHARD_CAPACITY = 10000  # ~700 KiB per shard; beyond this a category needs a rebuild
+REBUILD_BATCH_SIZE = 10  # shard documents are large, keep commits well under 10 MiB
+
+
+def shard_doc_id(category_id, shard, generation=0):
+    if generation:
+        return f"{category_id}-g{generation}-{shard}"
+    return f"{category_id}-{shard}"
+
+
+def shard_for(question_id, shard_count):
+    return zlib.crc32(question_id.encode('utf-8')) % shard_count
+
+
+def pool_entry(document):
+    """[sequence, randomSeed, difficulty] for a question, or None if it has no sequence yet."""
+    if document.get('sequence') is None:
+        return None
+    return [document['sequence'], document.get('randomSeed'), document.get('difficulty')]
+
+
+class PoolIndex:
+    """
+    Shard layout of the pool index, loaded once per run.
+
+    ``writes()`` turns entry additions/removals into set-merge writes for
+    the batch that changes the questions.
+    """
+
+    def __init__(self, db, shard_counts=None, active_counts=None, generations=None):
+        self._db = db
+        self._shard_counts = dict(shard_counts or {})
+        self._active = dict(active_counts or {})
+        self._generations = dict(generations or {})
+
+    @classmethod
+    def _from_categories(cls, db, snapshots):
+        shard_counts = {}
+        active_counts = {}
+        generations = {}
+        for snapshot in snapshots:
+            data = snapshot.to_dict() or {}
+            shard_counts[snapshot.id] = data.get(SHARD_COUNT_FIELD) or 1
+            active_counts[snapshot.id] = data.get('questionCounter') or 0
+            generations[snapshot.id] = data.get(GENERATION_FIELD) or 0
+        return cls(db, shard_counts, active_counts, generations)
+
+    @staticmethod
+    def _query(db):
+        return db.collection('categories').select(
+            [SHARD_COUNT_FIELD, GENERATION_FIELD, 'questionCounter'])
+
+    @classmethod
+    def load(cls, db):
+        return cls._from_categories(db, cls._query(db).stream())
+
+    @classmethod
+    async def load_async(cls, db):
+        return cls._from_categories(db, [snapshot async for snapshot in cls._query(db).stream()])
+
+    def shard_count(self, category_id):
+        return self._shard_counts.get(category_id, 1)
+
+    def generation(self, category_id):
+        return self._generations.get(category_id, 0)
+
+    def max_writes(self, category_ids):
+        """Upper bound of index writes a batch touching these categories can need."""
+        return sum(self.shard_count(category_id) for category_id in set(category_ids))
+
+    def shard_ref(self, category_id, question_id):
+        shard = shard_for(question_id, self.shard_count(category_id))
+        return self._db.collection(POOL_INDEX_COLLECTION).document(
+            shard_doc_id(category_id, shard, self.generation(category_id)))
+
+    def writes(self, adds=(), removes=()):
+        """
+        Batch writes for ``adds`` [(question_id, category_id, entry)] and
+        ``removes`` [(question_id, category_id)], one per shard document.
+        """
+        firestore = sdk()
+        shards = {}
+        for question_id, category_id in removes:
+            ref = self.shard_ref(category_id, question_id)
+            shards.setdefault(ref.path, (ref, {}))[1][question_id] = firestore.DELETE_FIELD
+            self._active[category_id] = self._active.get(category_id, 0) - 1
+        for question_id, category_id, entry in adds:
+            if entry is None:
+                continue
+            ref = self.shard_ref(category_id, question_id)
+            shards.setdefault(ref.path, (ref, {}))[1][question_id] = entry
+            self._active[category_id] = self._active.get(category_id, 0) + 1
+
+        return [('set', ref, {'entries': entries, 'updatedAt': firestore.SERVER_TIMESTAMP}, True)
+                for ref, entries in shards.values()]
+
+    def overflowing(self):
+        """Categories whose shards are expected to exceed SHARD_CAPACITY."""
+        return sorted(category_id for category_id, count in self._active.items()
+                      if count > self.shard_count(category_id) * SHARD_CAPACITY)
+
+    def warn_if_overflowing(self):
+        overflowing = self.overflowing()
+        if overflowing:
+            print(f"⚠️  Pool index shards nearly full for {', '.join(overflowing)}: "
+                  f"run with --rebuild-pool-index to reshard")
+
+
+def rebuild_pool_index(db, categories=None, dry_run=False):
+    """
+    Rewrite the pool index from the questions collection.
+
+    A category whose shard count stays the same is rewritten in place
+    (each shard keeps its set of questions). One whose count changes gets
+    a new generation: its shards are written first, then count and
+    generation are switched in one category write, then the shards of the
+    old generation are deleted. Readers never combine a shard count with
+    shards of another layout.
+    """
+    print("Rebuilding question pool index...")
+    fields = ['categoryId', 'isActive', *POOL_FIELDS]
+    entries = {}
+    missing_sequence = 0
+    for doc in iter_documents_parallel(db, 'questions', prepare=lambda q: q.select(fields)):
+        data = doc.to_dict() or {}
+        category_id = data.get('categoryId')
+        if not data.get('isActive', True) or (categories and category_id not in categories):
+            continue
+        entry = pool_entry(data)
+        if entry is None:
+            missing_sequence += 1
+            continue
+        entries.setdefault(category_id, {})[doc.id] = entry
+
+    old = PoolIndex.load(db)
+    category_ids = sorted(set(categories or ()) | set(entries) |
+                          (set() if categories else set(old._shard_counts)))
+    firestore = sdk()
+    index_ref = db.collection(POOL_INDEX_COLLECTION)
+    shard_counts = {}
+    generations = {}
+    writer = None if dry_run else BatchWriter(db, batch_size=REBUILD_BATCH_SIZE, verbose=False)
+
+    for category_id in category_ids:
+        category_entries = entries.get(category_id, {})
+        shard_count = max(1, math.ceil(len(category_entries) / SHARD_TARGET))
+        resharded = shard_count != old.shard_count(category_id)
+        generation = old.generation(category_id) + 1 if resharded else old.generation(category_id)
+        shard_counts[category_id] = shard_count
+        generations[category_id] = generation
+        shards = [{} for _ in range(shard_count)]
+        for question_id, entry in category_entries.items():
+            shards[shard_for(question_id, shard_count)][question_id] = entry
+        print(f"  • {category_id}: {len(category_entries)} entries in {shard_count} shard(s)"
+              f"{f', new generation {generation}' if resharded else ''}")
+        if writer:
+            for shard, shard_entries in enumerate(shards):
+                writer.set(index_ref.document(shard_doc_id(category_id, shard, generation)), {
+                    'categoryId': category_id,
+                    'shard': shard,
+                    'entries': shard_entries,
+                    'updatedAt': firestore.SERVER_TIMESTAMP,
+                })
+    if missing_sequence:
+        print(f"  ⚠ {missing_sequence} active questions without sequence were skipped")
+    if dry_run:
+        return shard_counts
+
+    writer.close()
+    writer = BatchWriter(db, verbose=False)
+    for category_id, shard_count in shard_counts.items():
+        writer.set(db.collection('categories').document(category_id), {
+            SHARD_COUNT_FIELD: shard_count,
+            GENERATION_FIELD: generations[category_id],
+        }, merge=True)
+    writer.close()
+
+    writer = BatchWriter(db, verbose=False)
+    for category_id, generation in generations.items():
+        old_generation = old.generation(category_id)
+        if generation != old_generation:
+            for shard in range(old.shard_count(category_id)):
+                writer.delete(index_ref.document(shard_doc_id(category_id, shard, old_generation)))
+    writer.close()
+    print(f"✓ Pool index rebuilt for {len(shard_counts)} categories")
+    return shard_counts
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Publish the active question catalogue as Firestore data bundles.
+
+For every category one bundle file is built with a named query that
+matches what QuizService / VsModeService run
+(`questions where categoryId == X and isActive == true`). The files plus
+a manifest.json can be hosted statically (Firebase Hosting, Storage,
+CDN); a client fetches the bundle once, loads it into its cache with
+`loadBundle()` and runs `namedQuery('questions_<categoryId>')` against
+the cache, so a cold start costs one HTTP fetch instead of one billed
+read per question.
+
+Bundles are only rebuilt for categories whose documents changed since
+the manifest in the output directory was written (compared by document
+ID and update time), so republishing after a small upload is cheap and
+clients keep their cached bundles for untouched categories. Bundles of
+deleted categories and superseded versions are removed from the output
+directory and, with --bucket, from Cloud Storage once the new manifest
+is uploaded.
+
+Usage:
+    python publish_bundles.py --output ../build/bundles
+    python publish_bundles.py --output ../build/bundles --bucket my-app.appspot.com
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+from datetime import datetime, timezone
+
+from firestore_client import connect, print_timings, sdk
+
+MANIFEST_NAME = 'manifest.json'
+MANIFEST_VERSION = 1
+DEFAULT_OUTPUT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                              'build', 'bundles')
+STORAGE_PREFIX = 'bundles'
+MANIFEST_CACHE_CONTROL = 'public, max-age=300'
+# Bundle file names contain their version, so they never change once published
+BUNDLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+
+def named_query_name(category_id):
+    return f"questions_{category_id}"
+
+
+def active_questions_query(db, category_id):
+    firestore = sdk()
+    return (db.collection('questions')
+            .where(filter=firestore.FieldFilter('categoryId', '==', category_id))
+            .where(filter=firestore.FieldFilter('isActive', '==', True)))
+
+
+def category_version(db, category_id):
+    """
+    Digest over (document ID, update time) of a category's active questions.
+
+    Reads only document names and metadata (an empty select() would
+    return whole documents, so the projection is `__name__`).
+    """
+    digest = hashlib.sha256()
+    count = 0
+    for doc in sorted(active_questions_query(db, category_id).select(['__name__']).stream(),
+                      key=lambda doc: doc.id):
+        update_time = doc.update_time.isoformat() if doc.update_time else ''
+        digest.update(f"{doc.id}:{update_time}\n".encode('utf-8'))
+        count += 1
+    return digest.hexdigest()[:16], count
+
+
+def build_bundle(db, category_id, version):
+    """Serialize a category's active questions into bundle bytes."""
+    from google.cloud.firestore_bundle import FirestoreBundle
+
+    bundle = FirestoreBundle(f"questions-{category_id}-{version}")
+    bundle.add_named_query(named_query_name(category_id), active_questions_query(db, category_id))
+    return bundle.build().encode('utf-8')
+
+
+def load_manifest(output_dir):
+    path = os.path.join(output_dir, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def write_file(path, data):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def published_files(manifest):
+    """File names a manifest refers to, including the manifest itself."""
+    return {MANIFEST_NAME} | {entry['file'] for entry in manifest.get('bundles', {}).values()}
+
+
+def upload_to_storage(bucket_name, output_dir, names):
+    """Copy bundle files and the manifest to Cloud Storage (needs google-cloud-storage)."""
+    from firebase_admin import storage
+
+    bucket = storage.bucket(bucket_name)
+    for name in names:
+        blob = bucket.blob(f"{STORAGE_PREFIX}/{name}")
+        blob.cache_control = MANIFEST_CACHE_CONTROL if name == MANIFEST_NAME else BUNDLE_CACHE_CONTROL
+        content_type = 'application/json' if name.endswith('.json') else 'application/octet-stream'
+        blob.upload_from_filename(os.path.join(output_dir, name), content_type=content_type)
+        print(f"  ☁️  gs://{bucket_name}/{STORAGE_PREFIX}/{name}")
+
+
+def prune_storage(bucket_name, keep):
+    """Delete bundle objects that the published manifest no longer lists."""
+    from firebase_admin import storage
+
+    bucket = storage.bucket(bucket_name)
+    for blob in bucket.list_blobs(prefix=f"{STORAGE_PREFIX}/"):
+        if blob.name.rsplit('/', 1)[-1] not in keep:
+            blob.delete()
+            print(f"  🗑  gs://{bucket_name}/{blob.name}")
+
+
+def publish_bundles(db, output_dir, force=False):
+    """Build changed bundles and rewrite the manifest. Returns changed file names."""
+    os.makedirs(output_dir, exist_ok=True)
+    previous = load_manifest(output_dir).get('bundles', {})
+
+    bundles = {}
+    changed = []
+    for category in db.collection('categories').select(['__name__']).stream():
+        category_id = category.id
+        version, count = category_version(db, category_id)
+        file_name = f"questions-{category_id}-{version}.bundle"
+        entry = previous.get(category_id)
+
+        if (not force and entry and entry.get('version') == version
+                and os.path.exists(os.path.join(output_dir, entry['file']))):
+            print(f"  • {category_id}: unchanged ({count} questions)")
+            bundles[category_id] = entry
+            continue
+
+        data = build_bundle(db, category_id, version)
+        write_file(os.path.join(output_dir, file_name), data)
+        if entry and entry.get('file') != file_name:
+            stale = os.path.join(output_dir, entry['file'])
+            if os.path.exists(stale):
+                os.remove(stale)
+        bundles[category_id] = {
+            'file': file_name,
+            'namedQuery': named_query_name(category_id),
+            'version': version,
+            'documents': count,
+            'bytes': len(data),
+            'sha256': hashlib.sha256(data).hexdigest(),
+        }
+        changed.append(file_name)
+        print(f"  ✓ {category_id}: {count} questions, {len(data) / 1024:.1f} KiB")
+
+    # Categories that were deleted or renamed lose their bundle
+    for category_id, entry in previous.items():
+        if category_id not in bundles:
+            stale = os.path.join(output_dir, entry['file'])
+            if os.path.exists(stale):
+                os.remove(stale)
+            print(f"  🗑  {category_id}: removed")
+
+    manifest = {
+        'manifestVersion': MANIFEST_VERSION,
+        'version': hashlib.sha256(json.dumps(
+            {cid: b['version'] for cid, b in sorted(bundles.items())}).encode('utf-8')).hexdigest()[:16],
+        'generatedAt': datetime.now(timezone.utc).isoformat(),
+        'bundles': bundles,
+    }
+    write_file(os.path.join(output_dir, MANIFEST_NAME),
+               json.dumps(manifest, indent=2, ensure_ascii=False).encode('utf-8'))
+    if not changed and bundles == previous:
+        return []
+    return changed + [MANIFEST_NAME]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Publish per-category Firestore data bundles.")
+    parser.add_argument('--output', default=DEFAULT_OUTPUT,
+                        help="directory for bundle files and manifest.json (default: build/bundles)")
+    parser.add_argument('--force', action='store_true', help="rebuild every bundle")
+    parser.add_argument('--bucket', help="also upload changed files to this Cloud Storage bucket "
+                                         "and delete bundles the manifest no longer lists")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    print("📦 Publishing question bundles...")
+    try:
+        db = connect()
+        changed = publish_bundles(db, args.output, force=args.force)
+        if args.bucket:
+            if changed:
+                upload_to_storage(args.bucket, args.output, changed)
+            # Only after the new manifest is up, so no listed bundle is ever missing
+            prune_storage(args.bucket, published_files(load_manifest(args.output)))
+        print(f"✅ {len(changed)} file(s) updated in {args.output}")
+        print_timings()
+    except FileNotFoundError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+Compact on-disk question catalogue (.qcat).
+
+Layout (little endian):
+
+    header   magic b'QCAT', u16 version, u16 flags, u32 record count,
+             u32 index length, u64 records offset
+    index    UTF-8 JSON: source, categories and one
+             [id, categoryId, sequence, offset, length] row per record
+    records  u32 length + compact UTF-8 JSON per question
+
+The file is memory-mapped: opening a catalogue only parses the header
+index, and records are decoded when they are accessed, by ID, category,
+sequence range or in file order. `sequence` is the question's own
+sequence field when it has one, otherwise its 1-based catalogue position.
+
+Build catalogues from the literal data modules or from markdown:
+
+    python question_catalog.py build questions.qcat --module upload_questions
+    python question_catalog.py build erziehungsapp.qcat --markdown ../Erziehungsapp.md \\
+        --module upload_erziehungsapp_questions
+    python question_catalog.py info questions.qcat
+"""
+
+import argparse
+import bisect
+import importlib
+import json
+import mmap
+import os
+import struct
+import sys
+
+MAGIC = b'QCAT'
+FORMAT_VERSION = 1
+HEADER = struct.Struct('<4sHHIIQ')
+RECORD_LENGTH = struct.Struct('<I')
+
+
+def _encode(value):
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def write_catalog(path, questions, categories=(), source=None):
+    """
+    Write questions (and their category definitions) to ``path``.
+
+    Records get the same stable IDs as --sync of ``source``
+    (question_sync.question_doc_id).
+    """
+    from question_sync import question_doc_id
+
+    rows = []
+    payloads = []
+    offset = 0
+    seen = set()
+    for position, question in enumerate(questions, start=1):
+        doc_id = question_doc_id(question, source)
+        if doc_id in seen:
+            raise ValueError(f"Duplicate question ID '{doc_id}'")
+        seen.add(doc_id)
+        payload = _encode(question)
+        rows.append([doc_id, question.get('categoryId'),
+                     question.get('sequence', position), offset, len(payload)])
+        payloads.append(payload)
+        offset += RECORD_LENGTH.size + len(payload)
+
+    index = _encode({'source': source, 'categories': list(categories), 'records': rows})
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, FORMAT_VERSION, 0, len(rows), len(index),
+                            HEADER.size + len(index)))
+        f.write(index)
+        for payload in payloads:
+            f.write(RECORD_LENGTH.pack(len(payload)))
+            f.write(payload)
+    os.replace(tmp_path, path)
+    return len(rows)
+
+
+class QuestionCatalog:
+    """Read-only, memory-mapped view of a .qcat file."""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, _, count, index_length, records_offset = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a question catalogue")
+        if version > FORMAT_VERSION:
+            raise ValueError(f"{path} uses catalogue format {version}, "
+                             f"this script reads up to {FORMAT_VERSION}")
+
+        index = json.loads(self._map[HEADER.size:HEADER.size + index_length].decode('utf-8'))
+        self.source = index.get('source')
+        self.categories = index.get('categories', [])
+        self._records_offset = records_offset
+        self._rows = index['records']
+        if len(self._rows) != count:
+            raise ValueError(f"{path}: index lists {len(self._rows)} records, header {count}")
+
+        self._by_id = {row[0]: position for position, row in enumerate(self._rows)}
+        self._by_category = {}
+        for position, row in enumerate(self._rows):
+            self._by_category.setdefault(row[1], []).append(position)
+        self._by_sequence = sorted((row[2], position) for position, row in enumerate(self._rows))
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+    def _record(self, position):
+        _, _, _, offset, length = self._rows[position]
+        start = self._records_offset + offset + RECORD_LENGTH.size
+        return json.loads(self._map[start:start + length].decode('utf-8'))
+
+    def __iter__(self):
+        """Decode questions lazily in file order."""
+        for position in range(len(self._rows)):
+            yield self._record(position)
+
+    def ids(self):
+        return [row[0] for row in self._rows]
+
+    def get(self, doc_id):
+        """The question with this stable ID, or None."""
+        position = self._by_id.get(doc_id)
+        return None if position is None else self._record(position)
+
+    def by_category(self, category_id):
+        for position in self._by_category.get(category_id, []):
+            yield self._record(position)
+
+    def by_sequence(self, start, end=None):
+        """Questions with start <= sequence < end, in sequence order."""
+        first = bisect.bisect_left(self._by_sequence, (start, -1))
+        for sequence, position in self._by_sequence[first:]:
+            if end is not None and sequence >= end:
+                break
+            yield self._record(position)
+
+    def category_counts(self):
+        return {category_id: len(positions) for category_id, positions in self._by_category.items()}
+
+
+def load_catalog(path):
+    """
+    Return (questions, categories) from a catalogue file.
+
+    ``questions`` is the open QuestionCatalog, not a list: every pass
+    over it decodes the records lazily from the mapped file, and it
+    supports len(). It stays open for the life of the process.
+    """
+    catalog = QuestionCatalog(path)
+    return catalog, list(catalog.categories)
+
+
+def _import_data_module(name):
+    """Import an uploader (e.g. upload_questions) from the project root."""
+    from firestore_client import PROJECT_ROOT
+    if PROJECT_ROOT not in sys.path:
+        sys.path.insert(0, PROJECT_ROOT)
+    return importlib.import_module(name)
+
+
+def build(args):
+    module = _import_data_module(args.module) if args.module else None
+    categories = getattr(module, 'CATEGORIES', []) if module else []
+    source = getattr(module, 'QUESTION_SOURCE', None) if module else None
+
+    if args.markdown:
+        from markdown_questions import compile_markdown
+        section_categories = getattr(module, 'SECTION_CATEGORIES', {}) if module else {}
+        questions = []
+        for section, _, section_questions in compile_markdown(args.markdown, section_categories):
+            print(f"  • {section.number} {section.title}: {len(section_questions)} questions")
+            questions.extend(section_questions)
+    else:
+        questions = module.QUESTIONS
+
+    count = write_catalog(args.output, questions, categories, source)
+    print(f"✅ Wrote {count} questions to {args.output} ({os.path.getsize(args.output)} bytes)")
+
+
+def info(args):
+    with QuestionCatalog(args.path) as catalog:
+        print(f"📦 {args.path}: {len(catalog)} questions, source {catalog.source}")
+        for category_id, count in sorted(catalog.category_counts().items()):
+            print(f"  - {category_id}: {count}")
+
+
+def dump(args):
+    with QuestionCatalog(args.path) as catalog:
+        questions = catalog.by_category(args.category) if args.category else iter(catalog)
+        json.dump(list(questions), sys.stdout, ensure_ascii=False, indent=2)
+        print()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Build and inspect .qcat question catalogues.")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    build_parser = commands.add_parser('build', help="convert a data module or markdown file")
+    build_parser.add_argument('output')
+    build_parser.add_argument('--module', help="uploader module with QUESTIONS/CATEGORIES "
+                                               "(e.g. upload_questions)")
+    build_parser.add_argument('--markdown', metavar='PATH',
+                              help="compile questions from markdown (--module then only "
+                                   "supplies CATEGORIES and SECTION_CATEGORIES)")
+    build_parser.set_defaults(handler=build)
+
+    info_parser = commands.add_parser('info', help="show counts per category")
+    info_parser.add_argument('path')
+    info_parser.set_defaults(handler=info)
+
+    dump_parser = commands.add_parser('dump', help="print questions as JSON")
+    dump_parser.add_argument('path')
+    dump_parser.add_argument('--category')
+    dump_parser.set_defaults(handler=dump)
+
+    args = parser.parse_args()
+    if args.command == 'build' and not (args.module or args.markdown):
+        parser.error("build needs --module and/or --markdown")
+    return args
+
+
+def main():
+    args = parse_args()
+    args.handler(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Active question counters for categories and the global metadata.
+
+`categories/{id}.questionCounter` and `metadata/questions.totalQuestions`
+are kept current with atomic increments that are committed in the same
+batch as the question writes that change them. A reconciliation pass
+recomputes both from server-side count aggregations when asked.
+"""
+
+from batch_writer import MAX_BATCH_WRITES
+from firestore_client import sdk
+
+
+def counter_writes(db, deltas):
+    """Batch writes that apply {category_id: delta} to all counters."""
+    firestore = sdk()
+    writes = []
+    total = 0
+    for category_id, delta in sorted(deltas.items()):
+        if not delta:
+            continue
+        writes.append(('set', db.collection('categories').document(category_id),
+                       {'questionCounter': firestore.Increment(delta)}, True))
+        total += delta
+
+    if total:
+        writes.append(('set', db.collection('metadata').document('questions'), {
+            'totalQuestions': firestore.Increment(total),
+            'updatedAt': firestore.SERVER_TIMESTAMP,
+        }, True))
+    return writes
+
+
+def iter_counted_batches(db, items, limit=MAX_BATCH_WRITES):
+    """
+    Group writes into batches that also carry their counter increments.
+
+    ``items`` yields (write, {category_id: delta}) pairs. Yields
+    (writes, counter_writes) where both lists together fit in one batch.
+    """
+    writes = []
+    deltas = {}
+    for write, item_deltas in items:
+        merged = dict(deltas)
+        for category_id, delta in item_deltas.items():
+            merged[category_id] = merged.get(category_id, 0) + delta
+        # +1 for the write itself, +1 for the metadata total
+        if writes and len(writes) + 1 + len(merged) + 1 > limit:
+            yield writes, counter_writes(db, deltas)
+            writes = []
+            merged = dict(item_deltas)
+        writes.append(write)
+        deltas = merged
+
+    if writes:
+        yield writes, counter_writes(db, deltas)
+
+
+def active_question_count(db):
+    """Number of active questions, the value `totalQuestions` tracks."""
+    firestore = sdk()
+    active = db.collection('questions').where(filter=firestore.FieldFilter('isActive', '==', True))
+    return active.count().get()[0][0].value
+
+
+def reconcile_counters(db, dry_run=False):
+    """Recompute all counters with count aggregations and fix drift."""
+    print("Reconciling question counters...")
+    firestore = sdk()
+    questions_ref = db.collection('questions')
+    active = questions_ref.where(filter=firestore.FieldFilter('isActive', '==', True))
+
+    batch = db.batch()
+    fixes = 0
+    for category in db.collection('categories').stream():
+        result = active.where(
+            filter=firestore.FieldFilter('categoryId', '==', category.id)
+        ).count().get()
+        actual = result[0][0].value
+        stored = (category.to_dict() or {}).get('questionCounter')
+
+        if stored == actual:
+            print(f"  ✓ {category.id}: {actual}")
+            continue
+        print(f"  ⚠ {category.id}: stored {stored}, actual {actual}")
+        batch.set(category.reference, {'questionCounter': actual}, merge=True)
+        fixes += 1
+
+    total = active_question_count(db)
+    metadata_ref = db.collection('metadata').document('questions')
+    metadata = metadata_ref.get()
+    stored_total = (metadata.to_dict() or {}).get('totalQuestions') if metadata.exists else None
+    if stored_total == total:
+        print(f"  ✓ totalQuestions: {total}")
+    else:
+        print(f"  ⚠ totalQuestions: stored {stored_total}, actual {total}")
+        batch.set(metadata_ref, {
+            'totalQuestions': total,
+            'updatedAt': firestore.SERVER_TIMESTAMP,
+        }, merge=True)
+        fixes += 1
+
+    if fixes and not dry_run:
+        batch.commit()
+    print(f"✓ Reconciliation finished ({fixes} counters {'to fix' if dry_run else 'fixed'})")
+    return fixes
@@ -0,0 +1,529 @@
+#!/usr/bin/env python3
+"""
+Content-hash delta sync for question catalogues.
+
+Each catalogue entry gets a stable document ID, namespaced by its source,
+and a hash of its content. Only the hashes already stored in Firestore
+are read back (field projection), and only new or changed questions are
+written; new ones with `create`, so a write never replaces a document it
+did not plan for. Questions that disappeared from the catalogue are
+deactivated, never deleted, so user progress that references them stays
+valid. The dense `activeSequence` numbering (active_sequence.py) is kept
+up to date in the same batches.
+
+A catalogue entry whose ID has no stored document is matched to a stored
+one by its text hash (documents uploaded with auto IDs, or moved to
+another category) and then by its answers (edited text), so such
+documents are updated in place and keep their ID. Before the first sync
+of a source, questions uploaded without `source` are adopted the same way.
+"""
+
+import collections
+import hashlib
+import json
+import re
+
+from active_sequence import (
+    FIELD as ACTIVE_SEQUENCE,
+    compact_active_sequence,
+    compact_active_sequence_async,
+    release_writes,
+    reserve_active_block,
+    reserve_active_block_async,
+    stamp_active_sequence,
+)
+from async_pipeline import DEFAULT_CONCURRENCY, AsyncBatchWriter
+from batch_writer import MAX_BATCH_WRITES, BatchWriter
+from firestore_client import sdk
+from parallel_scan import iter_documents_parallel
+from pool_index import PoolIndex, pool_entry
+from question_counters import iter_counted_batches
+from sequence_allocator import reserve_blocks, reserve_blocks_async, stamp_pool_fields
+
+# Fields that make up the content hash of a question
+CONTENT_FIELDS = (
+    'categoryId',
+    'text',
+    'options',
+    'correctIndices',
+    'explanation',
+    'tips',
+    'sourceLabel',
+    'sourceUrl',
+    'difficulty',
+    'isActive',
+)
+# Fields an edit of the question text usually leaves alone
+ANSWER_FIELDS = ('options', 'correctIndices', 'explanation')
+
+# Projection of a stored question read by the sync, in StoredQuestion order
+STORED_FIELDS = ('contentHash', 'isActive', 'categoryId', 'sequence', 'randomSeed',
+                 ACTIVE_SEQUENCE, 'textHash', 'answerHash')
+StoredQuestion = collections.namedtuple('StoredQuestion', (
+    'content_hash', 'is_active', 'category_id', 'sequence', 'random_seed',
+    'active_sequence', 'text_hash', 'answer_hash'))
+# Projection of the adoption scan
+LEGACY_FIELDS = STORED_FIELDS + ('source', 'text')
+
+
+def _normalize_text(text):
+    return re.sub(r'\s+', ' ', text).strip().lower()
+
+
+def _digest(question, fields):
+    payload = {field: question.get(field) for field in fields}
+    encoded = json.dumps(payload, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+
+def text_hash(text):
+    """SHA-1 of the normalized question text."""
+    return hashlib.sha1(_normalize_text(text).encode('utf-8')).hexdigest()
+
+
+def question_doc_id(question, source=None):
+    """
+    Stable document ID for a catalogue entry.
+
+    Uses an explicit 'id' key if the entry has one, otherwise the source,
+    the category and a digest of the normalized question text. The source
+    prefix keeps catalogues that share a question on separate documents;
+    without ``source`` the ID is only unique within one catalogue.
+    """
+    if question.get('id'):
+        return question['id']
+    prefix = f"{source}-" if source else ''
+    return f"{prefix}{question['categoryId']}-{text_hash(question['text'])[:16]}"
+
+
+def content_hash(question):
+    """SHA-256 over the canonical JSON form of the content fields."""
+    return _digest(question, CONTENT_FIELDS)
+
+
+def answer_hash(question):
+    """SHA-256 over options, correct answers and explanation."""
+    return _digest(question, ANSWER_FIELDS)
+
+
+def _stored_hashes_query(db, source):
+    return (db.collection('questions')
+            .where(filter=sdk().FieldFilter('source', '==', source))
+            .select(list(STORED_FIELDS)))
+
+
+def _stored_entry(doc):
+    data = doc.to_dict() or {}
+    data.setdefault('isActive', True)
+    return StoredQuestion(*(data.get(field) for field in STORED_FIELDS))
+
+
+def fetch_stored_hashes(db, source):
+    """Read {doc_id: StoredQuestion} for a source."""
+    return {doc.id: _stored_entry(doc) for doc in _stored_hashes_query(db, source).stream()}
+
+
+async def fetch_stored_hashes_async(db, source):
+    """Async counterpart of fetch_stored_hashes()."""
+    return {doc.id: _stored_entry(doc)
+            async for doc in _stored_hashes_query(db, source).stream()}
+
+
+def _needs_adoption(stored):
+    """First sync of a source, or documents stored before the text/answer hashes."""
+    return not stored or any(entry.text_hash is None for entry in stored.values())
+
+
+def _adopt(docs, questions, source, stored):
+    """
+    Merge documents without hashes into ``stored`` (see adopt_legacy_questions).
+
+    Their content hash is left empty, so the sync rewrites them once and
+    stores the hashes. Returns (adopted, duplicates) with the IDs of
+    sourceless documents whose text another document already covers.
+    """
+    wanted = {text_hash(question['text']) for question in questions}
+    legacy = []
+    adopted = 0
+    for doc in docs:
+        data = doc.to_dict() or {}
+        if data.get('source') == source and doc.id in stored and not data.get('textHash'):
+            digest = text_hash(data.get('text') or '')
+            stored[doc.id] = _stored_entry(doc)._replace(content_hash=None, text_hash=digest)
+            adopted += 1
+        elif data.get('source') is None and data.get('text'):
+            legacy.append((doc, text_hash(data['text'])))
+
+    claimed = {entry.text_hash for entry in stored.values()}
+    duplicates = []
+    for doc, digest in sorted(legacy, key=lambda item: item[0].id):
+        if digest not in wanted:
+            continue
+        if digest in claimed:
+            duplicates.append(doc.id)
+            continue
+        claimed.add(digest)
+        stored[doc.id] = _stored_entry(doc)._replace(content_hash=None, text_hash=digest)
+        adopted += 1
+    return adopted, duplicates
+
+
+def _print_adoption(source, adopted, duplicates):
+    if adopted:
+        print(f"  • {adopted} questions stored before content-hash sync adopted by '{source}'")
+    if duplicates:
+        print(f"  ⚠ {len(duplicates)} questions without source duplicate a catalogue question "
+              f"and were left unchanged: {', '.join(duplicates[:5])}"
+              f"{' …' if len(duplicates) > 5 else ''}")
+
+
+def adopt_legacy_questions(db, questions, source, stored):
+    """
+    Adopt documents stored before content-hash sync into ``stored``.
+
+    Questions uploaded with auto IDs and no `source` whose text matches
+    an entry of this catalogue, and documents of this source without
+    `textHash`, are read from a projection scan and merged into
+    ``stored``, so plan_sync() updates them in place instead of creating
+    duplicates. Returns the number of documents adopted.
+    """
+    docs = iter_documents_parallel(db, 'questions',
+                                   prepare=lambda query: query.select(list(LEGACY_FIELDS)))
+    adopted, duplicates = _adopt(docs, questions, source, stored)
+    _print_adoption(source, adopted, duplicates)
+    return adopted
+
+
+async def adopt_legacy_questions_async(db, questions, source, stored):
+    """Async counterpart of adopt_legacy_questions()."""
+    query = db.collection('questions').select(list(LEGACY_FIELDS))
+    docs = [doc async for doc in query.stream()]
+    adopted, duplicates = _adopt(docs, questions, source, stored)
+    _print_adoption(source, adopted, duplicates)
+    return adopted
+
+
+def _active_delta(category_id, is_active):
+    return {category_id: 1} if is_active else {}
+
+
+def _insert_items(inserts):
+    return ((('create', ref, document, False),
+             _active_delta(document['categoryId'], document.get('isActive', True)))
+            for ref, document in inserts)
+
+
+def _index_limit(pool_index, category_ids):
+    """
+    Batch size that leaves room for the pool index writes of these
+    categories and the activeSequence hole write.
+    """
+    return MAX_BATCH_WRITES - pool_index.max_writes(category_ids) - 1
+
+
+def _insert_index_writes(pool_index, writes):
+    adds = [(ref.id, document['categoryId'], pool_entry(document))
+            for _, ref, document, _ in writes if document.get('isActive', True)]
+    return pool_index.writes(adds=adds)
+
+
+def _active_documents(writes):
+    return [write[2] for write in writes if write[2].get('isActive', True)]
+
+
+def submit_inserts(db, writer, inserts, pool_index=None, category_ids=None):
+    """
+    Write new questions, one batch per reserved sequence block.
+
+    ``inserts`` is an iterable of (doc_ref, document) pairs; it may be a
+    generator when ``category_ids`` (the categories of all inserts) is
+    given, otherwise it has to be a list. Each document gets
+    sequence, randomSeed, createdAt and (if active) activeSequence stamped
+    before it is written, so new questions are pool-ready without a
+    migration pass. Category and total counters and the pool index are
+    updated in the same batch.
+    """
+    owns_index = pool_index is None
+    pool_index = pool_index or PoolIndex.load(db)
+    if category_ids is None:
+        category_ids = [document['categoryId'] for _, document in inserts]
+    limit = _index_limit(pool_index, category_ids)
+    for writes, counters in iter_counted_batches(db, _insert_items(inserts), limit):
+        active = _active_documents(writes)
+        first_sequence, first_position = reserve_blocks(db, len(writes), len(active))
+        stamp_pool_fields([write[2] for write in writes], first_sequence)
+        stamp_active_sequence(active, first_position)
+        writer.submit(writes + counters + _insert_index_writes(pool_index, writes),
+                      documents=len(writes))
+    if owns_index:
+        pool_index.warn_if_overflowing()
+
+
+async def submit_inserts_async(db, writer, inserts, pool_index=None, category_ids=None):
+    """Async counterpart of submit_inserts() for an AsyncBatchWriter."""
+    owns_index = pool_index is None
+    pool_index = pool_index or await PoolIndex.load_async(db)
+    if category_ids is None:
+        category_ids = [document['categoryId'] for _, document in inserts]
+    limit = _index_limit(pool_index, category_ids)
+    for writes, counters in iter_counted_batches(db, _insert_items(inserts), limit):
+        active = _active_documents(writes)
+        first_sequence, first_position = await reserve_blocks_async(db, len(writes), len(active))
+        stamp_pool_fields([write[2] for write in writes], first_sequence)
+        stamp_active_sequence(active, first_position)
+        await writer.submit(writes + counters + _insert_index_writes(pool_index, writes),
+                            documents=len(writes))
+    if owns_index:
+        pool_index.warn_if_overflowing()
+
+
+class SyncPlan:
+    """Writes needed to bring Firestore in line with a catalogue."""
+
+    def __init__(self):
+        self.creates = []        # (doc_id, document)
+        self.updates = []        # (doc_id, document, counter deltas)
+        self.deactivations = []  # (doc_id, counter deltas)
+        self.unchanged = 0
+        self.matched = 0            # entries matched to a stored document by text or answers
+        # doc_id -> ([(doc_id, category_id, entry)], [(doc_id, category_id)])
+        self.pool_index_changes = {}
+        self.reactivated = set()    # doc_ids that need a new activeSequence
+        self.released = {}          # doc_id -> activeSequence freed by a deactivation
+
+    @property
+    def total_writes(self):
+        return len(self.creates) + len(self.updates) + len(self.deactivations)
+
+
+def _match_stored(pending, stored, claimed):
+    """
+    Map catalogue entries without a document of their own to unclaimed
+    stored documents: same text first, then same answers in the same
+    category when that pairs exactly one entry with one document.
+    """
+    unclaimed = sorted(doc_id for doc_id in stored if doc_id not in claimed)
+    by_text = {}
+    for doc_id in unclaimed:
+        by_text.setdefault(stored[doc_id].text_hash, []).append(doc_id)
+
+    matches = {}
+    for doc_id, question in pending:
+        candidates = by_text.get(text_hash(question['text']), [])
+        if candidates:
+            matches[doc_id] = candidates.pop(0)
+
+    def answer_key(category_id, answers):
+        return (category_id, answers) if answers else None
+
+    taken = set(matches.values())
+    documents = {}
+    for doc_id in unclaimed:
+        if doc_id not in taken:
+            key = answer_key(stored[doc_id].category_id, stored[doc_id].answer_hash)
+            documents.setdefault(key, []).append(doc_id)
+    entries = {}
+    for doc_id, question in pending:
+        if doc_id not in matches:
+            key = answer_key(question['categoryId'], answer_hash(question))
+            entries.setdefault(key, []).append(doc_id)
+    for key, doc_ids in entries.items():
+        if key is not None and len(doc_ids) == 1 and len(documents.get(key, [])) == 1:
+            matches[doc_ids[0]] = documents[key][0]
+    return matches
+
+
+def plan_sync(questions, stored, source, categories=None):
+    """
+    Diff catalogue entries against stored hashes.
+
+    If ``categories`` is given, only stored questions of those categories
+    are considered for deactivation (partial catalogues).
+    """
+    plan = SyncPlan()
+    entries = []
+    seen = set()
+    for question in questions:
+        doc_id = question_doc_id(question, source)
+        if doc_id in seen:
+            raise ValueError(f"Duplicate question ID '{doc_id}': {question['text'][:60]}")
+        seen.add(doc_id)
+        entries.append((doc_id, question))
+
+    pending = [(doc_id, question) for doc_id, question in entries if doc_id not in stored]
+    matches = _match_stored(pending, stored, seen)
+    plan.matched = len(matches)
+    claimed = seen | set(matches.values())
+
+    for doc_id, question in entries:
+        doc_id = matches.get(doc_id, doc_id)
+        digest = content_hash(question)
+        current = stored.get(doc_id)
+        if current is not None and \
+                (current.content_hash, current.is_active) == (digest, question.get('isActive', True)):
+            plan.unchanged += 1
+            continue
+
+        document = {k: v for k, v in question.items() if k != 'id'}
+        document['contentHash'] = digest
+        document['textHash'] = text_hash(question['text'])
+        document['answerHash'] = answer_hash(question)
+        document['source'] = source
+        if current is None:
+            plan.creates.append((doc_id, document))
+            continue
+
+        was_active, old_category = current.is_active, current.category_id
+        deltas = _active_delta(old_category, was_active)
+        deltas = {category_id: -delta for category_id, delta in deltas.items()}
+        removes = [(doc_id, old_category)] if was_active else []
+        adds = []
+        if question.get('isActive', True):
+            deltas[question['categoryId']] = deltas.get(question['categoryId'], 0) + 1
+            # Stored sequence/randomSeed are kept by the merge write
+            entry = pool_entry({'sequence': current.sequence, 'randomSeed': current.random_seed,
+                                'difficulty': question.get('difficulty')})
+            adds.append((doc_id, question['categoryId'], entry))
+            if old_category == question['categoryId']:
+                removes = []
+            if not was_active:
+                plan.reactivated.add(doc_id)
+        elif was_active:
+            plan.released[doc_id] = current.active_sequence
+        plan.updates.append((doc_id, document, deltas))
+        plan.pool_index_changes[doc_id] = (adds, removes)
+
+    for doc_id, current in stored.items():
+        if categories is not None and current.category_id not in categories:
+            continue
+        if doc_id not in claimed and current.is_active:
+            plan.deactivations.append((doc_id, {current.category_id: -1}))
+            plan.released[doc_id] = current.active_sequence
+            plan.pool_index_changes[doc_id] = ([], [(doc_id, current.category_id)])
+
+    return plan
+
+
+def _print_plan(stored, questions, plan):
+    print(f"  • {len(stored)} stored, {len(questions)} in catalogue")
+    print(f"  • {len(plan.creates)} new, {len(plan.updates)} changed, "
+          f"{len(plan.deactivations)} removed, {plan.unchanged} unchanged")
+    if plan.matched:
+        print(f"  • {plan.matched} matched to a stored question by text or answers (ID kept)")
+    if plan.total_writes == 0:
+        print("✓ Questions already up to date")
+
+
+def _plan_writes(db, plan):
+    """Split a plan into (inserts, changes) for the submit helpers."""
+    server_timestamp = sdk().SERVER_TIMESTAMP
+    question_ref = db.collection('questions')
+
+    inserts = []
+    for doc_id, document in plan.creates:
+        document['updatedAt'] = server_timestamp
+        inserts.append((question_ref.document(doc_id), document))
+
+    changes = []
+    for doc_id, document, deltas in plan.updates:
+        document['updatedAt'] = server_timestamp
+        if doc_id in plan.released:
+            document[ACTIVE_SEQUENCE] = sdk().DELETE_FIELD
+        # Merge so fields managed elsewhere (e.g. sequence) are kept
+        changes.append((('set', question_ref.document(doc_id), document, True), deltas))
+    for doc_id, deltas in plan.deactivations:
+        changes.append((('update', question_ref.document(doc_id), {
+            'isActive': False,
+            ACTIVE_SEQUENCE: sdk().DELETE_FIELD,
+            'updatedAt': server_timestamp,
+        }, False), deltas))
+    return inserts, changes
+
+
+def _reactivated_documents(plan, writes):
+    return [data for _, ref, data, _ in writes if ref.id in plan.reactivated]
+
+
+def _released_writes(db, plan, writes):
+    return release_writes(db, [plan.released[ref.id] for _, ref, _, _ in writes
+                               if ref.id in plan.released])
+
+
+def _change_categories(changes):
+    return {category_id for _, deltas in changes for category_id in deltas}
+
+
+def _change_index_writes(pool_index, plan, writes):
+    adds, removes = [], []
+    for _, ref, _, _ in writes:
+        doc_adds, doc_removes = plan.pool_index_changes.get(ref.id, ([], []))
+        adds.extend(doc_adds)
+        removes.extend(doc_removes)
+    return pool_index.writes(adds=adds, removes=removes)
+
+
+def sync_questions(db, questions, source, categories=None, dry_run=False,
+                   concurrency=DEFAULT_CONCURRENCY):
+    """Write only new/changed questions and deactivate removed ones."""
+    print(f"Syncing questions (source: {source})...")
+    stored = fetch_stored_hashes(db, source)
+    if _needs_adoption(stored):
+        adopt_legacy_questions(db, questions, source, stored)
+    plan = plan_sync(questions, stored, source, categories)
+    _print_plan(stored, questions, plan)
+    if dry_run or plan.total_writes == 0:
+        return plan
+
+    inserts, changes = _plan_writes(db, plan)
+    pool_index = PoolIndex.load(db)
+    writer = BatchWriter(db, max_in_flight=concurrency)
+    submit_inserts(db, writer, inserts, pool_index)
+    limit = _index_limit(pool_index, _change_categories(changes))
+    for writes, counters in iter_counted_batches(db, changes, limit):
+        reactivated = _reactivated_documents(plan, writes)
+        if reactivated:
+            stamp_active_sequence(reactivated, reserve_active_block(db, len(reactivated)))
+        writer.submit(writes + counters + _change_index_writes(pool_index, plan, writes)
+                      + _released_writes(db, plan, writes),
+                      documents=len(writes))
+    stats = writer.close()
+    pool_index.warn_if_overflowing()
+
+    print(f"✓ Sync finished: {stats.summary()}")
+    if plan.released:
+        compact_active_sequence(db)
+    return plan
+
+
+async def sync_questions_async(db, questions, source, categories=None, dry_run=False,
+                               concurrency=DEFAULT_CONCURRENCY):
+    """sync_questions() on the async client with ``concurrency`` commits in flight."""
+    print(f"Syncing questions (source: {source}, async)...")
+    stored = await fetch_stored_hashes_async(db, source)
+    if _needs_adoption(stored):
+        await adopt_legacy_questions_async(db, questions, source, stored)
+    plan = plan_sync(questions, stored, source, categories)
+    _print_plan(stored, questions, plan)
+    if dry_run or plan.total_writes == 0:
+        return plan
+
+    inserts, changes = _plan_writes(db, plan)
+    pool_index = await PoolIndex.load_async(db)
+    writer = AsyncBatchWriter(db, concurrency=concurrency)
+    await submit_inserts_async(db, writer, inserts, pool_index)
+    limit = _index_limit(pool_index, _change_categories(changes))
+    for writes, counters in iter_counted_batches(db, changes, limit):
+        reactivated = _reactivated_documents(plan, writes)
+        if reactivated:
+            stamp_active_sequence(reactivated,
+                                  await reserve_active_block_async(db, len(reactivated)))
+        await writer.submit(writes + counters + _change_index_writes(pool_index, plan, writes)
+                            + _released_writes(db, plan, writes),
+                            documents=len(writes))
+    stats = await writer.close()
+    pool_index.warn_if_overflowing()
+
+    print(f"✓ Sync finished: {stats.summary()}")
+    if plan.released:
+        await compact_active_sequence_async(db)
+    return plan
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Sequence number allocation for new questions.
+
+The question pool expands by paging through `questions` ordered by
+`sequence`, so every question needs a unique, increasing sequence and a
+`randomSeed`. Instead of renumbering the collection afterwards, writers
+reserve a contiguous block from `metadata/questions.maxSequence` in one
+transaction per batch and stamp the fields as they write. The same
+transaction reserves `activeSequence` positions (active_sequence.py) for
+the active questions of the batch.
+"""
+
+import random
+
+from active_sequence import active_sequence_ref
+from firestore_client import sdk
+
+
+def _reserve(transaction, refs, snapshots, count, active):
+    """Stage the reservation writes and return (first_sequence, first_position)."""
+    firestore = sdk()
+    by_path = {snapshot.reference.path: snapshot for snapshot in snapshots}
+    questions, positions = ((by_path[ref.path].to_dict() if by_path[ref.path].exists else None) or {}
+                            for ref in refs)
+    max_sequence = questions.get('maxSequence', 0)
+    max_position = positions.get('max', 0)
+    transaction.set(refs[0], {
+        'maxSequence': max_sequence + count,
+        'updatedAt': firestore.SERVER_TIMESTAMP,
+    }, merge=True)
+    if active:
+        transaction.set(refs[1], {
+            'max': max_position + active,
+            'updatedAt': firestore.SERVER_TIMESTAMP,
+        }, merge=True)
+    return max_sequence + 1, max_position + 1
+
+
+def reserve_blocks(db, count, active=0):
+    """
+    Reserve ``count`` consecutive sequence numbers and ``active``
+    activeSequence positions (for the active ones among them) in one
+    transaction. Returns (first_sequence, first_position).
+    """
+    if count <= 0:
+        raise ValueError("count must be positive")
+
+    refs = [db.collection('metadata').document('questions'), active_sequence_ref(db)]
+
+    @sdk().transactional
+    def reserve(transaction):
+        snapshots = db.get_all(refs, transaction=transaction)
+        return _reserve(transaction, refs, snapshots, count, active)
+
+    return reserve(db.transaction())
+
+
+async def reserve_blocks_async(db, count, active=0):
+    """Async counterpart of reserve_blocks() for the async client."""
+    if count <= 0:
+        raise ValueError("count must be positive")
+
+    refs = [db.collection('metadata').document('questions'), active_sequence_ref(db)]
+
+    @sdk().async_transactional
+    async def reserve(transaction):
+        snapshots = [snapshot async for snapshot in db.get_all(refs, transaction=transaction)]
+        return _reserve(transaction, refs, snapshots, count, active)
+
+    return await reserve(db.transaction())
+
+
+def reserve_sequence_block(db, count):
+    """Reserve ``count`` consecutive sequence numbers and return the first."""
+    return reserve_blocks(db, count)[0]
+
+
+async def reserve_sequence_block_async(db, count):
+    """Async counterpart of reserve_sequence_block() for the async client."""
+    return (await reserve_blocks_async(db, count))[0]
+
+
+def stamp_pool_fields(documents, first_sequence):
+    """
+    Add sequence, randomSeed, createdAt and updatedAt to new question
+    documents (differential archives pick up changes by updatedAt).
+    """
+    server_timestamp = sdk().SERVER_TIMESTAMP
+    for offset, document in enumerate(documents):
+        document['sequence'] = first_sequence + offset
+        document['randomSeed'] = random.random()
+        document['createdAt'] = server_timestamp
+        document['updatedAt'] = server_timestamp
+    return documents
@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+Local compressed snapshots of a collection.
+
+An export is a `.jsonl.zst` file of independent zstd frames, each
+holding FRAME_DOCUMENTS JSON lines (`{"id": ..., "data": {...}}`) in
+document ID order, plus a sidecar index `<file>.idx.json`:
+
+    {"format": 1, "collection": "questions", "documents": 100000,
+     "frames": [[offset, length, count, firstId, lastId], ...]}
+
+The concatenated frames are a regular zstd stream (`zstd -dc` prints
+the JSON lines), while the index allows reading a single document or
+frame without decompressing the rest. Restores replay frames through
+BatchWriter and checkpoint finished frames in `<file>.restore.json`, so
+an interrupted restore continues where it stopped.
+"""
+
+import base64
+import bisect
+import json
+import os
+import threading
+from datetime import datetime
+
+from batch_writer import DEFAULT_MAX_IN_FLIGHT, BatchWriter, iter_chunks
+from paged_reader import iter_pages
+
+FORMAT_VERSION = 1
+FRAME_DOCUMENTS = 1000
+DEFAULT_LEVEL = 3
+INDEX_SUFFIX = '.idx.json'
+CHECKPOINT_SUFFIX = '.restore.json'
+
+
+def zstd():
+    """The zstandard module (optional dependency, imported lazily)."""
+    try:
+        import zstandard
+    except ImportError as e:
+        raise RuntimeError("Snapshot export needs the zstandard package: "
+                           "pip install -r scripts/requirements.txt") from e
+    return zstandard
+
+
+def encode_value(value):
+    """JSON ``default`` hook: timestamps and bytes become tagged objects."""
+    if isinstance(value, datetime):
+        return {'$timestamp': value.isoformat()}
+    if isinstance(value, bytes):
+        return {'$bytes': base64.b64encode(value).decode('ascii')}
+    raise TypeError(f"{type(value).__name__} values cannot be exported")
+
+
+def decode_value(obj):
+    """JSON ``object_hook`` reversing encode_value()."""
+    if len(obj) == 1:
+        if '$timestamp' in obj:
+            return datetime.fromisoformat(obj['$timestamp'])
+        if '$bytes' in obj:
+            return base64.b64decode(obj['$bytes'])
+    return obj
+
+
+def _write_json(path, data):
+    """Write JSON atomically (temp file + rename)."""
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+class FrameWriter:
+    """
+    Writes (id, data) records as zstd frames of FRAME_DOCUMENTS JSON lines
+    to ``path`` and the offset index to ``path`` + INDEX_SUFFIX on close().
+    """
+
+    def __init__(self, path, level=DEFAULT_LEVEL):
+        self.path = path
+        self.documents = 0
+        self.frames = []
+        self._compressor = zstd().ZstdCompressor(level=level)
+        self._out = open(path + '.part', 'wb')
+        self._offset = 0
+        self._lines = []
+        self._first_id = self._last_id = None
+
+    @property
+    def compressed_bytes(self):
+        return self._offset
+
+    def add(self, record_id, data):
+        if not self._lines:
+            self._first_id = record_id
+        self._last_id = record_id
+        self._lines.append(json.dumps({'id': record_id, 'data': data}, ensure_ascii=False,
+                                      separators=(',', ':'), default=encode_value) + '\n')
+        self.documents += 1
+        if len(self._lines) == FRAME_DOCUMENTS:
+            self._write_frame()
+
+    def _write_frame(self):
+        frame = self._compressor.compress(''.join(self._lines).encode('utf-8'))
+        self._out.write(frame)
+        self.frames.append([self._offset, len(frame), len(self._lines),
+                            self._first_id, self._last_id])
+        self._offset += len(frame)
+        self._lines = []
+
+    def close(self, **index_fields):
+        """Finish the file and write its index; ``index_fields`` are stored with it."""
+        if self._lines:
+            self._write_frame()
+        self._out.close()
+        os.replace(self.path + '.part', self.path)
+        index = {
+            'format': FORMAT_VERSION,
+            **index_fields,
+            'documents': self.documents,
+            'exportedAt': datetime.now().astimezone().isoformat(),
+            'frames': self.frames,
+        }
+        _write_json(self.path + INDEX_SUFFIX, index)
+        return index
+
+
+def export_snapshot(db, path, collection='questions', level=DEFAULT_LEVEL):
+    """Stream ``collection`` into a compressed snapshot at ``path``. Returns the index."""
+    writer = FrameWriter(path, level)
+    for page in iter_pages(db.collection(collection)):
+        for doc in page:
+            writer.add(doc.id, doc.to_dict())
+        print(f"📝 Exported {writer.documents} documents "
+              f"({writer.compressed_bytes / 1e6:.1f} MB compressed)...")
+    return writer.close(collection=collection)
+
+
+def _name_key(record_id):
+    return tuple(record_id.split('/'))
+
+
+class SnapshotReader:
+    """Random and sequential access to an exported snapshot."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path + INDEX_SUFFIX, encoding='utf-8') as f:
+            self.index = json.load(f)
+        if self.index.get('format') != FORMAT_VERSION:
+            raise ValueError(f"Unsupported snapshot format in {path}")
+        self.frames = self.index['frames']
+        # Collection-group exports use document paths as IDs; compare them by segment
+        self._last_ids = [_name_key(frame[4]) for frame in self.frames]
+        self._decompressor = zstd().ZstdDecompressor()
+
+    def __len__(self):
+        return self.index['documents']
+
+    def frame(self, number):
+        """Decoded [(id, data)] of one frame."""
+        offset, length = self.frames[number][:2]
+        with open(self.path, 'rb') as f:
+            f.seek(offset)
+            raw = self._decompressor.decompress(f.read(length))
+        records = [json.loads(line, object_hook=decode_value) for line in raw.decode('utf-8').splitlines()]
+        return [(record['id'], record['data']) for record in records]
+
+    def get(self, doc_id):
+        """Data of one document, or None; decompresses a single frame."""
+        if not self.index.get('ordered', True):
+            return next((data for record_id, data in self if record_id == doc_id), None)
+        key = _name_key(doc_id)
+        number = bisect.bisect_left(self._last_ids, key)
+        if number == len(self.frames) or _name_key(self.frames[number][3]) > key:
+            return None
+        return dict(self.frame(number)).get(doc_id)
+
+    def __iter__(self):
+        for number in range(len(self.frames)):
+            yield from self.frame(number)
+
+
+class _FrameProgress:
+    """Tracks commits per frame and checkpoints frames once fully written."""
+
+    def __init__(self, checkpoint_path, collection, done):
+        self._path = checkpoint_path
+        self._collection = collection
+        self._lock = threading.Lock()
+        self._pending = {}
+        self.done = set(done)
+
+    def add(self, number, futures):
+        with self._lock:
+            self._pending[number] = len(futures)
+        for future in futures:
+            future.add_done_callback(lambda f, number=number: self._finished(number, f))
+
+    def _finished(self, number, future):
+        if future.exception() is not None:
+            return
+        with self._lock:
+            self._pending[number] -= 1
+            if self._pending[number] == 0:
+                del self._pending[number]
+                self.done.add(number)
+
+    def save(self):
+        with self._lock:
+            done = sorted(self.done)
+        _write_json(self._path, {'collection': self._collection, 'frames': done})
+
+
+def restore_snapshot(db, path, collection=None, max_in_flight=DEFAULT_MAX_IN_FLIGHT, ramp=False):
+    """
+    Write a snapshot back into ``collection`` (default: the exported one).
+
+    Collection-group snapshots are written back to their document paths.
+    Frames already recorded in the checkpoint of a previous, interrupted
+    restore into the same collection are skipped. Commits are paced
+    adaptively; ``ramp`` adds the 500/50/5 ramp-up for an empty target
+    collection. Returns documents written.
+    """
+    reader = SnapshotReader(path)
+    if reader.index.get('collectionGroup'):
+        collection = reader.index['collectionGroup']
+        ref_for = db.document
+    else:
+        collection = collection or reader.index['collection']
+        ref_for = db.collection(collection).document
+    checkpoint_path = path + CHECKPOINT_SUFFIX
+
+    done = []
+    if os.path.exists(checkpoint_path):
+        with open(checkpoint_path, encoding='utf-8') as f:
+            checkpoint = json.load(f)
+        if checkpoint.get('collection') == collection:
+            done = checkpoint['frames']
+            print(f"↩️  Resuming restore: {len(done)}/{len(reader.frames)} frames already written")
+    progress = _FrameProgress(checkpoint_path, collection, done)
+
+    written = 0
+    try:
+        with BatchWriter(db, max_in_flight=max_in_flight, verbose=False,
+                         adaptive=True, ramp=ramp) as writer:
+            for number in range(len(reader.frames)):
+                if number in progress.done:
+                    continue
+                records = reader.frame(number)
+                futures = [writer.submit([('set', ref_for(doc_id), data, False)
+                                          for doc_id, data in chunk])
+                           for chunk in iter_chunks(records, writer.batch_size)]
+                progress.add(number, futures)
+                written += len(records)
+                if number % 10 == 9:
+                    progress.save()
+                    print(f"📝 Restored {written} documents...")
+        stats = writer.stats
+    finally:
+        progress.save()
+
+    os.remove(checkpoint_path)
+    print(f"⚡ Throughput: {stats.summary()}")
+    return written
@@ -0,0 +1,25 @@
+"""Shared fixtures: every test runs against a fresh in-memory Firestore fake."""
+
+import os
+import sys
+
+import pytest
+
+SCRIPTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SCRIPTS_DIR)
+sys.path.insert(0, os.path.dirname(SCRIPTS_DIR))
+
+import firestore_client  # noqa: E402
+
+
+@pytest.fixture
+def db():
+    """Client of an empty fake_firestore store."""
+    firestore_client.use_fake()
+    return firestore_client.get_client()
+
+
+@pytest.fixture
+def store(db):
+    """The FakeStore behind ``db``."""
+    return firestore_client.fake_store()
@@ -0,0 +1,43 @@
+import pytest
+
+import firestore_client
+from batch_writer import BatchWriter
+
+
+def time_out_after_applying(monkeypatch, store):
+    """The first commit lands but reports DeadlineExceeded."""
+    apply = store.apply
+    calls = []
+
+    def apply_then_time_out(writes, read_versions=None):
+        result = apply(writes, read_versions)
+        calls.append(len(writes))
+        if len(calls) == 1:
+            raise firestore_client.api_exceptions().DeadlineExceeded("deadline exceeded")
+        return result
+
+    monkeypatch.setattr(store, 'apply', apply_then_time_out)
+    return calls
+
+
+def test_timed_out_increments_are_not_replayed(db, store, monkeypatch):
+    calls = time_out_after_applying(monkeypatch, store)
+    ref = db.collection('categories').document('motorik')
+
+    with pytest.raises(firestore_client.api_exceptions().DeadlineExceeded):
+        with BatchWriter(db, verbose=False) as writer:
+            writer.set(ref, {'questionCounter': firestore_client.sdk().Increment(1)}, merge=True)
+
+    assert len(calls) == 1
+    assert ref.get().get('questionCounter') == 1
+
+
+def test_timed_out_plain_writes_are_retried(db, store, monkeypatch):
+    calls = time_out_after_applying(monkeypatch, store)
+    ref = db.collection('categories').document('motorik')
+
+    with BatchWriter(db, verbose=False) as writer:
+        writer.set(ref, {'title': 'Motorik'})
+
+    assert len(calls) == 2
+    assert ref.get().get('title') == 'Motorik'
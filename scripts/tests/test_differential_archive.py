@@ -0,0 +1,25 @@
+import firestore_client
+import upload_questions as uploader
+from differential_archive import archive_differential, load_state, reconstruct_snapshot
+
+
+def test_incremental_run_on_the_base_date_keeps_the_base(capsys):
+    firestore_client.use_fake(questions=50)
+    db = firestore_client.get_client()
+    archive_differential(db, '2024-05-01')
+    archive_differential(db, '2024-05-01')
+    archive_differential(db, '2024-05-02')
+
+    assert load_state(db)['chain']['2024-05-01']['full'] is True
+    assert len(dict(reconstruct_snapshot(db, '2024-05-01'))) == 50
+
+
+def test_incremental_run_picks_up_questions_uploaded_after_the_base(capsys):
+    firestore_client.use_fake(questions=20)
+    db = firestore_client.get_client()
+    archive_differential(db, '2024-05-01')
+
+    uploader.upload_questions(db)
+    archive_differential(db, '2024-05-02')
+
+    assert len(dict(reconstruct_snapshot(db, '2024-05-02'))) == 20 + len(uploader.QUESTIONS)
@@ -0,0 +1,25 @@
+import firestore_client
+from migrate_questions_sequence import migrate_questions_complete, verify_migration
+
+
+def test_verify_reports_duplicates_that_fit_the_range(db, capsys):
+    for number, sequence in enumerate([1, 1, 4, 4]):
+        db.collection('questions').document(f'q{number}').set(
+            {'sequence': sequence, 'randomSeed': 0.5, 'isActive': True})
+
+    verify_migration(db, expected_count=4, expected_max=4)
+
+    output = capsys.readouterr().out
+    assert 'Found 2 duplicate sequences' in output
+    assert 'Found 2 gaps' in output
+
+
+def test_migration_metadata_counts_active_questions_only():
+    firestore_client.use_fake(questions=40)
+    db = firestore_client.get_client()
+    for doc in list(db.collection('questions').limit(5).stream()):
+        doc.reference.update({'isActive': False})
+
+    migrate_questions_complete(db)
+
+    assert db.collection('metadata').document('questions').get().get('totalQuestions') == 35
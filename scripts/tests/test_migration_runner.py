@@ -0,0 +1,67 @@
+import time
+
+import pytest
+
+import firestore_client
+from migration_runner import Migration, load_checkpoint, run_migration
+
+
+class MarkMigrated(Migration):
+    name = 'mark_migrated'
+
+    def transform(self, doc_id, data, state):
+        return {'migrated': True}
+
+
+def migrated_ids(db):
+    return {doc.id for doc in db.collection('questions').stream()
+            if (doc.to_dict() or {}).get('migrated')}
+
+
+def test_resume_after_a_failed_batch_migrates_every_document(monkeypatch):
+    firestore_client.use_fake(questions=60)
+    db = firestore_client.get_client()
+    store = firestore_client.fake_store()
+    apply = store.apply
+    commits = []
+
+    def fail_second_commit(writes, read_versions=None):
+        commits.append(len(writes))
+        if len(commits) == 2:
+            time.sleep(0.2)  # the next page is read and submitted meanwhile
+            raise firestore_client.api_exceptions().InvalidArgument("rejected batch")
+        return apply(writes, read_versions)
+
+    monkeypatch.setattr(store, 'apply', fail_second_commit)
+    with pytest.raises(firestore_client.api_exceptions().InvalidArgument):
+        run_migration(db, MarkMigrated(), batch_size=10, verbose=False)
+
+    checkpoint = load_checkpoint(db, MarkMigrated())
+    assert checkpoint['processed'] == 10
+    assert len(migrated_ids(db)) == 10
+
+    monkeypatch.setattr(store, 'apply', apply)
+    result = run_migration(db, MarkMigrated(), batch_size=10, verbose=False)
+    assert result['processed'] == 60
+    assert len(migrated_ids(db)) == 60
+
+
+class CountIds(Migration):
+    name = 'count_ids'
+
+    def __init__(self):
+        self.seen = []
+
+    def transform(self, doc_id, data, state):
+        self.seen.append(data)
+
+
+def test_migration_without_fields_reads_document_ids_only():
+    firestore_client.use_fake(questions=30)
+    db = firestore_client.get_client()
+    migration = CountIds()
+
+    run_migration(db, migration, verbose=False)
+
+    assert len(migration.seen) == 30
+    assert all(data == {} for data in migration.seen)
@@ -0,0 +1,18 @@
+import upload_erziehungsapp_questions as erziehungsapp
+from near_duplicates import catalogue_key, find_near_duplicates, live_entries, live_ids_by_hash
+from question_sync import sync_questions
+
+
+def test_live_questions_are_not_duplicates_of_their_own_catalogue_entries(db):
+    erziehungsapp.upload_questions(db)
+    sync_questions(db, erziehungsapp.QUESTIONS, erziehungsapp.QUESTION_SOURCE)
+
+    entries = dict(live_entries(db))
+    live_ids = live_ids_by_hash(entries)
+    for question in erziehungsapp.QUESTIONS:
+        entries[catalogue_key(question, erziehungsapp.QUESTION_SOURCE, live_ids)] = question
+
+    assert len(entries) == len(erziehungsapp.QUESTIONS)
+    catalogue_only = find_near_duplicates(
+        ((str(n), question) for n, question in enumerate(erziehungsapp.QUESTIONS)))
+    assert len(find_near_duplicates(entries.items())) == len(catalogue_only)
@@ -0,0 +1,34 @@
+import firestore_client
+import pool_index
+from pool_index import POOL_INDEX_COLLECTION, PoolIndex, rebuild_pool_index, shard_doc_id
+
+
+def shard_ids(db):
+    return {doc.id for doc in db.collection(POOL_INDEX_COLLECTION).select(['__name__']).stream()}
+
+
+def indexed_questions(db, category_id):
+    """Question IDs reachable through the layout the category document points at."""
+    index = PoolIndex.load(db)
+    generation = index.generation(category_id)
+    entries = {}
+    for shard in range(index.shard_count(category_id)):
+        ref = db.collection(POOL_INDEX_COLLECTION).document(
+            shard_doc_id(category_id, shard, generation))
+        entries.update(ref.get().get('entries'))
+    return set(entries)
+
+
+def test_reshard_switches_to_a_complete_new_generation(monkeypatch):
+    firestore_client.use_fake(questions=300)
+    db = firestore_client.get_client()
+    rebuild_pool_index(db)
+    expected = indexed_questions(db, 'motorik')
+    assert len(expected) > 20
+
+    monkeypatch.setattr(pool_index, 'SHARD_TARGET', 20)
+    rebuild_pool_index(db)
+
+    assert PoolIndex.load(db).generation('motorik') == 1
+    assert indexed_questions(db, 'motorik') == expected
+    assert all('-g1-' in doc_id for doc_id in shard_ids(db))
@@ -0,0 +1,20 @@
+import os
+
+import publish_bundles
+from publish_bundles import load_manifest, publish_bundles as publish, published_files
+
+
+def test_deleted_category_loses_its_bundle(db, tmp_path, monkeypatch):
+    monkeypatch.setattr(publish_bundles, 'build_bundle',
+                        lambda db, category_id, version: f'{category_id}-{version}'.encode())
+    for category_id in ('motorik', 'schlaf'):
+        db.collection('categories').document(category_id).set({'title': category_id})
+    publish(db, str(tmp_path))
+
+    db.collection('categories').document('schlaf').delete()
+    changed = publish(db, str(tmp_path))
+
+    manifest = load_manifest(str(tmp_path))
+    assert list(manifest['bundles']) == ['motorik']
+    assert 'manifest.json' in changed
+    assert set(os.listdir(tmp_path)) == published_files(manifest)
@@ -0,0 +1,20 @@
+import upload_questions as uploader
+from question_catalog import QuestionCatalog, load_catalog, write_catalog
+
+
+def test_catalog_upload_decodes_records_lazily(db, tmp_path, monkeypatch):
+    path = str(tmp_path / 'questions.qcat')
+    write_catalog(path, uploader.QUESTIONS, uploader.CATEGORIES, uploader.QUESTION_SOURCE)
+    decoded = []
+    record = QuestionCatalog._record
+    monkeypatch.setattr(QuestionCatalog, '_record',
+                        lambda self, position: decoded.append(position) or record(self, position))
+
+    questions, categories = load_catalog(path)
+    assert not decoded
+    assert len(questions) == len(uploader.QUESTIONS)
+
+    monkeypatch.setattr(uploader, 'QUESTIONS', questions)
+    uploader.upload_questions(db)
+    assert len(list(db.collection('questions').stream())) == len(uploader.QUESTIONS)
+    questions.close()
@@ -0,0 +1,42 @@
+import upload_erziehungsapp_questions as erziehungsapp
+import upload_questions as uploader
+from question_counters import reconcile_counters
+from question_sync import sync_questions
+
+
+def active_count(questions, category_id=None):
+    return sum(1 for question in questions if question.get('isActive', True)
+               and category_id in (None, question['categoryId']))
+
+
+def counter(db, category_id):
+    return db.collection('categories').document(category_id).get().get('questionCounter')
+
+
+def test_two_source_sync_leaves_no_counter_drift(db):
+    uploader.upload_categories(db)
+    erziehungsapp.upload_categories(db)
+    for _ in range(2):
+        sync_questions(db, uploader.QUESTIONS, uploader.QUESTION_SOURCE)
+        sync_questions(db, erziehungsapp.QUESTIONS, erziehungsapp.QUESTION_SOURCE)
+
+    assert reconcile_counters(db, dry_run=True) == 0
+    total = db.collection('metadata').document('questions').get().get('totalQuestions')
+    assert total == active_count(uploader.QUESTIONS) + active_count(erziehungsapp.QUESTIONS)
+    assert counter(db, 'motorik') == (active_count(uploader.QUESTIONS, 'motorik')
+                                      + active_count(erziehungsapp.QUESTIONS, 'motorik'))
+
+
+def test_removed_and_restored_questions_move_the_counters(db):
+    uploader.upload_categories(db)
+    questions = uploader.QUESTIONS
+    category_id = questions[0]['categoryId']
+    sync_questions(db, questions, 'test')
+
+    sync_questions(db, questions[1:], 'test')
+    assert counter(db, category_id) == active_count(questions[1:], category_id)
+    assert reconcile_counters(db, dry_run=True) == 0
+
+    sync_questions(db, questions, 'test')
+    assert counter(db, category_id) == active_count(questions, category_id)
+    assert reconcile_counters(db, dry_run=True) == 0
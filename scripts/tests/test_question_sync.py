@@ -0,0 +1,79 @@
+import asyncio
+
+import pytest
+
+import upload_erziehungsapp_questions as erziehungsapp
+import upload_questions as uploader
+import firestore_client
+from active_sequence import active_sequence_ref, verify_active_sequence
+from fake_firestore import AlreadyExists
+from question_sync import question_doc_id, sync_questions, sync_questions_async
+
+
+def live_questions(db):
+    return {doc.id: doc.to_dict() for doc in db.collection('questions').stream()}
+
+
+def test_sources_sharing_questions_keep_their_own_documents(db):
+    sync_questions(db, uploader.QUESTIONS, uploader.QUESTION_SOURCE)
+    sync_questions(db, erziehungsapp.QUESTIONS, erziehungsapp.QUESTION_SOURCE)
+
+    assert sync_questions(db, uploader.QUESTIONS, uploader.QUESTION_SOURCE).total_writes == 0
+    assert sync_questions(db, erziehungsapp.QUESTIONS,
+                          erziehungsapp.QUESTION_SOURCE).total_writes == 0
+    sources = [doc['source'] for doc in live_questions(db).values()]
+    assert sources.count(uploader.QUESTION_SOURCE) == len(uploader.QUESTIONS)
+    assert sources.count(erziehungsapp.QUESTION_SOURCE) == len(erziehungsapp.QUESTIONS)
+
+
+def test_first_sync_adopts_questions_uploaded_without_source(db):
+    uploader.upload_questions(db)
+    uploaded = set(live_questions(db))
+
+    plan = sync_questions(db, uploader.QUESTIONS, uploader.QUESTION_SOURCE)
+
+    assert not plan.creates and not plan.deactivations
+    stored = live_questions(db)
+    assert set(stored) == uploaded
+    assert {doc['source'] for doc in stored.values()} == {uploader.QUESTION_SOURCE}
+    assert sync_questions(db, uploader.QUESTIONS, uploader.QUESTION_SOURCE).total_writes == 0
+
+
+def test_edited_text_updates_the_stored_document(db):
+    questions = [dict(question) for question in uploader.QUESTIONS]
+    sync_questions(db, questions, 'test')
+    doc_id = question_doc_id(questions[0], 'test')
+
+    questions[0]['text'] += ' (überarbeitet)'
+    plan = sync_questions(db, questions, 'test')
+
+    assert (len(plan.creates), len(plan.updates), len(plan.deactivations)) == (0, 1, 0)
+    assert db.collection('questions').document(doc_id).get().get('text') == questions[0]['text']
+    assert sync_questions(db, questions, 'test').total_writes == 0
+
+
+def test_sync_never_overwrites_a_document_it_did_not_plan_for(db):
+    question = dict(uploader.QUESTIONS[0], id='shared-question')
+    sync_questions(db, [question], 'first')
+
+    with pytest.raises(AlreadyExists):
+        sync_questions(db, [question], 'second')
+    assert db.collection('questions').document('shared-question').get().get('source') == 'first'
+
+
+@pytest.mark.parametrize('use_async', [False, True])
+def test_removed_questions_leave_a_dense_active_sequence(db, use_async):
+    questions = list(uploader.QUESTIONS)
+
+    def sync(catalogue):
+        if use_async:
+            return asyncio.run(sync_questions_async(
+                firestore_client.get_async_client(), catalogue, 'test'))
+        return sync_questions(db, catalogue, 'test')
+
+    sync(questions)
+    plan = sync(questions[3:])
+
+    assert len(plan.deactivations) == 3
+    assert verify_active_sequence(db)
+    assert active_sequence_ref(db).get().to_dict().get('holes') == []
@@ -0,0 +1,29 @@
+import asyncio
+import sys
+
+import pytest
+
+import upload_erziehungsapp_questions as erziehungsapp
+import upload_questions as uploader
+
+
+@pytest.mark.parametrize('module', [uploader, erziehungsapp])
+def test_dry_run_needs_a_mode_that_honors_it(module, monkeypatch):
+    monkeypatch.setattr(sys, 'argv', ['upload', '--dry-run'])
+    with pytest.raises(SystemExit):
+        module.parse_args()
+
+    monkeypatch.setattr(sys, 'argv', ['upload', '--sync', '--dry-run'])
+    assert module.parse_args().dry_run
+
+
+@pytest.mark.parametrize('module', [uploader, erziehungsapp])
+def test_async_dry_run_writes_nothing(module, monkeypatch, db):
+    monkeypatch.setattr(sys, 'argv', ['upload', '--async', '--dry-run'])
+    with pytest.raises(SystemExit):
+        module.parse_args()
+
+    monkeypatch.setattr(sys, 'argv', ['upload', '--async', '--sync', '--dry-run'])
+    asyncio.run(module.run_async(module.parse_args()))
+    for collection in ('questions', 'categories', 'metadata'):
+        assert not list(db.collection(collection).stream())
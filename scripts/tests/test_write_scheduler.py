@@ -0,0 +1,16 @@
+from write_scheduler import WriteScheduler
+
+
+def test_backoff_never_grows_a_small_batch_size():
+    scheduler = WriteScheduler(max_in_flight=4, max_batch_size=10)
+    scheduler.on_success(latency=scheduler.target_latency * 2)
+    assert scheduler.batch_size == 10
+    scheduler.on_error('DeadlineExceeded')
+    assert scheduler.batch_size == 10
+
+
+def test_backoff_halves_down_to_the_minimum():
+    scheduler = WriteScheduler(max_in_flight=4, max_batch_size=500)
+    for _ in range(6):
+        scheduler.on_error('DeadlineExceeded')
+    assert scheduler.batch_size == scheduler.min_batch_size == 50
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Adaptive pacing for BatchWriter commits.
+
+Two independent controls replace fixed sleeps between batches:
+
+* Ramp-up (optional): Firestore's 500/50/5 rule for new collections and
+  sequential keys - start at 500 writes/sec and raise the limit by 50%
+  every 5 minutes - enforced with a token bucket.
+* Feedback: contention (`Aborted`) and `ResourceExhausted` errors halve
+  the number of commits in flight, deadline errors and slow commits halve
+  the batch size; every few fast commits grow the batch size back and
+  then add one commit in flight (additive increase, multiplicative
+  decrease).
+"""
+
+import threading
+import time
+
+RAMP_START_RATE = 500       # writes/sec
+RAMP_FACTOR = 1.5           # +50% ...
+RAMP_INTERVAL_SECONDS = 300  # ... every 5 minutes
+MIN_BATCH_SIZE = 50
+TARGET_LATENCY_SECONDS = 1.0
+INCREASE_AFTER = 4  # fast commits in a row before growing batch size or in-flight limit
+CONTENTION_ERRORS = ('Aborted', 'ResourceExhausted')
+SLOW_ERRORS = ('DeadlineExceeded',)
+
+
+class WriteScheduler:
+    """Decides batch size, commits in flight and write rate from commit feedback."""
+
+    def __init__(self, max_in_flight, max_batch_size, ramp=False,
+                 start_rate=RAMP_START_RATE, target_latency=TARGET_LATENCY_SECONDS):
+        self.max_in_flight = max_in_flight
+        self.max_batch_size = max_batch_size
+        # Backing off must never push a small batch limit (e.g. large shard documents) above itself
+        self.min_batch_size = min(MIN_BATCH_SIZE, max_batch_size)
+        self.ramp = ramp
+        self.start_rate = start_rate
+        self.target_latency = target_latency
+        self.backoffs = 0
+        self._limit = max(1, max_in_flight // 2)
+        self._batch_size = max_batch_size
+        self._in_flight = 0
+        self._fast_commits = 0
+        self._cond = threading.Condition()
+        self._started = self._refilled = time.monotonic()
+        self._tokens = float(max_batch_size)
+
+    @property
+    def batch_size(self):
+        return self._batch_size
+
+    @property
+    def in_flight_limit(self):
+        return self._limit
+
+    def rate_limit(self):
+        """Current writes/sec allowed by the ramp, or None without ramp-up."""
+        if not self.ramp:
+            return None
+        steps = int((time.monotonic() - self._started) // RAMP_INTERVAL_SECONDS)
+        return self.start_rate * RAMP_FACTOR ** steps
+
+    def _refill(self, now, rate):
+        self._tokens = min(max(rate, self.max_batch_size),
+                           self._tokens + (now - self._refilled) * rate)
+        self._refilled = now
+
+    def acquire(self, writes):
+        """Block until a commit of ``writes`` writes may start."""
+        with self._cond:
+            while True:
+                rate = self.rate_limit()
+                if rate is not None:
+                    self._refill(time.monotonic(), rate)
+                slot_free = self._in_flight < self._limit
+                if slot_free and (rate is None or self._tokens >= writes):
+                    break
+                wait = 0.05 if not slot_free else (writes - self._tokens) / rate
+                self._cond.wait(timeout=wait)
+            if rate is not None:
+                self._tokens -= writes
+            self._in_flight += 1
+
+    def release(self):
+        with self._cond:
+            self._in_flight -= 1
+            self._cond.notify_all()
+
+    def on_success(self, latency):
+        with self._cond:
+            if latency > self.target_latency:
+                self._batch_size = max(self.min_batch_size, self._batch_size // 2)
+                self._fast_commits = 0
+                return
+            self._fast_commits += 1
+            if self._fast_commits < INCREASE_AFTER:
+                return
+            self._fast_commits = 0
+            if self._batch_size < self.max_batch_size:
+                self._batch_size = min(self.max_batch_size, self._batch_size * 2)
+            elif self._limit < self.max_in_flight:
+                self._limit += 1
+                self._cond.notify_all()
+
+    def on_error(self, error_name):
+        with self._cond:
+            self.backoffs += 1
+            self._fast_commits = 0
+            if error_name in CONTENTION_ERRORS:
+                self._limit = max(1, self._limit // 2)
+            if error_name in SLOW_ERRORS:
+                self._batch_size = max(self.min_batch_size, self._batch_size // 2)
+
+    def summary(self):
+        rate = self.rate_limit()
+        text = (f"{self._limit}/{self.max_in_flight} commits in flight, "
+                f"batch size {self._batch_size}, {self.backoffs} backoffs")
+        if rate is not None:
+            text += f", ramp limit {rate:.0f} writes/sec"
+        return text
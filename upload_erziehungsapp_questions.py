@@ -4,23 +4,38 @@ Firebase Question Upload Script for Erziehungsapp
 Uploads categories and questions from Erziehungsapp.md to Firestore.
 """
 
-import firebase_admin
-from firebase_admin import credentials, firestore
+import argparse
+import asyncio
 from datetime import datetime
+import os
 import sys
 
-# Initialize Firebase Admin SDK
-def initialize_firebase():
-    """Initialize Firebase with service account credentials."""
-    try:
-        # Try to use existing app
-        app = firebase_admin.get_app()
-    except ValueError:
-        # Initialize new app
-        cred = credentials.Certificate('serviceAccountKey.json')
-        app = firebase_admin.initialize_app(cred)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'scripts'))
+from active_sequence import compact_active_sequence, repair_active_sequence, verify_active_sequence
+from async_pipeline import DEFAULT_CONCURRENCY, AsyncBatchWriter
+from batch_writer import BatchWriter
+from firestore_client import connect, connect_async, print_timings, sdk
+from markdown_questions import compile_markdown
+from near_duplicates import check_catalogue
+from question_catalog import load_catalog
+from pool_index import rebuild_pool_index
+from question_counters import reconcile_counters
+from question_sync import (
+    submit_inserts,
+    submit_inserts_async,
+    sync_questions,
+    sync_questions_async,
+)
+
+# Tag stored on synced questions so removals only touch this catalogue
+QUESTION_SOURCE = 'erziehungsapp'
 
-    return firestore.client()
+# Markdown source and the category each '## **3.x.' section maps to
+MARKDOWN_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Erziehungsapp.md')
+SECTION_CATEGORIES = {
+    '3.1': 'buerokratisches',
+    '3.2': 'motorik',
+}
 
 # Category definitions
 CATEGORIES = [
@@ -464,27 +479,60 @@ def upload_categories(db):
     category_ref = db.collection('categories')
 
     for category in CATEGORIES:
+        # Merge so questionCounter, maintained by question writes, is kept
         doc_ref = category_ref.document(category['id'])
-        doc_ref.set(category)
+        doc_ref.set(category, merge=True)
         print(f"  ✓ Uploaded category: {category['title']}")
 
     print(f"Successfully uploaded {len(CATEGORIES)} categories.\n")
 
 
-def upload_questions(db):
-    """Upload question data to Firestore."""
+async def upload_categories_async(db):
+    """Upload category data with the async client."""
+    print("Uploading categories...")
+    category_ref = db.collection('categories')
+
+    await asyncio.gather(*(category_ref.document(category['id']).set(category, merge=True)
+                           for category in CATEGORIES))
+    print(f"Successfully uploaded {len(CATEGORIES)} categories.\n")
+
+
+def upload_questions(db, concurrency=DEFAULT_CONCURRENCY):
+    """Upload question data to Firestore in concurrent batch commits."""
     print("Uploading questions...")
     question_ref = db.collection('questions')
 
-    for i, question in enumerate(QUESTIONS, 1):
-        # Auto-generate question ID
-        doc_ref = question_ref.document()
-        doc_ref.set(question)
-        print(f"  ✓ Uploaded question {i}/{len(QUESTIONS)}: {question['text'][:60]}...")
+    writer = BatchWriter(db, max_in_flight=concurrency)
+    # Auto-generate question IDs; sequence/randomSeed are stamped per batch.
+    # Streamed, so a --catalog upload decodes one record at a time
+    submit_inserts(db, writer, ((question_ref.document(), dict(question))
+                                for question in QUESTIONS),
+                   category_ids={question['categoryId'] for question in QUESTIONS})
+    stats = writer.close()
+
+    print(f"\nSuccessfully uploaded {len(QUESTIONS)} questions.")
+    print(f"Throughput: {stats.summary()}")
+    print_category_summary()
+
+
+async def upload_questions_async(db, concurrency=DEFAULT_CONCURRENCY):
+    """Upload question data with the async client (--async)."""
+    print("Uploading questions (async)...")
+    question_ref = db.collection('questions')
+
+    writer = AsyncBatchWriter(db, concurrency=concurrency)
+    await submit_inserts_async(db, writer, ((question_ref.document(), dict(question))
+                                            for question in QUESTIONS),
+                               category_ids={question['categoryId'] for question in QUESTIONS})
+    stats = await writer.close()
 
     print(f"\nSuccessfully uploaded {len(QUESTIONS)} questions.")
+    print(f"Throughput: {stats.summary()}")
+    print_category_summary()
 
-    # Print summary by category
+
+def print_category_summary():
+    """Print the number of catalogue questions per category."""
     print("\nSummary by category:")
     category_counts = {}
     for question in QUESTIONS:
@@ -496,26 +544,187 @@ def upload_questions(db):
         print(f"  - {cat_name}: {count} questions")
 
 
+def load_section_hashes(db):
+    """Read the section digests recorded by the last markdown sync."""
+    doc = db.collection('metadata').document('markdownSections').get()
+    if not doc.exists:
+        return {}
+    entries = (doc.to_dict() or {}).get(QUESTION_SOURCE, {}).get('sections', [])
+    return {entry['number']: entry for entry in entries}
+
+
+def save_section_hashes(db, entries):
+    """Record the section digests that are now live in Firestore."""
+    db.collection('metadata').document('markdownSections').set({
+        QUESTION_SOURCE: {
+            'sections': list(entries.values()),
+            'updatedAt': sdk().SERVER_TIMESTAMP,
+        }
+    }, merge=True)
+
+
+def sync_markdown(db, path, force=False, dry_run=False):
+    """Compile the markdown file and sync only the sections that changed."""
+    print(f"Compiling questions from {os.path.basename(path)}...")
+    known = {} if force else load_section_hashes(db)
+    known_digests = {number: entry['digest'] for number, entry in known.items()}
+
+    questions = []
+    categories = set()
+    entries = {}
+    for section, category_id, section_questions in compile_markdown(
+            path, SECTION_CATEGORIES, known_digests):
+        entries[section.number] = {
+            'number': section.number,
+            'title': section.title,
+            'categoryId': category_id,
+            'digest': section.digest,
+        }
+        if section_questions is None:
+            print(f"  • {section.number} {section.title}: unchanged, skipped")
+            continue
+        print(f"  • {section.number} {section.title}: {len(section_questions)} questions")
+        questions.extend(section_questions)
+        categories.add(category_id)
+
+    # Sections deleted from the document: deactivate their questions
+    for number in set(known) - set(entries):
+        print(f"  • {number} {known[number]['title']}: removed")
+        categories.add(known[number]['categoryId'])
+
+    if not categories:
+        print("✓ No section changed since the last sync\n")
+        return
+
+    check_catalogue(questions, QUESTION_SOURCE)
+    sync_questions(db, questions, QUESTION_SOURCE, categories=categories, dry_run=dry_run)
+    if not dry_run:
+        save_section_hashes(db, entries)
+
+
+def parse_args():
+    """Parse command line options."""
+    parser = argparse.ArgumentParser(description="Upload categories and questions to Firestore.")
+    parser.add_argument('--sync', action='store_true',
+                        help="write only new/changed questions (stable IDs, content hashes) "
+                             "and deactivate removed ones")
+    parser.add_argument('--markdown', nargs='?', const=MARKDOWN_PATH, metavar='PATH',
+                        help="compile questions from the markdown source instead of QUESTIONS "
+                             "(implies --sync; default: Erziehungsapp.md)")
+    parser.add_argument('--force', action='store_true',
+                        help="with --markdown: re-parse sections even if unchanged")
+    parser.add_argument('--reconcile-counters', action='store_true',
+                        help="only recompute category/total question counters "
+                             "with count aggregations")
+    parser.add_argument('--rebuild-pool-index', action='store_true',
+                        help="only rewrite the per-category pool index documents "
+                             "from the questions collection")
+    parser.add_argument('--compact-active-sequence', action='store_true',
+                        help="only close gaps in the dense activeSequence numbering "
+                             "left by deactivated questions")
+    parser.add_argument('--repair-active-sequence', action='store_true',
+                        help="only recompute the activeSequence numbering from a scan of "
+                             "the questions (first run, or after a failed upload)")
+    parser.add_argument('--dry-run', action='store_true',
+                        help="with --sync, --markdown, --reconcile-counters, --rebuild-pool-index "
+                             "or --repair-active-sequence: show planned writes without committing")
+    parser.add_argument('--catalog', metavar='PATH',
+                        help="load QUESTIONS and CATEGORIES from a .qcat catalogue "
+                             "(see scripts/question_catalog.py) instead of this file")
+    parser.add_argument('--async', dest='use_async', action='store_true',
+                        help="run the upload on the asyncio Firestore client")
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY,
+                        help=f"batch commits in flight (default: {DEFAULT_CONCURRENCY})")
+    args = parser.parse_args()
+    if args.use_async and (args.reconcile_counters or args.rebuild_pool_index or args.markdown
+                           or args.compact_active_sequence or args.repair_active_sequence):
+        parser.error("--async supports plain uploads and --sync only")
+    if args.catalog and args.markdown:
+        parser.error("--catalog and --markdown are alternative question sources")
+    if args.dry_run and not (args.sync or args.markdown or args.reconcile_counters
+                             or args.rebuild_pool_index or args.repair_active_sequence):
+        parser.error("--dry-run needs --sync, --markdown, --reconcile-counters, "
+                     "--rebuild-pool-index or --repair-active-sequence "
+                     "(a plain upload always writes)")
+    return args
+
+
+def run(args):
+    """Connect and run the selected command on the sync client."""
+    print("Initializing Firebase connection...")
+    # firebase_admin is only imported here, so --help stays instant
+    db = connect()
+    print("✓ Connected to Firebase\n")
+
+    if args.reconcile_counters:
+        reconcile_counters(db, dry_run=args.dry_run)
+    elif args.compact_active_sequence:
+        compact_active_sequence(db)
+        verify_active_sequence(db)
+    elif args.repair_active_sequence:
+        repair_active_sequence(db, dry_run=args.dry_run)
+    elif args.rebuild_pool_index:
+        rebuild_pool_index(db, dry_run=args.dry_run)
+    elif args.markdown:
+        if not args.dry_run:
+            upload_categories(db)
+        sync_markdown(db, args.markdown, force=args.force, dry_run=args.dry_run)
+    elif args.sync:
+        if not args.dry_run:
+            upload_categories(db)
+        sync_questions(db, QUESTIONS, QUESTION_SOURCE, dry_run=args.dry_run,
+                       concurrency=args.concurrency)
+    else:
+        upload_categories(db)
+        upload_questions(db, args.concurrency)
+
+
+async def run_async(args):
+    """Connect and upload on the async client (--async)."""
+    print("Initializing Firebase connection (async)...")
+    db = await connect_async()
+    print("✓ Connected to Firebase\n")
+
+    if args.sync:
+        if not args.dry_run:
+            await upload_categories_async(db)
+        await sync_questions_async(db, QUESTIONS, QUESTION_SOURCE, dry_run=args.dry_run,
+                                   concurrency=args.concurrency)
+    else:
+        # parse_args rejects --dry-run here: a plain upload always writes
+        await upload_categories_async(db)
+        await upload_questions_async(db, args.concurrency)
+
+
 def main():
     """Main function to upload all data."""
+    global QUESTIONS, CATEGORIES
+    args = parse_args()
+    if args.catalog:
+        QUESTIONS, CATEGORIES = load_catalog(args.catalog)
+
     print("=" * 60)
     print("Firebase Question Upload Script - Erziehungsapp")
     print("=" * 60)
     print()
 
     try:
-        # Initialize Firebase
-        print("Initializing Firebase connection...")
-        db = initialize_firebase()
-        print("✓ Connected to Firebase\n")
+        if not (args.reconcile_counters or args.rebuild_pool_index or args.markdown
+                or args.compact_active_sequence or args.repair_active_sequence):
+            # Validation stage: flag near-identical catalogue entries before any write
+            print("Checking catalogue for near-duplicates...")
+            check_catalogue(QUESTIONS, QUESTION_SOURCE)
+            print()
 
-        # Upload data
-        upload_categories(db)
-        upload_questions(db)
+        if args.use_async:
+            asyncio.run(run_async(args))
+        else:
+            run(args)
 
         print("\n" + "=" * 60)
         print("Upload completed successfully!")
         print("=" * 60)
+        print_timings()
 
     except FileNotFoundError:
         print("\n❌ ERROR: serviceAccountKey.json not found!")
@@ -4,25 +4,30 @@ Firebase Question Upload Script
 Uploads sample questions to Firestore for the parent quiz app.
 """
 
-import firebase_admin
-from firebase_admin import credentials, firestore
+import argparse
+import asyncio
 from datetime import datetime
+import os
 import sys
 
-# Initialize Firebase Admin SDK
-def initialize_firebase():
-    """Initialize Firebase with service account credentials."""
-    try:
-        # Try to use existing app
-        app = firebase_admin.get_app()
-    except ValueError:
-        # Initialize new app
-        # You need to download your service account key from Firebase Console
-        # and save it as 'serviceAccountKey.json' in the same directory
-        cred = credentials.Certificate('serviceAccountKey.json')
-        app = firebase_admin.initialize_app(cred)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'scripts'))
+from active_sequence import compact_active_sequence, repair_active_sequence, verify_active_sequence
+from async_pipeline import DEFAULT_CONCURRENCY, AsyncBatchWriter
+from batch_writer import BatchWriter
+from firestore_client import connect, connect_async, print_timings
+from near_duplicates import check_catalogue
+from question_catalog import load_catalog
+from pool_index import rebuild_pool_index
+from question_counters import reconcile_counters
+from question_sync import (
+    submit_inserts,
+    submit_inserts_async,
+    sync_questions,
+    sync_questions_async,
+)
 
-    return firestore.client()
+# Tag stored on synced questions so removals only touch this catalogue
+QUESTION_SOURCE = 'upload_questions'
 
 # Category definitions
 CATEGORIES = [
@@ -482,38 +487,61 @@ def upload_categories(db):
     print("Uploading categories...")
     category_ref = db.collection('categories')
 
-    # Count questions per category
-    category_counts = {}
-    for question in QUESTIONS:
-        cat_id = question['categoryId']
-        category_counts[cat_id] = category_counts.get(cat_id, 0) + 1
-
     for category in CATEGORIES:
-        # Add totalQuestions field
-        category_data = category.copy()
-        category_data['totalQuestions'] = category_counts.get(category['id'], 0)
-
+        # Merge so questionCounter, maintained by question writes, is kept
         doc_ref = category_ref.document(category['id'])
-        doc_ref.set(category_data)
-        print(f"  ✓ Uploaded category: {category['title']} ({category_data['totalQuestions']} questions)")
+        doc_ref.set(category, merge=True)
+        print(f"  ✓ Uploaded category: {category['title']}")
+
+    print(f"Successfully uploaded {len(CATEGORIES)} categories.\n")
+
+
+async def upload_categories_async(db):
+    """Upload category data with the async client."""
+    print("Uploading categories...")
+    category_ref = db.collection('categories')
 
+    await asyncio.gather(*(category_ref.document(category['id']).set(category, merge=True)
+                           for category in CATEGORIES))
     print(f"Successfully uploaded {len(CATEGORIES)} categories.\n")
 
 
-def upload_questions(db):
-    """Upload question data to Firestore."""
+def upload_questions(db, concurrency=DEFAULT_CONCURRENCY):
+    """Upload question data to Firestore in concurrent batch commits."""
     print("Uploading questions...")
     question_ref = db.collection('questions')
 
-    for i, question in enumerate(QUESTIONS, 1):
-        # Auto-generate question ID
-        doc_ref = question_ref.document()
-        doc_ref.set(question)
-        print(f"  ✓ Uploaded question {i}/{len(QUESTIONS)}: {question['text'][:60]}...")
+    writer = BatchWriter(db, max_in_flight=concurrency)
+    # Auto-generate question IDs; sequence/randomSeed are stamped per batch.
+    # Streamed, so a --catalog upload decodes one record at a time
+    submit_inserts(db, writer, ((question_ref.document(), dict(question))
+                                for question in QUESTIONS),
+                   category_ids={question['categoryId'] for question in QUESTIONS})
+    stats = writer.close()
 
     print(f"\nSuccessfully uploaded {len(QUESTIONS)} questions.")
+    print(f"Throughput: {stats.summary()}")
+    print_category_summary()
+
+
+async def upload_questions_async(db, concurrency=DEFAULT_CONCURRENCY):
+    """Upload question data with the async client (--async)."""
+    print("Uploading questions (async)...")
+    question_ref = db.collection('questions')
 
-    # Print summary by category
+    writer = AsyncBatchWriter(db, concurrency=concurrency)
+    await submit_inserts_async(db, writer, ((question_ref.document(), dict(question))
+                                            for question in QUESTIONS),
+                               category_ids={question['categoryId'] for question in QUESTIONS})
+    stats = await writer.close()
+
+    print(f"\nSuccessfully uploaded {len(QUESTIONS)} questions.")
+    print(f"Throughput: {stats.summary()}")
+    print_category_summary()
+
+
+def print_category_summary():
+    """Print the number of catalogue questions per category."""
     print("\nSummary by category:")
     category_counts = {}
     for question in QUESTIONS:
@@ -525,26 +553,117 @@ def upload_questions(db):
         print(f"  - {cat_name}: {count} questions")
 
 
+def parse_args():
+    """Parse command line options."""
+    parser = argparse.ArgumentParser(description="Upload categories and questions to Firestore.")
+    parser.add_argument('--sync', action='store_true',
+                        help="write only new/changed questions (stable IDs, content hashes) "
+                             "and deactivate removed ones")
+    parser.add_argument('--reconcile-counters', action='store_true',
+                        help="only recompute category/total question counters "
+                             "with count aggregations")
+    parser.add_argument('--rebuild-pool-index', action='store_true',
+                        help="only rewrite the per-category pool index documents "
+                             "from the questions collection")
+    parser.add_argument('--compact-active-sequence', action='store_true',
+                        help="only close gaps in the dense activeSequence numbering "
+                             "left by deactivated questions")
+    parser.add_argument('--repair-active-sequence', action='store_true',
+                        help="only recompute the activeSequence numbering from a scan of "
+                             "the questions (first run, or after a failed upload)")
+    parser.add_argument('--dry-run', action='store_true',
+                        help="with --sync, --reconcile-counters, --rebuild-pool-index or "
+                             "--repair-active-sequence: show planned writes without committing")
+    parser.add_argument('--catalog', metavar='PATH',
+                        help="load QUESTIONS and CATEGORIES from a .qcat catalogue "
+                             "(see scripts/question_catalog.py) instead of this file")
+    parser.add_argument('--async', dest='use_async', action='store_true',
+                        help="run the upload on the asyncio Firestore client")
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY,
+                        help=f"batch commits in flight (default: {DEFAULT_CONCURRENCY})")
+    args = parser.parse_args()
+    if args.use_async and (args.reconcile_counters or args.rebuild_pool_index
+                           or args.compact_active_sequence or args.repair_active_sequence):
+        parser.error("--async supports plain uploads and --sync only")
+    if args.dry_run and not (args.sync or args.reconcile_counters
+                             or args.rebuild_pool_index or args.repair_active_sequence):
+        parser.error("--dry-run needs --sync, --reconcile-counters, --rebuild-pool-index or "
+                     "--repair-active-sequence (a plain upload always writes)")
+    return args
+
+
+def run(args):
+    """Connect and run the selected command on the sync client."""
+    print("Initializing Firebase connection...")
+    # firebase_admin is only imported here, so --help stays instant
+    db = connect()
+    print("✓ Connected to Firebase\n")
+
+    if args.reconcile_counters:
+        reconcile_counters(db, dry_run=args.dry_run)
+    elif args.compact_active_sequence:
+        compact_active_sequence(db)
+        verify_active_sequence(db)
+    elif args.repair_active_sequence:
+        repair_active_sequence(db, dry_run=args.dry_run)
+    elif args.rebuild_pool_index:
+        rebuild_pool_index(db, dry_run=args.dry_run)
+    elif args.sync:
+        if not args.dry_run:
+            upload_categories(db)
+        sync_questions(db, QUESTIONS, QUESTION_SOURCE, dry_run=args.dry_run,
+                       concurrency=args.concurrency)
+    else:
+        upload_categories(db)
+        upload_questions(db, args.concurrency)
+
+
+async def run_async(args):
+    """Connect and upload on the async client (--async)."""
+    print("Initializing Firebase connection (async)...")
+    db = await connect_async()
+    print("✓ Connected to Firebase\n")
+
+    if args.sync:
+        if not args.dry_run:
+            await upload_categories_async(db)
+        await sync_questions_async(db, QUESTIONS, QUESTION_SOURCE, dry_run=args.dry_run,
+                                   concurrency=args.concurrency)
+    else:
+        # parse_args rejects --dry-run here: a plain upload always writes
+        await upload_categories_async(db)
+        await upload_questions_async(db, args.concurrency)
+
+
 def main():
     """Main function to upload all data."""
+    global QUESTIONS, CATEGORIES
+    args = parse_args()
+    if args.catalog:
+        QUESTIONS, CATEGORIES = load_catalog(args.catalog)
+
     print("=" * 60)
     print("Firebase Question Upload Script")
     print("=" * 60)
     print()
 
     try:
-        # Initialize Firebase
-        print("Initializing Firebase connection...")
-        db = initialize_firebase()
-        print("✓ Connected to Firebase\n")
+        if not (args.reconcile_counters or args.rebuild_pool_index
+                or args.compact_active_sequence or args.repair_active_sequence):
+            # Validation stage: flag near-identical catalogue entries before any write
+            print("Checking catalogue for near-duplicates...")
+            check_catalogue(QUESTIONS, QUESTION_SOURCE)
+            print()
 
-        # Upload data
-        upload_categories(db)
-        upload_questions(db)
+        if args.use_async:
+            asyncio.run(run_async(args))
+        else:
+            run(args)
 
         print("\n" + "=" * 60)
         print("Upload completed successfully!")
         print("=" * 60)
+        print_timings()
 
     except FileNotFoundError:
         print("\n❌ ERROR: serviceAccountKey.json not found!")